@@ -1,15 +1,20 @@
 import logging
 import ujson
+from uuid import UUID
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.http import HttpRequest, HttpResponse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.views import get_view_name
-from rest_framework_jwt.serializers import VerifyJSONWebTokenSerializer
-from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 
+from jwt_auth.authentication import TokenAuthentication, JSONWebTokenAuthentication
 from .models import Action
+from .policy import should_record_action
+from .writer import action_writer
 
 log = logging.getLogger('projects')
 
@@ -17,26 +22,39 @@ User = get_user_model()
 
 
 def get_user_from_jwt(token):
-    serializer = VerifyJSONWebTokenSerializer(data={'token': token})
-    if serializer.is_valid():
-        return serializer.validated_data.get('user')
+    try:
+        return JSONWebTokenAuthentication().authenticate_jwt(token)[0]
+    except AuthenticationFailed:
+        return None
 
 
 def get_user_from_simple_token(token):
-    token_obj = Token.objects.filter(key=token).first()
-    if token_obj:
-        return token_obj.user
+    try:
+        return TokenAuthentication().authenticate_credentials(token)[0]
+    except AuthenticationFailed:
+        return None
 
 
 def get_user_from_token_header(request):
-    token_header = request.META.get('HTTP_AUTHORIZATION')
-    if not token_header or ' ' not in token_header:
-        return
-    prefix, token = token_header.split()
-    if prefix == 'JWT':
-        return get_user_from_jwt(token)
-    elif prefix == 'Token':
-        return get_user_from_simple_token(token)
+    """
+    Authenticates request the same way DRF does, result is shared with DRF authentication
+    """
+    for authentication in (TokenAuthentication(), JSONWebTokenAuthentication()):
+        try:
+            result = authentication.authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if result is not None:
+            return result[0]
+
+
+def record_action_synchronously(view_func):
+    """
+    Makes ActionMiddleware save the action before the view runs, even when actions are written
+    asynchronously. Needed by views which use request.action.pk, e.g. as celery task id.
+    """
+    view_func.record_action_synchronously = True
+    return view_func
 
 
 class ActionMiddleware(object):
@@ -44,14 +62,43 @@ class ActionMiddleware(object):
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        start = timezone.now()
-        path = request.get_full_path()
-        try:
-            body = ujson.loads(request.body)
-        except ValueError:
-            body = {}
+        response = self.get_response(request)  # type: HttpResponse
+        action = getattr(request, 'action', None)
+        if action is None:
+            # not recorded or no view was called
+            return response
+        if action._state.adding:
+            action.action = self._get_action_name(request)
+        else:
+            action.refresh_from_db()
+        self._set_action_state(action, response.status_code)
+        action.end_date = timezone.now()
+        if action.user is None:
+            action.user = request.user if isinstance(request.user, User) else None
+        if settings.ACTION_MIDDLEWARE_ASYNC:
+            self._set_action_object_id(action, request, response)
+            action_writer.add(action)
+        else:
+            self._set_action_object(action, request, response)
+            action.save()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Starts the action once the url is resolved, so the recording policy can use request.resolver_match
+        """
+        if not should_record_action(request):
+            return
+        filter_kwargs, defaults = self._get_action_kwargs(request)
+        if settings.ACTION_MIDDLEWARE_ASYNC and not getattr(view_func, 'record_action_synchronously', False):
+            # kept in memory during the request, written by action writer
+            request.action = Action(**dict(filter_kwargs, **defaults))
+        else:
+            request.action = Action.objects.get_or_create_action(filter_kwargs, defaults)
+
+    def _get_action_kwargs(self, request: HttpRequest):
         filter_kwargs = dict(
-            path=path,
+            path=request.get_full_path(),
             user=get_user_from_token_header(request),
             state=Action.CREATED,
         )
@@ -59,24 +106,30 @@ class ActionMiddleware(object):
             action=self._get_action_name(request),
             method=request.method.lower(),
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            start_date=start,
-            payload=body,
+            start_date=timezone.now(),
+            payload=self._get_payload(request),
             ip=self._get_client_ip(request),
             state=Action.PENDING,
         )
-        action = Action.objects.get_or_create_action(filter_kwargs, defaults)
-        request.action = action
-
-        response = self.get_response(request)  # type: HttpResponse
+        return filter_kwargs, defaults
 
-        action.refresh_from_db()
-        self._set_action_state(action, response.status_code)
-        self._set_action_object(action, request, response)
-        action.end_date = timezone.now()
-        if action.user is None:
-            action.user = request.user if isinstance(request.user, User) else None
-        action.save()
-        return response
+    @staticmethod
+    def _get_payload(request: HttpRequest):
+        """
+        Only JSON bodies up to ACTION_PAYLOAD_MAX_SIZE are recorded. Reading other bodies, e.g. chunks of uploads,
+        would load them into memory and fail for bodies over DATA_UPLOAD_MAX_MEMORY_SIZE.
+        """
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return {}
+        if not request.META.get('CONTENT_TYPE', '').startswith('application/json') or \
+                length > settings.ACTION_PAYLOAD_MAX_SIZE:
+            return {}
+        try:
+            return ujson.loads(request.body)
+        except ValueError:
+            return {}
 
     @staticmethod
     def _set_action_state(action, status_code):
@@ -98,6 +151,25 @@ class ActionMiddleware(object):
             if content_object is not None:
                 action.content_object = content_object
 
+    def _set_action_object_id(self, action, request, response):
+        """
+        Same as _set_action_object, but takes object id from url or response without fetching the object
+        """
+        if request.resolver_match is None or not status.is_success(response.status_code):
+            return
+        model = self._get_model_from_func(request.resolver_match.func)
+        if model is None:
+            return
+        pk = request.resolver_match.kwargs.get('pk')
+        if request.method.lower() == 'post' and hasattr(response, 'data'):
+            pk = self._get_object_pk_from_response_data(response.data) or pk
+        try:
+            object_id = UUID(str(pk))
+        except ValueError:
+            return
+        action.content_type = ContentType.objects.get_for_model(model)
+        action.object_id = object_id
+
     def _get_object_from_post_data(self, request, response):
         model = self._get_model_from_func(request.resolver_match.func)
         if model is not None:
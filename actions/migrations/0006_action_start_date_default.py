@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actions', '0005_auto_20170509_1057'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='action',
+            name='start_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
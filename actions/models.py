@@ -4,6 +4,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import JSONField
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from requests import Session, Request
 
 from base.namespace import Namespace
@@ -39,6 +40,8 @@ class Action(models.Model):
         (FAILED, "Failed"),
         (CREATED, "Created"),
     )
+    # states of actions which won't change anymore
+    FINISHED_STATES = (SUCCESS, FAILED, CANCELLED)
 
     path = models.CharField(max_length=255, blank=True)
     payload = JSONField(default={})
@@ -46,7 +49,8 @@ class Action(models.Model):
     method = models.CharField(max_length=7)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='actions', null=True, blank=True)
     user_agent = models.CharField(max_length=255)
-    start_date = models.DateTimeField(auto_now_add=True)
+    # set when the request starts, actions may be written later by the action writer
+    start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(blank=True, null=True)
     state = models.PositiveSmallIntegerField(choices=STATE_CHOICES)
     ip = models.GenericIPAddressField(null=True)
@@ -74,11 +78,11 @@ class Action(models.Model):
     def content_object_url(self, namespace: Namespace):
         return self.content_object.get_absolute_url(namespace) if self.content_object else ''
 
-    def dispatch(self, url='http://localhost'):
+    def dispatch(self, url='http://localhost', session=None, token=None):
         url = '{}{}'.format(url, self.path)
-        s = Session()
-        headers = {'AUTHORIZATION': 'Token {}'.format(self.user.auth_token.key)}
+        s = session or Session()
+        headers = {'AUTHORIZATION': 'Token {}'.format(token or self.user.auth_token.key)}
         request = Request(self.method.upper(), url, json=self.payload, headers=headers).prepare()
-        resp = s.send(request)
+        resp = s.send(request, timeout=settings.ACTION_DISPATCH_TIMEOUT)
         resp.raise_for_status()
         return resp
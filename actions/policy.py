@@ -0,0 +1,50 @@
+import random
+
+from django.conf import settings
+from django.http import HttpRequest
+
+ALWAYS = 'always'
+NEVER = 'never'
+MUTATING = 'mutating'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def should_record_action(request: HttpRequest) -> bool:
+    """
+    Decides whether ActionMiddleware records the request, according to ACTION_RECORDING_POLICY.
+    Policy maps url names or view paths (e.g. 'servers.views.IsAllowed') to one of:
+    ALWAYS, NEVER, MUTATING (only requests with unsafe methods) or a number, percent of requests to sample.
+    Requests which don't match any rule follow ACTION_RECORDING_DEFAULT.
+    The request has to be resolved already, it's called from ActionMiddleware.process_view.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return _apply_rule(settings.ACTION_RECORDING_DEFAULT, request)
+    if getattr(match.func, 'record_action_synchronously', False):
+        # view needs request.action
+        return True
+    return _apply_rule(get_rule(match), request)
+
+
+def get_rule(match):
+    policy = settings.ACTION_RECORDING_POLICY
+    for key in (match.view_name, match.url_name, get_view_path(match.func)):
+        if key and key in policy:
+            return policy[key]
+    return settings.ACTION_RECORDING_DEFAULT
+
+
+def get_view_path(view_func) -> str:
+    view = getattr(view_func, 'cls', view_func)
+    return '{}.{}'.format(view.__module__, view.__name__)
+
+
+def _apply_rule(rule, request: HttpRequest) -> bool:
+    if rule == ALWAYS:
+        return True
+    if rule == NEVER:
+        return False
+    if rule == MUTATING:
+        return request.method not in SAFE_METHODS
+    return random.random() * 100 < rule
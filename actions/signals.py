@@ -1,13 +1,15 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from triggers.models import Trigger
+from triggers.causes import cause_index
+from triggers.tasks import dispatch_caused_triggers
 from .models import Action
 
 
 @receiver(post_save, sender=Action)
 def trigger_action(sender, instance, created, **kwargs):
-    if created:
+    if created or instance.pk not in cause_index:
         return
-    for trigger in Trigger.objects.filter(cause=instance):
-        trigger.dispatch()
+    action_id = str(instance.pk)
+    transaction.on_commit(lambda: dispatch_caused_triggers.delay(action_id))
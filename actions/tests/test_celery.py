@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+from celery.states import SUCCESS, FAILURE, RETRY, REVOKED, IGNORED
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from appdj.celery import set_action_state, set_action_can_be_canceled
+from triggers.causes import cause_index
+from .factories import ActionFactory
+from ..models import Action
+
+
+class CeleryActionHooksTest(TestCase):
+    def setUp(self):
+        self.action = ActionFactory(state=Action.PENDING, can_be_cancelled=False)
+        self.task_id = str(self.action.pk)
+        # loads the cause index
+        self.assertNotIn(self.task_id, cause_index)
+
+    def tearDown(self):
+        cause_index.clear()
+        get_redis_connection("default").flushall()
+
+    def assertActionState(self, state, can_be_cancelled):
+        self.action.refresh_from_db()
+        self.assertEqual(self.action.state, state)
+        self.assertEqual(self.action.can_be_cancelled, can_be_cancelled)
+
+    def test_published(self):
+        with self.assertNumQueries(1):
+            set_action_can_be_canceled(headers={'id': self.task_id})
+        self.assertActionState(Action.PENDING, True)
+
+    def test_finished(self):
+        for task_state, action_state in [(SUCCESS, Action.SUCCESS), (FAILURE, Action.FAILED),
+                                         (REVOKED, Action.CANCELLED)]:
+            with self.assertNumQueries(1):
+                set_action_state(task_id=self.task_id, state=task_state)
+            self.assertActionState(action_state, False)
+
+    def test_retry(self):
+        set_action_state(task_id=self.task_id, state=RETRY)
+        self.assertActionState(Action.PENDING, True)
+
+    @patch('triggers.tasks.dispatch_caused_triggers.delay')
+    def test_caused_triggers_are_dispatched_when_finished(self, delay):
+        cause_index.add(self.task_id)
+        set_action_state(task_id=self.task_id, state=RETRY)
+        delay.assert_not_called()
+        set_action_state(task_id=self.task_id, state=SUCCESS)
+        delay.assert_called_once_with(self.task_id)
+
+    def test_unknown_state(self):
+        with self.assertNumQueries(0):
+            set_action_state(task_id=self.task_id, state=IGNORED)
+        self.assertActionState(Action.PENDING, False)
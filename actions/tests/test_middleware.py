@@ -16,11 +16,13 @@ from users.tests.factories import UserFactory
 from .factories import ActionFactory
 from ..middleware import ActionMiddleware, get_user_from_jwt, get_user_from_simple_token, get_user_from_token_header
 from ..models import Action
+from ..writer import action_writer
 
 
 @override_settings(MIDDLEWARE=(
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'actions.middleware.ActionMiddleware',
     'base.middleware.NamespaceMiddleware',
 ))
 class ActionMiddlewareFunctionalTest(TestCase):
@@ -30,7 +32,8 @@ class ActionMiddlewareFunctionalTest(TestCase):
         self.factory = APIRequestFactory(HTTP_AUTHORIZATION=self.token_header)
         base_handler = BaseHandler()
         base_handler.load_middleware()
-        self.middleware = ActionMiddleware(get_response=base_handler.get_response)
+        # action middleware is part of the handler, its process_view starts the action
+        self.middleware = base_handler.get_response
 
     def test_get_success_request(self):
         request = self.factory.get('/actions/')
@@ -94,6 +97,59 @@ class ActionMiddlewareFunctionalTest(TestCase):
         self.assertEqual(action.state, Action.IN_PROGRESS)
 
 
+@override_settings(ACTION_MIDDLEWARE_ASYNC=True)
+class ActionMiddlewareAsyncTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.token_header = 'Token {}'.format(self.user.auth_token.key)
+
+    def tearDown(self):
+        action_writer.flush()
+
+    def test_get_object_request(self):
+        original_action = ActionFactory()
+        url = reverse('action-detail', kwargs={'pk': str(original_action.pk)})
+        response = self.client.get(url, HTTP_AUTHORIZATION=self.token_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Action.objects.count(), 1)
+        action_writer.flush()
+        action = Action.objects.exclude(pk=original_action.pk).get()
+        self.assertEqual(action.state, Action.SUCCESS)
+        self.assertEqual(action.user_id, self.user.pk)
+        self.assertEqual(action.object_id, original_action.pk)
+        self.assertEqual(action.action, 'Action')
+
+    def test_start_date_is_request_time(self):
+        self.client.get('/actions/', HTTP_AUTHORIZATION=self.token_header)
+        action_writer.flush()
+        action = Action.objects.get()
+        self.assertLessEqual(action.start_date, action.end_date)
+
+    def test_finishes_created_action(self):
+        created = ActionFactory(path='/actions/', user=self.user, state=Action.CREATED)
+        self.client.get('/actions/', HTTP_AUTHORIZATION=self.token_header)
+        action_writer.flush()
+        action = Action.objects.get()
+        self.assertEqual(action.pk, created.pk)
+        self.assertEqual(action.state, Action.SUCCESS)
+
+    def test_server_start_is_recorded_synchronously(self):
+        task_postrun.disconnect(set_action_state)
+        self.addCleanup(task_postrun.connect, set_action_state)
+        server = ServerFactory()
+        assign_perm('write_project', self.user, server.project)
+        url = reverse('server-start', kwargs={
+            'namespace': self.user.username,
+            'project_pk': str(server.project.pk),
+            'pk': str(server.pk)
+        })
+        response = self.client.post(url, HTTP_AUTHORIZATION=self.token_header)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Action.objects.get().state, Action.PENDING)
+        action_writer.flush()
+        self.assertEqual(Action.objects.get().state, Action.IN_PROGRESS)
+
+
 @override_settings(MIDDLEWARE=(
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
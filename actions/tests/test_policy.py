@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse, resolve, Resolver404
+from rest_framework.test import APIRequestFactory
+
+from users.tests.factories import UserFactory
+from ..models import Action
+from ..views import ActionList
+from ..policy import should_record_action, get_view_path, ALWAYS, NEVER, MUTATING
+
+
+class RecordingPolicyTest(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.url = reverse('action-list')
+
+    def resolved(self, request):
+        # ActionMiddleware asks in process_view, when the url is already resolved
+        try:
+            request.resolver_match = resolve(request.path_info)
+        except Resolver404:
+            pass
+        return request
+
+    @override_settings(ACTION_RECORDING_POLICY={'action-list': NEVER})
+    def test_never_by_url_name(self):
+        self.assertFalse(should_record_action(self.resolved(self.factory.get(self.url))))
+
+    @override_settings(ACTION_RECORDING_POLICY={'actions.views.ActionList': MUTATING})
+    def test_mutating_by_view_path(self):
+        self.assertFalse(should_record_action(self.resolved(self.factory.get(self.url))))
+        self.assertTrue(should_record_action(self.resolved(self.factory.post(self.url))))
+
+    @override_settings(ACTION_RECORDING_POLICY={'action-list': 10})
+    @patch('actions.policy.random.random')
+    def test_sample(self, random_mock):
+        random_mock.return_value = 0.05
+        self.assertTrue(should_record_action(self.resolved(self.factory.get(self.url))))
+        random_mock.return_value = 0.5
+        self.assertFalse(should_record_action(self.resolved(self.factory.get(self.url))))
+
+    @override_settings(ACTION_RECORDING_POLICY={}, ACTION_RECORDING_DEFAULT=NEVER)
+    def test_default(self):
+        self.assertFalse(should_record_action(self.resolved(self.factory.get(self.url))))
+        self.assertFalse(should_record_action(self.resolved(self.factory.get('/does-not-exist/'))))
+
+    @override_settings(ACTION_RECORDING_POLICY={}, ACTION_RECORDING_DEFAULT=NEVER)
+    def test_synchronous_views_are_always_recorded(self):
+        url = reverse('server-start', kwargs={'namespace': 'test', 'project_pk': 'project', 'pk': 'server'})
+        self.assertTrue(should_record_action(self.resolved(self.factory.post(url))))
+
+    def test_get_view_path(self):
+        self.assertEqual(get_view_path(ActionList.as_view()), 'actions.views.ActionList')
+
+    @override_settings(ACTION_RECORDING_POLICY={'action-list': NEVER}, ACTION_RECORDING_DEFAULT=ALWAYS)
+    def test_middleware_skips_request(self):
+        user = UserFactory()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token {}'.format(user.auth_token.key))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Action.objects.exists())
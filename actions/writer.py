@@ -0,0 +1,125 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Action
+
+log = logging.getLogger('actions')
+
+
+class ActionWriter(object):
+    """
+    Buffers actions recorded by ActionMiddleware and writes them in batches outside of the request
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._exit_handler_registered = False
+
+    def add(self, action):
+        self._queue.put(action)
+        if settings.ACTION_WRITER_BACKGROUND:
+            self._ensure_thread()
+
+    def flush(self):
+        """
+        Synchronously writes everything buffered so far
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            write_actions(batch)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                # thread doesn't survive a fork, so it's started lazily in every worker process
+                self._thread = threading.Thread(target=self._run, name='action-writer')
+                self._thread.daemon = True
+                self._thread.start()
+                if not self._exit_handler_registered:
+                    atexit.register(self.flush)
+                    self._exit_handler_registered = True
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                write_actions(batch)
+            except Exception:
+                log.exception("Unable to write %s actions", len(batch))
+            finally:
+                close_old_connections()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + settings.ACTION_WRITER_FLUSH_INTERVAL
+        while len(batch) < settings.ACTION_WRITER_BATCH_SIZE:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+
+def write_actions(actions):
+    new_actions = []
+    for action in actions:
+        if action._state.adding:
+            new_actions.append(action)
+        else:
+            # created synchronously during the request, save() also fires triggers
+            action.save()
+    new_actions = _merge_into_created(new_actions)
+    Action.objects.bulk_create(new_actions)
+
+
+def _merge_into_created(actions) -> list:
+    """
+    Requests made on behalf of an existing CREATED action (e.g. trigger effects) finish that action
+    instead of recording a new one, same as get_or_create_action does for synchronous writes.
+    Returns actions which are really new.
+    """
+    user_ids = {action.user_id for action in actions if action.user_id is not None}
+    if not user_ids:
+        return actions
+    created = {}
+    candidates = Action.objects.filter(
+        state=Action.CREATED,
+        user_id__in=user_ids,
+        path__in={action.path for action in actions},
+    )
+    for existing in candidates:
+        created.setdefault((existing.path, existing.user_id), existing)
+    remaining = []
+    for action in actions:
+        existing = created.pop((action.path, action.user_id), None)
+        if existing is None:
+            remaining.append(action)
+            continue
+        existing.state = action.state
+        existing.end_date = action.end_date
+        if action.object_id is not None:
+            existing.content_type_id = action.content_type_id
+            existing.object_id = action.object_id
+        existing.save()
+    return remaining
+
+
+action_writer = ActionWriter()
@@ -1,8 +1,8 @@
 import os
 
 from celery import Celery
-from celery.signals import task_postrun, after_task_publish
-from celery.states import SUCCESS, FAILURE
+from celery.signals import task_postrun, task_revoked, after_task_publish
+from celery.states import SUCCESS, FAILURE, RETRY, REVOKED
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appdj.settings.dev')
@@ -19,25 +19,43 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+def update_action(task_id, **fields):
+    """
+    Updates the action of the task with one query. Triggers caused by the action
+    are dispatched here once it's finished, because action signals aren't sent for updates.
+    """
+    from actions.models import Action
+    from triggers.causes import cause_index
+    from triggers.tasks import dispatch_caused_triggers
+    updated = Action.objects.filter(pk=task_id).update(**fields)
+    if updated and fields.get('state') in Action.FINISHED_STATES and task_id in cause_index:
+        dispatch_caused_triggers.delay(task_id)
+
+
 @task_postrun.connect
 def set_action_state(task_id=None, state=None, **kwargs):
     from actions.models import Action
-    action = Action.objects.filter(pk=task_id).first()
-    if action is not None:
-        action.state = {
-            SUCCESS: Action.SUCCESS,
-            FAILURE: Action.FAILED
-        }[state]
-        action.can_be_cancelled = False
-        action.save()
+    action_state = {
+        SUCCESS: Action.SUCCESS,
+        FAILURE: Action.FAILED,
+        # the task will run again
+        RETRY: Action.PENDING,
+        REVOKED: Action.CANCELLED,
+    }.get(state)
+    if action_state is None:
+        return
+    update_action(task_id, state=action_state, can_be_cancelled=action_state == Action.PENDING)
+
+
+@task_revoked.connect
+def set_action_cancelled(request=None, **kwargs):
+    from actions.models import Action
+    if request is not None and request.id:
+        update_action(request.id, state=Action.CANCELLED, can_be_cancelled=False)
 
 
 @after_task_publish.connect
 def set_action_can_be_canceled(headers=None, **kwargs):
     task_id = headers.get('id')
     if task_id:
-        from actions.models import Action
-        action = Action.objects.filter(pk=task_id).first()
-        if action is not None:
-            action.can_be_cancelled = True
-            action.save()
+        update_action(task_id, can_be_cancelled=True)
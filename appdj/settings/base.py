@@ -25,6 +25,15 @@ from appdj.settings.tbslog import TBS_LOGGING
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY', 'test')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', "test secret key")
+# Webhooks are rejected until the signing secret of the endpoint is configured
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+# Max age of webhook signatures in seconds
+STRIPE_WEBHOOK_TOLERANCE = 300
+STRIPE_EVENT_BATCH_SIZE = 500
+# Invoice sync requests to stripe are limited across all workers, stripe allows 100/s in live mode and 25/s in test mode
+STRIPE_API_RATE_LIMIT = int(os.environ.get('STRIPE_API_RATE_LIMIT', 20))
+STRIPE_SYNC_PAGE_SIZE = 100
+STRIPE_SYNC_CHUNK_SIZE = 50
 
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -173,6 +182,11 @@ BCRYPT_LOG_ROUNDS = 13
 JWT_AUTH = {
     'JWT_EXPIRATION_DELTA': datetime.timedelta(days=30),
 }
+# Verified tokens are cached per process, entries live until token expires or at most for TTL seconds
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 1024))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 300))
+# Deleted tokens and changed users may still be authenticated by other processes for up to this many seconds
+AUTH_TOKEN_CACHE_CHECK_INTERVAL = int(os.environ.get("AUTH_TOKEN_CACHE_CHECK_INTERVAL", 5))
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.10/topics/i18n/
@@ -222,8 +236,8 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
+        'jwt_auth.authentication.TokenAuthentication',
+        'jwt_auth.authentication.JSONWebTokenAuthentication',
         'rest_framework_social_oauth2.authentication.SocialAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
@@ -287,6 +301,24 @@ CELERY_BROKER_CONNECTION_TIMEOUT = 30  # May require a long timeout due to Linux
 CELERY_SEND_EVENTS = False  # Will not create celeryev.* queues
 CELERY_EVENT_QUEUE_EXPIRES = 60  # Will delete all celeryev. queues without consumers after 1 minute.
 CELERY_BROKER_URL = os.environ.get('RABBITMQ_URL')
+CELERY_BEAT_SCHEDULE = {
+    'sync-invoices': {
+        'task': 'billing.tasks.sync_invoices',
+        'schedule': 60 * 60,
+    },
+}
+
+# Scheduled triggers are fired by run_trigger_scheduler, only the instance holding the redis lock fires them
+TRIGGER_SCHEDULER_POLL_INTERVAL = 5
+TRIGGER_SCHEDULER_BATCH_SIZE = 100
+TRIGGER_SCHEDULER_LEADER_TTL = 30
+# Triggers are dispatched by a fixed number of threads per worker, requests are retried only if they didn't get through
+TRIGGER_DISPATCH_WORKERS = int(os.environ.get("TRIGGER_DISPATCH_WORKERS", 10))
+TRIGGER_DISPATCH_BATCH_SIZE = 100
+TRIGGER_DISPATCH_TIMEOUT = 10
+TRIGGER_DISPATCH_RETRIES = 2
+# Every process checks the version of the trigger cause index in redis at most this often (seconds)
+TRIGGER_CAUSE_INDEX_LOCAL_TTL = int(os.environ.get("TRIGGER_CAUSE_INDEX_LOCAL_TTL", 5))
 
 USE_X_FORWARDED_HOST = True
 
@@ -308,6 +340,63 @@ ABSOLUTE_URL_OVERRIDES = {
 }
 
 
+# Namespaces resolved by NamespaceMiddleware are cached in redis and briefly in every process
+NAMESPACE_CACHE_TTL = int(os.environ.get("NAMESPACE_CACHE_TTL", 3600))
+NAMESPACE_LOCAL_CACHE_TTL = int(os.environ.get("NAMESPACE_LOCAL_CACHE_TTL", 10))
+NAMESPACE_LOCAL_CACHE_SIZE = 1024
+
+# Keep users' project permissions in redis, invalidated when permissions are assigned or removed
+PROJECT_PERMISSION_CACHE = os.environ.get("PROJECT_PERMISSION_CACHE", "false").lower() == "true"
+PROJECT_PERMISSION_CACHE_TTL = int(os.environ.get("PROJECT_PERMISSION_CACHE_TTL", 3600))
+
+# Actions
+# Write actions recorded by ActionMiddleware in batches outside of the request
+ACTION_MIDDLEWARE_ASYNC = os.environ.get("ACTION_MIDDLEWARE_ASYNC", "false").lower() == "true"
+ACTION_WRITER_BACKGROUND = True
+ACTION_WRITER_BATCH_SIZE = int(os.environ.get("ACTION_WRITER_BATCH_SIZE", 500))
+ACTION_WRITER_FLUSH_INTERVAL = float(os.environ.get("ACTION_WRITER_FLUSH_INTERVAL", 1))
+# Which requests are recorded as actions, keys are url names or view paths,
+# values are 'always', 'never', 'mutating' (skip GET, HEAD and OPTIONS) or percent of requests to record
+ACTION_RECORDING_DEFAULT = 'always'
+ACTION_RECORDING_POLICY = {
+    'rest_framework_swagger.views.SwaggerSchemaView': 'never',
+    'is_allowed': 'never',
+    'server_internal': 'never',
+    'stripe-webhook': 'never',
+    'search': 'mutating',
+    'server-list': 'mutating',
+    'server-detail': 'mutating',
+    'slack-message-status': 'never',
+}
+# Larger request bodies aren't recorded as action payloads
+ACTION_PAYLOAD_MAX_SIZE = 1024 * 1024
+# Seconds to wait for the api when an action is dispatched again by a trigger
+ACTION_DISPATCH_TIMEOUT = 30
+
+# Project files changed on disk are indexed by run_watchman.py, changes are applied together
+# once watchman is quiet for FILE_WATCHER_DEBOUNCE seconds, but at least every FILE_WATCHER_MAX_WAIT seconds
+WATCHMAN_ROOT = os.environ.get("WATCHMAN_ROOT", "/workspaces")
+FILE_WATCHER_DEBOUNCE = 0.5
+FILE_WATCHER_MAX_WAIT = 5
+FILE_WATCHER_BATCH_SIZE = 1000
+# Chunked uploads are staged here until they are complete, unfinished uploads expire after FILE_UPLOAD_EXPIRY seconds
+FILE_UPLOAD_STAGING_DIR = os.environ.get("FILE_UPLOAD_STAGING_DIR", os.path.join(RESOURCE_DIR, '.uploads'))
+FILE_UPLOAD_EXPIRY = 60 * 60 * 24
+FILE_UPLOAD_MAX_SIZE = 10 * 1024 ** 3
+FILE_UPLOAD_BUFFER_SIZE = 1024 * 1024
+# Largest file which can be uploaded or inlined in responses as base64
+FILE_BASE64_MAX_SIZE = 10 * 1024 * 1024
+# Local files are downloaded through this internal nginx location when set, e.g. /protected/
+FILE_DOWNLOAD_INTERNAL_LOCATION = os.environ.get("FILE_DOWNLOAD_INTERNAL_LOCATION", "")
+FILE_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Store uploaded project files once per content digest, files of workspaces stay where they are.
+# Project directories get copies of blobs, reflinks when the blob dir is on the same copy-on-write filesystem.
+# The dir name can't be a username.
+FILE_BLOB_STORE = os.environ.get("FILE_BLOB_STORE", "false").lower() == "true"
+FILE_BLOB_STORE_DIR = os.environ.get("FILE_BLOB_STORE_DIR", os.path.join(RESOURCE_DIR, '.blobs'))
+# Files of synced git repositories are registered in batches of this size
+GIT_SYNC_BATCH_SIZE = 500
+
 # Server settings
 SERVER_RESOURCE_DIR = os.environ.get("SERVER_RESOURCE_DIR", "/resources")
 SERVER_PORT = os.environ.get("SERVER_PORT", '8000')
@@ -316,11 +405,29 @@ SERVER_ENDPOINT_URLS = {'jupyter': '/jupyter/tree', 'restful': '/restfull/'}
 SERVER_COMMANDS = {
     "jupyter": "jupyter notebook --no-browser --NotebookApp.token=''",
 }
+# How long (in seconds) a container status read from docker is trusted before asking docker again
+SERVER_STATUS_CACHE_TTL = int(os.environ.get("SERVER_STATUS_CACHE_TTL", 5))
+# Compression of project archives uploaded into containers: none or gzip
+SERVER_ARCHIVE_CODEC = os.environ.get("SERVER_ARCHIVE_CODEC", "gzip")
+# Docker clients are shared per host, clients of tcp hosts keep up to this many keep-alive connections
+DOCKER_CLIENT_MAX_CONNECTIONS = int(os.environ.get("DOCKER_CLIENT_MAX_CONNECTIONS", 25))
+# How often (in seconds) a shared docker client is pinged before it's handed out
+DOCKER_CLIENT_HEALTH_CHECK_INTERVAL = int(os.environ.get("DOCKER_CLIENT_HEALTH_CHECK_INTERVAL", 60))
+# Set when the listen_docker_events command is running, cached statuses are then always up to date
+SERVER_STATUS_FROM_EVENTS = os.environ.get("SERVER_STATUS_FROM_EVENTS", "false").lower() == "true"
 
 # slack
 
 SOCIAL_AUTH_SLACK_KEY = os.environ.get('SLACK_KEY')
 SOCIAL_AUTH_SLACK_SECRET = os.environ.get('SLACK_SECRET')
+# Slack messages are queued per account and channel and sent by celery,
+# messages queued within SLACK_COALESCE_DELAY seconds are joined into one
+SLACK_API_URL = os.environ.get('SLACK_API_URL', 'https://slack.com/api/')
+SLACK_TIMEOUT = 10
+SLACK_COALESCE_DELAY = 1
+SLACK_MAX_MESSAGE_LENGTH = 4000
+SLACK_SCHEDULED_TTL = 300
+SLACK_MESSAGE_STATUS_TTL = 60 * 60 * 24
 
 # CORS requests
 CORS_ORIGIN_ALLOW_ALL = True
@@ -329,6 +436,9 @@ LOGGING = TBS_LOGGING
 
 ENABLE_BILLING = os.environ.get("ENABLE_BILLING", "false").lower() == "true"
 
+# Subscription status of users is cached until the end of the current period, or for TTL seconds
+SUBSCRIPTION_STATUS_CACHE_TTL = int(os.environ.get("SUBSCRIPTION_STATUS_CACHE_TTL", 300))
+
 # A list of url *names* that do not require a subscription to access.
 SUBSCRIPTION_EXEMPT_URLS = [LOGIN_URL,
                             "subscription-required"]
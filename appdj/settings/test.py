@@ -2,9 +2,12 @@ from .base import *
 
 
 SECRET_KEY = 'test'
+STRIPE_WEBHOOK_SECRET = 'test webhook secret'
 
 RESOURCE_DIR = '/tmp'
 MEDIA_ROOT = "/tmp"
+FILE_UPLOAD_STAGING_DIR = "/tmp/.uploads"
+FILE_BLOB_STORE_DIR = "/tmp/.blobs"
 
 CACHES['default']['OPTIONS']['REDIS_CLIENT_CLASS'] = "fakeredis.FakeStrictRedis"
 
@@ -49,3 +52,6 @@ HAYSTACK_CONNECTIONS = {
 }
 
 ENABLE_BILLING = True
+
+# tests flush action writer themselves
+ACTION_WRITER_BACKGROUND = False
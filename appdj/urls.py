@@ -48,6 +48,7 @@ router.register(r'projects', project_views.ProjectViewSet)
 project_router = routers.NestedSimpleRouter(router, r'projects', lookup='project')
 project_router.register(r'servers', servers_views.ServerViewSet)
 project_router.register(r'project_files', project_views.ProjectFileViewSet)
+project_router.register(r'file_uploads', project_views.ProjectFileUploadViewSet, base_name='fileupload')
 project_router.register(r'servers/(?P<server_pk>[^/.]+)/ssh-tunnels',
                         servers_views.SshTunnelViewSet)
 project_router.register(r'servers/(?P<server_pk>[^/.]+)/run-stats',
@@ -79,9 +80,12 @@ urlpatterns = [
     url(r'^(?P<namespace>[\w-]+)/search/$', SearchViewSet.as_view({'get': 'list'}), name='search'),
     url(r'^tbs-admin/', admin.site.urls),
     url(r'^actions/', include('actions.urls')),
+    url(r'^billing/stripe-webhook/$', billing_views.stripe_webhook, name='stripe-webhook'),
     url(r'^servers/(?P<server_pk>[^/.]+)$', servers_views.server_internal_details, name="server_internal"),
     url(r'^(?P<namespace>[\w-]+)/triggers/send-slack-message/$', trigger_views.SlackMessageView.as_view(),
         name='send-slack-message'),
+    url(r'^(?P<namespace>[\w-]+)/triggers/send-slack-message/(?P<message_id>[0-9a-f]{32})/$',
+        trigger_views.SlackMessageStatusView.as_view(), name='slack-message-status'),
     url(r'^(?P<namespace>[\w-]+)/', include(router.urls)),
     url(r'^(?P<namespace>[\w-]+)/', include(project_router.urls)),
     url(r'^(?P<namespace>[\w-]+)/projects/(?P<project_pk>[\w-]+)/synced-resources/$',
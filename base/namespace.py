@@ -1,16 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 
 class Namespace(object):
-    def __init__(self, name='', typ='', obj=None):
+    def __init__(self, name='', typ='', obj=None, id=None):
         self.name = name
-        self.object = obj
         self.type = typ
+        self.id = id if obj is None else obj.pk
+        self._object = obj
+
+    @property
+    def object(self):
+        if self._object is None and self.id is not None:
+            self._object = get_user_model().objects.filter(pk=self.id).first()
+        return self._object
+
+    @object.setter
+    def object(self, obj):
+        self._object = obj
+        self.id = obj.pk if obj is not None else None
 
     @staticmethod
     def from_name(name):
-        ns = Namespace(name=name)
-        ns.object = get_user_model().objects.filter(username=name).first()
-        if ns.object is not None:
-            ns.type = 'user'
-        return ns
+        return namespace_resolver.resolve(name)
+
+
+class NamespaceResolver(object):
+    """
+    Resolves namespace names to namespaces without loading the owner.
+    Resolved namespaces are kept in redis and for a short time in process LRU.
+    """
+    KEY = 'namespace:{}'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+
+    def resolve(self, name) -> Namespace:
+        if not name:
+            return Namespace(name=name)
+        data = self._get_local(name)
+        if data is None:
+            data = cache.get(self.KEY.format(name))
+            if data is None:
+                data = self._load(name)
+                cache.set(self.KEY.format(name), data, settings.NAMESPACE_CACHE_TTL)
+            self._set_local(name, data)
+        return Namespace(name=name, typ=data['type'], id=data['id'])
+
+    def invalidate(self, name) -> None:
+        with self._lock:
+            self._local.pop(name, None)
+        cache.delete(self.KEY.format(name))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    @staticmethod
+    def _load(name) -> dict:
+        user_id = get_user_model().objects.filter(username=name).values_list('pk', flat=True).first()
+        if user_id is None:
+            return {'id': None, 'type': ''}
+        return {'id': str(user_id), 'type': 'user'}
+
+    def _get_local(self, name):
+        with self._lock:
+            entry = self._local.get(name)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.time():
+                del self._local[name]
+                return None
+            self._local.move_to_end(name)
+            return data
+
+    def _set_local(self, name, data) -> None:
+        # local copies aren't invalidated by other processes, so they live only briefly
+        expires_at = time.time() + settings.NAMESPACE_LOCAL_CACHE_TTL
+        with self._lock:
+            self._local[name] = (data, expires_at)
+            self._local.move_to_end(name)
+            while len(self._local) > settings.NAMESPACE_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+
+namespace_resolver = NamespaceResolver()
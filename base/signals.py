@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .namespace import namespace_resolver
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=User)
+def invalidate_renamed_namespace(sender, instance, **kwargs):
+    old_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+    if old_username is not None and old_username != instance.username:
+        namespace_resolver.invalidate(old_username)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_namespace(sender, instance, **kwargs):
+    # covers new users, which might have been cached as missing, and deactivation
+    namespace_resolver.invalidate(instance.username)
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from users.tests.factories import UserFactory
+from ..namespace import Namespace, namespace_resolver
+
+
+class NamespaceResolverTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        namespace_resolver.clear()
+
+    def tearDown(self):
+        namespace_resolver.clear()
+        cache.clear()
+
+    def test_resolve(self):
+        namespace = Namespace.from_name(self.user.username)
+        self.assertEqual(namespace.type, 'user')
+        self.assertEqual(str(namespace.id), str(self.user.pk))
+        self.assertEqual(namespace.object, self.user)
+
+    def test_resolve_is_cached(self):
+        Namespace.from_name(self.user.username)
+        with self.assertNumQueries(0):
+            Namespace.from_name(self.user.username)
+        namespace_resolver.clear()
+        with self.assertNumQueries(0):
+            namespace = Namespace.from_name(self.user.username)
+        self.assertEqual(namespace.type, 'user')
+
+    def test_unknown_name(self):
+        namespace = Namespace.from_name('unknown')
+        self.assertEqual(namespace.type, '')
+        self.assertIsNone(namespace.object)
+
+    def test_new_user_invalidates_missing_namespace(self):
+        Namespace.from_name('newuser')
+        user = UserFactory(username='newuser')
+        self.assertEqual(str(Namespace.from_name('newuser').id), str(user.pk))
+
+    def test_rename_invalidates_namespace(self):
+        old_username = self.user.username
+        Namespace.from_name(old_username)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertIsNone(Namespace.from_name(old_username).id)
+        self.assertEqual(Namespace.from_name('renamed').type, 'user')
@@ -1,7 +1,7 @@
 from django.shortcuts import redirect
-from django.urls import resolve
 from django.conf import settings
-from billing.models import Customer
+from actions.middleware import get_user_from_token_header
+from billing.status import get_subscription_status, INACTIVE
 
 
 class SubscriptionMiddleware(object):
@@ -9,18 +9,15 @@ class SubscriptionMiddleware(object):
         self.get_response = get_response
 
     def __call__(self, request):
-        try:
-            url_name = resolve(request.path).url_name
-            if url_name not in settings.SUBSCRIPTION_EXEMPT_URLS:
-                user = request.action.user
-                if (settings.ENABLE_BILLING
-                    and user
-                    and not user.is_staff):
-                    customer = user.customer
-                    if not customer.has_active_subscription():
-                        return redirect("subscription-required",
-                                        namespace=user.username)
-        except Customer.DoesNotExist:
-            pass
-
         return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # url is already resolved when views are processed
+        if not settings.ENABLE_BILLING or request.resolver_match.url_name in settings.SUBSCRIPTION_EXEMPT_URLS:
+            return None
+        action = getattr(request, 'action', None)
+        # requests excluded from action recording don't have an action
+        user = action.user if action is not None else get_user_from_token_header(request)
+        if user and not user.is_staff and get_subscription_status(user.pk) == INACTIVE:
+            return redirect("subscription-required", namespace=user.username)
+        return None
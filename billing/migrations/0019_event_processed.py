@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0018_auto_20170606_1407'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='processed',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -37,11 +37,12 @@ class Event(StripeModel):
     pending_webhooks = models.PositiveIntegerField(default=0)
     request = models.CharField(max_length=100)
     event_type = models.CharField(max_length=255)
+    processed = models.BooleanField(default=False, db_index=True)
 
 
 class CustomerQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(user=namespace.object)
+        return self.filter(user_id=namespace.id)
 
 
 class Customer(StripeModel):
@@ -143,7 +144,7 @@ class Plan(StripeModel):
 
 class SubscriptionQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(customer__user=namespace.object)
+        return self.filter(customer__user_id=namespace.id)
 
 
 class Subscription(StripeModel):
@@ -178,7 +179,7 @@ class Subscription(StripeModel):
 
 class InvoiceQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(customer__user=namespace.object)
+        return self.filter(customer__user_id=namespace.id)
 
 
 class Invoice(StripeModel):
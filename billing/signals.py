@@ -1,6 +1,9 @@
 from django.conf import settings
 from django.contrib.auth.signals import user_logged_in
-from billing.models import Customer
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from billing.models import Customer, Subscription
+from billing.status import cache_subscription_status, invalidate_subscription_status
 from billing.stripe_utils import create_stripe_customer_from_user
 import logging
 log = logging.getLogger('billing')
@@ -17,3 +20,17 @@ def check_if_customer_exists_for_user(sender, **kwargs):
             create_stripe_customer_from_user(user)
 
 user_logged_in.connect(check_if_customer_exists_for_user)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def update_subscription_status(sender, instance, **kwargs):
+    user_id = Customer.objects.filter(pk=instance.customer_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        cache_subscription_status(user_id)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_subscription_status(sender, instance, **kwargs):
+    invalidate_subscription_status(instance.user_id)
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from billing.models import Customer, Subscription
+
+KEY = 'subscription_status:{}'
+
+ACTIVE = 'active'
+INACTIVE = 'inactive'
+NO_CUSTOMER = 'no_customer'
+
+
+def get_subscription_status(user_id) -> str:
+    status = cache.get(KEY.format(user_id))
+    if status is None:
+        status = cache_subscription_status(user_id)
+    return status
+
+
+def cache_subscription_status(user_id) -> str:
+    """
+    Stores subscription status of the user until the current period of active subscriptions ends
+    """
+    timeout = settings.SUBSCRIPTION_STATUS_CACHE_TTL
+    if not Customer.objects.filter(user_id=user_id).exists():
+        status = NO_CUSTOMER
+    else:
+        period_ends = list(Subscription.objects.filter(
+            customer__user_id=user_id,
+            status__in=[Subscription.TRIAL, Subscription.ACTIVE],
+        ).values_list('current_period_end', flat=True))
+        status = ACTIVE if period_ends else INACTIVE
+        period_ends = [end for end in period_ends if end is not None]
+        if period_ends:
+            remaining = (max(period_ends) - timezone.now()).total_seconds()
+            # renewal might not be synced yet when the period is already over
+            timeout = max(int(remaining), settings.SUBSCRIPTION_STATUS_CACHE_TTL)
+    cache.set(KEY.format(user_id), status, timeout)
+    return status
+
+
+def invalidate_subscription_status(user_id) -> None:
+    cache.delete(KEY.format(user_id))
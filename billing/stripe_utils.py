@@ -1,9 +1,11 @@
 import logging
+import time
 import stripe
 from datetime import datetime
-from django.db import models
+from django.db import models, connection
 from django.conf import settings
 from django.utils import timezone
+from django_redis import get_redis_connection
 
 from billing.models import (Customer, Invoice,
                             Plan, Subscription,
@@ -13,71 +15,147 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 log = logging.getLogger('billing')
 
 
-def handle_foreign_key_field(stripe_data, stripe_field, model_field):
-    init_value = stripe_data.get(stripe_field)
-    final_value = None
-    identifier = None
-
-    if init_value is not None:
-        if isinstance(init_value, dict):
-            identifier = init_value.get("id")
-
-        elif isinstance(init_value, model_field.related_model):
-            final_value = init_value
-
-        else:
-            identifier = init_value
-
-        if hasattr(model_field.related_model, "stripe_id"):
-            kwargs = {'stripe_id': identifier}
-        elif final_value is None:
-            kwargs = {'pk': identifier}
-
-        if final_value is None:
-            final_value = model_field.related_model.objects.filter(**kwargs).first()
-
-    return final_value
-
-
-def convert_field_to_stripe(model, stripe_field, stripe_data):
-    field_name = "stripe_id" if stripe_field == "id" else stripe_field
-    value = stripe_data.get(stripe_field)
-
-    # Seems inefficient
-    all_model_field_names = [f.name for f in model._meta.get_fields()]
-    if field_name in all_model_field_names:
-        model_field = model._meta.get_field(field_name)
-    else:
-        model_field = field_name = value = None
-
-    # Not sure how to handle many to many fields just yet. Not sure we will have to.
-    # I've really come to hate this following block.
-    # Will have to think about how to clean it up.
-    # I'm guessing it's also not very performant
-    if (model_field is not None and
-        (model_field.is_relation and not model_field.many_to_many)):
-
-        value = handle_foreign_key_field(stripe_data,
-                                         stripe_field,
-                                         model_field)
-
-    elif isinstance(model_field, models.DateTimeField):
-        if value is not None:
-            value = datetime.fromtimestamp(value)
-            value = timezone.make_aware(value)
-
-    return (field_name, value)
+class ConversionPlan(object):
+    """
+    How stripe objects map to fields of a model: stripe key -> (field name, converter),
+    plus relations, which are resolved in bulk for a list of objects.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = {}
+        self.relations = {}
+        for field in model._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            stripe_field = "id" if field.name == "stripe_id" else field.name
+            if field.is_relation:
+                self.relations[stripe_field] = field
+            elif isinstance(field, models.DateTimeField):
+                self.fields[stripe_field] = (field.name, convert_timestamp)
+            else:
+                self.fields[stripe_field] = (field.name, None)
+
+    def convert(self, stripe_objs) -> list:
+        related = self._resolve_relations(stripe_objs)
+        converted_objs = []
+        for stripe_obj in stripe_objs:
+            converted = {}
+            for stripe_field, value in stripe_obj.items():
+                if stripe_field in self.fields:
+                    field_name, converter = self.fields[stripe_field]
+                    converted[field_name] = converter(value) if converter is not None else value
+                elif stripe_field in self.relations:
+                    field = self.relations[stripe_field]
+                    converted[field.name] = self._get_related(field, value, related[stripe_field])
+            converted_objs.append(converted)
+        return converted_objs
+
+    def _resolve_relations(self, stripe_objs) -> dict:
+        """
+        Loads related objects of all stripe objects with one query per relation
+        """
+        related = {}
+        for stripe_field, field in self.relations.items():
+            identifiers = {get_identifier(obj.get(stripe_field)) for obj in stripe_objs} - {None}
+            if not identifiers:
+                related[stripe_field] = {}
+                continue
+            lookup = "stripe_id" if hasattr(field.related_model, "stripe_id") else "pk"
+            objects = field.related_model.objects.in_bulk(identifiers, field_name=lookup)
+            related[stripe_field] = {str(key): obj for key, obj in objects.items()}
+        return related
+
+    @staticmethod
+    def _get_related(field, value, related):
+        if isinstance(value, field.related_model):
+            return value
+        identifier = get_identifier(value)
+        return related.get(identifier) if identifier is not None else None
+
+
+def get_identifier(value):
+    if value is None or isinstance(value, models.Model):
+        return None
+    if isinstance(value, dict):
+        value = value.get("id")
+    return str(value) if value is not None else None
+
+
+def convert_timestamp(value):
+    if value is None:
+        return None
+    return timezone.make_aware(datetime.fromtimestamp(value))
+
+
+_conversion_plans = {}
+
+
+def get_conversion_plan(model) -> ConversionPlan:
+    if model not in _conversion_plans:
+        _conversion_plans[model] = ConversionPlan(model)
+    return _conversion_plans[model]
+
+
+def convert_stripe_objects(model, stripe_objs) -> list:
+    return get_conversion_plan(model).convert(list(stripe_objs))
 
 
 def convert_stripe_object(model, stripe_obj):
-    dict_tuples = [convert_field_to_stripe(model, field, stripe_obj)
-                   for field in stripe_obj]
-    converted = dict(tup for tup in dict_tuples if tup[0] is not None)
-    if "created" not in converted:
-        converted['created'] = timezone.make_aware(datetime.now())
+    """
+    Converts a stripe object for creating a new row
+    """
+    converted = convert_stripe_objects(model, [stripe_obj])[0]
+    converted.setdefault('created', timezone.now())
     return converted
 
 
+def bulk_upsert(model, instances, fields, create=True):
+    """
+    Updates rows which already exist by stripe_id, and creates the rest with bulk_create
+    (unless `create` is False). `fields` holds names of fields to update for every instance,
+    instances with the same fields are updated with one UPDATE. Signals are not sent.
+    """
+    if not instances:
+        return
+    fields_by_stripe_id = {instance.stripe_id: fields for instance, fields in zip(instances, fields)}
+    by_stripe_id = {instance.stripe_id: instance for instance in instances}
+    existing = set(model.objects.filter(stripe_id__in=by_stripe_id).values_list('stripe_id', flat=True))
+    new = [instance for stripe_id, instance in by_stripe_id.items() if stripe_id not in existing]
+    if create and new:
+        for instance in new:
+            # stripe doesn't send created for every object, updates keep the stored value
+            if instance.created is None:
+                instance.created = timezone.now()
+        model.objects.bulk_create(new)
+    shapes = {}
+    for stripe_id in existing:
+        names = frozenset(fields_by_stripe_id[stripe_id]) - {'id', 'stripe_id'}
+        if names:
+            shapes.setdefault(names, []).append(by_stripe_id[stripe_id])
+    for names, shape_instances in shapes.items():
+        _bulk_update(model, shape_instances, [model._meta.get_field(name) for name in sorted(names)])
+
+
+def _bulk_update(model, instances, update_fields):
+    columns = [model._meta.get_field('stripe_id')] + update_fields
+    quote = connection.ops.quote_name
+    rows, params = [], []
+    for instance in instances:
+        rows.append('({})'.format(', '.join(['%s'] * len(columns))))
+        params.extend(field.get_db_prep_save(getattr(instance, field.attname), connection) for field in columns)
+    sql = 'UPDATE {table} SET {assignments} FROM (VALUES {rows}) AS v ({columns}) WHERE {table}.{key} = v.{key}'.format(
+        table=quote(model._meta.db_table),
+        assignments=', '.join('{0} = v.{0}::{1}'.format(quote(field.column), field.db_type(connection))
+                              for field in update_fields),
+        rows=', '.join(rows),
+        columns=', '.join(quote(field.column) for field in columns),
+        key=quote('stripe_id'),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
 def create_stripe_customer_from_user(auth_user):
     stripe_response = stripe.Customer.create(description=auth_user.first_name + " " + auth_user.last_name,
                                              email=auth_user.email)
@@ -149,20 +227,53 @@ def create_card_in_stripe(validated_data, user=None):
     return Card.objects.create(**converted_data)
 
 
-def sync_invoices_for_customer(customer):
-    stripe_invoices = stripe.Invoice.list(customer=customer.stripe_id)
+def wait_for_stripe_rate_limit():
+    """
+    Blocks until a request to stripe fits into STRIPE_API_RATE_LIMIT requests per second,
+    which is shared by all processes through redis.
+    """
+    cache = get_redis_connection("default")
+    while True:
+        now = time.time()
+        key = 'stripe_requests:{}'.format(int(now))
+        pipe = cache.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, 2)
+        count = pipe.execute()[0]
+        if count <= settings.STRIPE_API_RATE_LIMIT:
+            return
+        time.sleep(1 - now % 1)
 
+
+def sync_invoices_for_customer(customer):
+    """
+    Fetches invoices created since the last sync page by page and upserts every page in bulk.
+    Invoices changed later are updated by webhooks.
+    """
+    sync_started = timezone.now()
+    params = {'customer': customer.stripe_id, 'limit': settings.STRIPE_SYNC_PAGE_SIZE}
+    if customer.last_invoice_sync is not None:
+        params['created'] = {'gte': int(customer.last_invoice_sync.timestamp())}
+
+    wait_for_stripe_rate_limit()
+    page = []
+    for stp_invoice in stripe.Invoice.list(**params).auto_paging_iter():
+        page.append(stp_invoice)
+        if len(page) == settings.STRIPE_SYNC_PAGE_SIZE:
+            _save_invoices(page)
+            page = []
+            # next page is requested when iteration continues
+            wait_for_stripe_rate_limit()
+    _save_invoices(page)
+
+    customer.last_invoice_sync = sync_started
+    customer.save(update_fields=['last_invoice_sync'])
+
+
+def _save_invoices(stripe_invoices):
+    if not stripe_invoices:
+        return
     for stp_invoice in stripe_invoices:
         stp_invoice['invoice_date'] = stp_invoice['date']
-        converted_data = convert_stripe_object(Invoice, stp_invoice)
-        tbs_invoice = Invoice.objects.filter(stripe_id=converted_data['stripe_id']).first()
-        if tbs_invoice is not None:
-            for key in converted_data:
-                setattr(tbs_invoice, key, converted_data[key])
-        else:
-            tbs_invoice = Invoice(**converted_data)
-
-        tbs_invoice.save()
-
-    customer.last_invoice_sync = timezone.make_aware(datetime.now())
-    customer.save()
+    converted = convert_stripe_objects(Invoice, stripe_invoices)
+    bulk_upsert(Invoice, [Invoice(**converted_data) for converted_data in converted], converted)
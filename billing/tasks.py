@@ -0,0 +1,38 @@
+import logging
+
+import stripe
+from celery import shared_task, group
+from django.conf import settings
+
+from .models import Customer
+from .stripe_utils import sync_invoices_for_customer
+from .webhooks import process_events
+
+log = logging.getLogger('billing')
+
+
+@shared_task()
+def process_stripe_events():
+    while process_events():
+        pass
+
+
+@shared_task()
+def sync_invoices():
+    """
+    Fallback for missed webhooks, syncs invoices of all customers in parallel chunks
+    """
+    customer_ids = [str(pk) for pk in Customer.objects.values_list('pk', flat=True)]
+    size = settings.STRIPE_SYNC_CHUNK_SIZE
+    group(
+        sync_customers_invoices.s(customer_ids[i:i + size]) for i in range(0, len(customer_ids), size)
+    ).apply_async()
+
+
+@shared_task()
+def sync_customers_invoices(customer_ids):
+    for customer in Customer.objects.filter(pk__in=customer_ids):
+        try:
+            sync_invoices_for_customer(customer)
+        except stripe.error.StripeError:
+            log.exception("Unable to sync invoices of customer %s", customer.stripe_id)
@@ -0,0 +1,56 @@
+class FakeListObject(object):
+    """
+    Stands in for stripe.ListObject, pages through given objects like stripe does
+    """
+
+    def __init__(self, objects, limit=10, fetched=None):
+        self.objects = objects
+        self.limit = limit
+        self.fetched = fetched if fetched is not None else []
+
+    def auto_paging_iter(self):
+        for start in range(0, len(self.objects), self.limit):
+            self.fetched.append(start)
+            yield from self.objects[start:start + self.limit]
+
+
+class FakeInvoiceAPI(object):
+    """
+    Local stub of stripe.Invoice.list, which filters invoices by customer and created[gte]
+    """
+
+    def __init__(self, invoices):
+        self.invoices = invoices
+        self.calls = []
+        self.pages = []
+
+    def list(self, customer=None, limit=10, created=None, **kwargs):
+        self.calls.append(dict(customer=customer, limit=limit, created=created, **kwargs))
+        invoices = [invoice for invoice in self.invoices if invoice['customer'] == customer]
+        if created is not None:
+            invoices = [invoice for invoice in invoices if invoice['created'] >= created['gte']]
+        return FakeListObject([dict(invoice) for invoice in invoices], limit=limit, fetched=self.pages)
+
+
+def make_invoice(number, customer, created=1498572100):
+    return {
+        'id': 'in_{}'.format(number),
+        'object': 'invoice',
+        'amount_due': 1000,
+        'attempt_count': 1,
+        'attempted': True,
+        'closed': True,
+        'created': created,
+        'currency': 'usd',
+        'customer': customer,
+        'date': created,
+        'livemode': False,
+        'metadata': {},
+        'paid': True,
+        'period_end': created,
+        'period_start': created - 30 * 24 * 3600,
+        'starting_balance': 0,
+        'subscription': None,
+        'subtotal': 1000,
+        'total': 1000,
+    }
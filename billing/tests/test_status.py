@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from billing.models import Subscription
+from billing.status import get_subscription_status, ACTIVE, INACTIVE, NO_CUSTOMER
+from billing.tests.factories import CustomerFactory, SubscriptionFactory
+from users.tests.factories import UserFactory
+
+
+class SubscriptionStatusTest(TestCase):
+    def setUp(self):
+        self.customer = CustomerFactory()
+        self.user_id = self.customer.user_id
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_no_customer(self):
+        self.assertEqual(get_subscription_status(UserFactory().pk), NO_CUSTOMER)
+
+    def test_status_is_cached(self):
+        self.assertEqual(get_subscription_status(self.user_id), INACTIVE)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_subscription_status(self.user_id), INACTIVE)
+
+    def test_subscription_change_updates_status(self):
+        get_subscription_status(self.user_id)
+        subscription = SubscriptionFactory(
+            customer=self.customer,
+            status=Subscription.ACTIVE,
+            current_period_end=timezone.now() + timedelta(days=30),
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(get_subscription_status(self.user_id), ACTIVE)
+        subscription.status = Subscription.CANCELED
+        subscription.save()
+        self.assertEqual(get_subscription_status(self.user_id), INACTIVE)
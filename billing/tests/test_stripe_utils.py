@@ -3,10 +3,11 @@ import logging
 from datetime import datetime
 from django.conf import settings
 from django.test import TestCase
+from django.utils import timezone
 
 from users.tests.factories import UserFactory
-from billing.models import Customer, Plan, Invoice
-from billing.tests.factories import PlanFactory
+from billing.models import Customer, Plan, Invoice, Subscription
+from billing.tests.factories import PlanFactory, CustomerFactory
 from billing import stripe_utils
 stripe.api_key = settings.STRIPE_SECRET_KEY
 log = logging.getLogger('billing')
@@ -73,3 +74,56 @@ class TestStripeUtils(TestCase):
         self.assertEqual(invoice.invoice_date.year, now.year)
         self.assertEqual(invoice.invoice_date.month, now.month)
         self.assertEqual(invoice.invoice_date.day, now.day)
+
+
+class TestConvertStripeObjects(TestCase):
+    def test_relations_are_resolved_in_one_query(self):
+        customers = CustomerFactory.create_batch(3)
+        stripe_invoices = [{
+            'id': 'in_{}'.format(i),
+            'customer': customer.stripe_id,
+            'subscription': None,
+            'date': 1498572100,
+            'total': 1000,
+            'unknown_field': 'ignored',
+        } for i, customer in enumerate(customers)]
+        with self.assertNumQueries(1):
+            converted = stripe_utils.convert_stripe_objects(Invoice, stripe_invoices)
+        self.assertEqual([data['customer'] for data in converted], customers)
+        self.assertEqual(converted[0]['stripe_id'], 'in_0')
+        self.assertIsNone(converted[0]['subscription'])
+        self.assertNotIn('unknown_field', converted[0])
+
+    def test_convert_stripe_object(self):
+        plan = PlanFactory()
+        converted = stripe_utils.convert_stripe_object(Subscription, {
+            'id': 'sub_1',
+            'plan': {'id': plan.stripe_id, 'object': 'plan'},
+            'current_period_end': 1498572100,
+        })
+        self.assertEqual(converted['plan'], plan)
+        self.assertEqual(converted['current_period_end'], timezone.make_aware(datetime.fromtimestamp(1498572100)))
+        self.assertIn('created', converted)
+
+
+class TestBulkUpsert(TestCase):
+    def test_only_given_fields_are_updated(self):
+        first, second = PlanFactory(), PlanFactory()
+        stripe_utils.bulk_upsert(Plan, [
+            Plan(stripe_id=first.stripe_id, name='renamed'),
+            Plan(stripe_id=second.stripe_id, amount=second.amount + 1),
+        ], [{'stripe_id', 'name'}, {'stripe_id', 'amount'}])
+        updated_first = Plan.objects.get(pk=first.pk)
+        updated_second = Plan.objects.get(pk=second.pk)
+        self.assertEqual(updated_first.name, 'renamed')
+        self.assertEqual(updated_first.amount, first.amount)
+        self.assertEqual(updated_second.amount, second.amount + 1)
+        self.assertEqual(updated_second.name, second.name)
+        self.assertEqual(updated_second.created, second.created)
+
+    def test_created_is_kept_on_update(self):
+        plan = PlanFactory()
+        converted = stripe_utils.convert_stripe_objects(Plan, [{'id': plan.stripe_id, 'name': 'renamed'}])
+        self.assertNotIn('created', converted[0])
+        stripe_utils.bulk_upsert(Plan, [Plan(**converted[0])], converted)
+        self.assertEqual(Plan.objects.get(pk=plan.pk).created, plan.created)
@@ -0,0 +1,63 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from billing.models import Invoice, Customer
+from billing.stripe_utils import sync_invoices_for_customer
+from billing.tasks import sync_customers_invoices
+from billing.tests.factories import CustomerFactory
+from billing.tests.stripe_stub import FakeInvoiceAPI, make_invoice
+
+
+@override_settings(STRIPE_SYNC_PAGE_SIZE=10)
+class SyncInvoicesTest(TestCase):
+    def setUp(self):
+        self.customers = CustomerFactory.create_batch(2)
+        self.api = FakeInvoiceAPI(
+            [make_invoice(i, self.customers[0].stripe_id, created=1498572100 + i) for i in range(25)] +
+            [make_invoice(100 + i, self.customers[1].stripe_id) for i in range(3)]
+        )
+        patcher = patch('billing.stripe_utils.stripe.Invoice', self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        get_redis_connection("default").flushall()
+
+    def test_sync_pages(self):
+        customer = self.customers[0]
+        # every page loads related customers, existing invoices and inserts new ones
+        with self.assertNumQueries(3 * 3 + 1):
+            sync_invoices_for_customer(customer)
+        self.assertEqual(self.api.pages, [0, 10, 20])
+        self.assertEqual(Invoice.objects.filter(customer=customer).count(), 25)
+        self.assertIsNotNone(Customer.objects.get(pk=customer.pk).last_invoice_sync)
+
+    def test_incremental_sync(self):
+        customer = self.customers[0]
+        customer.last_invoice_sync = timezone.make_aware(datetime.fromtimestamp(1498572100 + 20))
+        sync_invoices_for_customer(customer)
+        self.assertEqual(self.api.calls[0]['created'], {'gte': 1498572100 + 20})
+        self.assertEqual(Invoice.objects.count(), 5)
+
+    def test_sync_updates_existing(self):
+        sync_invoices_for_customer(self.customers[1])
+        Invoice.objects.update(paid=False)
+        sync_invoices_for_customer(Customer.objects.get(pk=self.customers[1].pk))
+        self.assertEqual(Invoice.objects.count(), 3)
+        self.assertTrue(all(invoice.paid for invoice in Invoice.objects.all()))
+
+    def test_sync_customers_invoices(self):
+        sync_customers_invoices([str(customer.pk) for customer in self.customers])
+        self.assertEqual(Invoice.objects.count(), 28)
+
+    @override_settings(STRIPE_API_RATE_LIMIT=2)
+    @patch('billing.stripe_utils.time.sleep')
+    def test_rate_limit(self, sleep):
+        # next second starts while sleeping
+        sleep.side_effect = lambda seconds: get_redis_connection("default").flushall()
+        sync_invoices_for_customer(self.customers[0])
+        self.assertTrue(sleep.called)
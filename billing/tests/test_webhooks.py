@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from billing.models import Event, Customer, Subscription, Invoice, Charge
+from billing.status import get_subscription_status, ACTIVE, INACTIVE
+from billing.tests.factories import CustomerFactory, PlanFactory
+from billing.webhooks import verify_signature, store_event, process_events, InvalidSignature
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def load_fixture(name):
+    return (FIXTURES_DIR / name).read_bytes()
+
+
+def sign(payload, secret=None, timestamp=None):
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    secret = secret or settings.STRIPE_WEBHOOK_SECRET
+    signature = hmac.new(secret.encode(), '{}.'.format(timestamp).encode() + payload, hashlib.sha256).hexdigest()
+    return 't={},v1={}'.format(timestamp, signature)
+
+
+class VerifySignatureTest(TestCase):
+    def setUp(self):
+        self.payload = load_fixture('customer_updated.json')
+
+    def test_valid_signature(self):
+        verify_signature(self.payload, sign(self.payload), settings.STRIPE_WEBHOOK_SECRET)
+
+    def test_wrong_secret(self):
+        with self.assertRaises(InvalidSignature):
+            verify_signature(self.payload, sign(self.payload, secret='other'), settings.STRIPE_WEBHOOK_SECRET)
+
+    def test_old_timestamp(self):
+        header = sign(self.payload, timestamp=int(time.time()) - 3600)
+        with self.assertRaises(InvalidSignature):
+            verify_signature(self.payload, header, settings.STRIPE_WEBHOOK_SECRET)
+
+    def test_missing_secret(self):
+        with self.assertRaises(InvalidSignature):
+            verify_signature(self.payload, sign(self.payload, secret='any'), None)
+
+    def test_malformed_header(self):
+        with self.assertRaises(InvalidSignature):
+            verify_signature(self.payload, 'garbage', settings.STRIPE_WEBHOOK_SECRET)
+
+
+class StripeWebhookViewTest(TestCase):
+    def setUp(self):
+        self.url = reverse('stripe-webhook')
+        self.payload = load_fixture('invoice_payment_succeeded.json')
+
+    def post(self, payload, signature):
+        return self.client.post(self.url, payload, content_type='application/json',
+                                HTTP_STRIPE_SIGNATURE=signature)
+
+    def test_event_is_stored_once(self):
+        response = self.post(self.payload, sign(self.payload))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.post(self.payload, sign(self.payload))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = Event.objects.get()
+        self.assertEqual(event.stripe_id, 'evt_1AbInvoicePaymentSucceeded')
+        self.assertEqual(event.event_type, 'invoice.payment_succeeded')
+
+    def test_invalid_signature(self):
+        response = self.post(self.payload, sign(self.payload, secret='other'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Event.objects.exists())
+
+
+class ProcessEventsTest(TestCase):
+    def setUp(self):
+        self.customer = CustomerFactory(stripe_id='cus_AxFixture', account_balance=0)
+        self.plan = PlanFactory(stripe_id='plan_AxFixture')
+        for name in ['customer_updated.json', 'subscription_updated.json',
+                     'invoice_payment_succeeded.json', 'charge_succeeded.json']:
+            store_event(json.loads(load_fixture(name).decode()))
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_process_events(self):
+        self.assertEqual(process_events(), 4)
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).account_balance, -500)
+        subscription = Subscription.objects.get(stripe_id='sub_AxFixture')
+        self.assertEqual(subscription.status, Subscription.ACTIVE)
+        self.assertEqual(subscription.plan, self.plan)
+        invoice = Invoice.objects.get(stripe_id='in_AxFixture')
+        self.assertEqual(invoice.subscription, subscription)
+        self.assertTrue(invoice.paid)
+        self.assertEqual(Charge.objects.get(stripe_id='ch_AxFixture').invoice, invoice)
+        self.assertFalse(Event.objects.filter(processed=False).exists())
+        self.assertEqual(get_subscription_status(self.customer.user_id), ACTIVE)
+
+    def test_reprocessing_updates_rows(self):
+        process_events()
+        Event.objects.update(processed=False)
+        Invoice.objects.update(paid=False)
+        self.assertEqual(process_events(), 4)
+        self.assertEqual(Invoice.objects.count(), 1)
+        self.assertTrue(Invoice.objects.get().paid)
+
+    def test_unknown_customer_is_not_created(self):
+        self.customer.delete()
+        process_events()
+        self.assertFalse(Customer.objects.exists())
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_partial_update_refreshes_subscription_status(self):
+        process_events()
+        self.assertEqual(get_subscription_status(self.customer.user_id), ACTIVE)
+        store_event({
+            'id': 'evt_AxCanceled',
+            'type': 'customer.subscription.deleted',
+            'created': int(time.time()),
+            'data': {'object': {'id': 'sub_AxFixture', 'object': 'subscription', 'status': Subscription.CANCELED}},
+        })
+        process_events()
+        self.assertEqual(Subscription.objects.get(stripe_id='sub_AxFixture').status, Subscription.CANCELED)
+        self.assertEqual(get_subscription_status(self.customer.user_id), INACTIVE)
@@ -1,11 +1,13 @@
 import logging
 import stripe
+import ujson
 
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 from rest_framework import viewsets, status, mixins
-from rest_framework.decorators import api_view
-from rest_framework.permissions import BasePermission
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny, BasePermission
 from rest_framework.response import Response
 
 from base.views import NamespaceMixin
@@ -14,6 +16,8 @@ from billing.models import (Plan, Customer,
                             Invoice)
 from billing.serializers import (PlanSerializer, CustomerSerializer, CardSerializer,
                                  SubscriptionSerializer, InvoiceSerializer)
+from billing.tasks import process_stripe_events
+from billing.webhooks import verify_signature, store_event, InvalidSignature
 log = logging.getLogger('billing')
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -137,6 +141,23 @@ class SubscriptionViewSet(NamespaceMixin,
         return Response(data=data, status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def stripe_webhook(request, *args, **kwargs):
+    payload = request.body
+    try:
+        verify_signature(payload, request.META.get('HTTP_STRIPE_SIGNATURE', ''), settings.STRIPE_WEBHOOK_SECRET)
+        data = ujson.loads(payload)
+    except (InvalidSignature, ValueError) as e:
+        log.warning("Rejected stripe webhook: {}".format(e))
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    event, created = store_event(data)
+    if created:
+        transaction.on_commit(process_stripe_events.delay)
+    return Response(status=status.HTTP_200_OK)
+
+
 @api_view(["GET", "POST"])
 def no_subscription(request, *args, **kwargs):
     return Response(status=status.HTTP_402_PAYMENT_REQUIRED)
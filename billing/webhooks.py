@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from billing.models import Event, Customer, Subscription, Invoice, Charge
+from billing.status import cache_subscription_status
+from billing.stripe_utils import convert_stripe_objects, bulk_upsert
+
+# stripe object type -> model, in the order in which they depend on each other
+OBJECT_MODELS = [
+    ('customer', Customer),
+    ('subscription', Subscription),
+    ('invoice', Invoice),
+    ('charge', Charge),
+]
+
+# fields which are required to create a row, objects without them can only update existing rows
+REQUIRED_RELATIONS = {
+    Subscription: ('customer', 'plan'),
+    Invoice: ('customer',),
+    Charge: ('invoice',),
+}
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+def verify_signature(payload: bytes, header: str, secret: str, tolerance=None) -> None:
+    """
+    Checks Stripe-Signature header the way stripe libraries do,
+    i.e. v1 signature is HMAC-SHA256 of "<timestamp>.<payload>"
+    """
+    if not secret:
+        raise InvalidSignature("Webhook secret is not configured")
+    tolerance = settings.STRIPE_WEBHOOK_TOLERANCE if tolerance is None else tolerance
+    try:
+        items = [item.split('=', 1) for item in header.split(',')]
+        timestamp = int(next(value for key, value in items if key == 't'))
+    except (AttributeError, ValueError, StopIteration):
+        raise InvalidSignature("Unable to parse signature header")
+    signatures = [value for key, value in items if key == 'v1']
+    signed_payload = '{}.'.format(timestamp).encode() + payload
+    expected = hmac.new(secret.encode(), signed_payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise InvalidSignature("No signature matches the payload")
+    if tolerance and timestamp < time.time() - tolerance:
+        raise InvalidSignature("Signature timestamp is too old")
+
+
+def store_event(data: dict):
+    """
+    Stores event unless it was already received. Returns the event and whether it was created.
+    """
+    request = data.get('request')
+    if isinstance(request, dict):
+        request = request.get('id')
+    return Event.objects.get_or_create(
+        stripe_id=data['id'],
+        defaults=dict(
+            created=timezone.make_aware(datetime.fromtimestamp(data['created'])),
+            livemode=data.get('livemode', False),
+            api_version=data.get('api_version') or '',
+            data=data.get('data'),
+            pending_webhooks=data.get('pending_webhooks') or 0,
+            request=request or '',
+            event_type=data['type'],
+        )
+    )
+
+
+def process_events(batch_size=None) -> int:
+    """
+    Folds unprocessed events into billing models. Returns the number of processed events.
+    """
+    batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+    with transaction.atomic():
+        events = list(Event.objects.select_for_update(skip_locked=True).filter(
+            processed=False
+        ).order_by('created')[:batch_size])
+        if not events:
+            return 0
+        apply_events(events)
+        Event.objects.filter(pk__in=[event.pk for event in events]).update(processed=True)
+    return len(events)
+
+
+def apply_events(events) -> None:
+    # later events carry newer state of the same object
+    latest = {}
+    for event in events:
+        obj = (event.data or {}).get('object') or {}
+        if 'id' in obj and 'object' in obj:
+            latest[(obj['object'], obj['id'])] = obj
+    for object_type, model in OBJECT_MODELS:
+        objects = [obj for (typ, _), obj in latest.items() if typ == object_type]
+        if objects:
+            _upsert_objects(model, objects)
+
+
+def _upsert_objects(model, objects) -> None:
+    relations = REQUIRED_RELATIONS.get(model, ())
+    complete, partial = [], []
+    complete_fields, partial_fields = [], []
+    if model is Invoice:
+        objects = [dict(obj, invoice_date=obj.get('date')) for obj in objects]
+    for converted in convert_stripe_objects(model, objects):
+        instance = model(**converted)
+        if all(getattr(instance, name + '_id') is not None for name in relations):
+            complete.append(instance)
+            complete_fields.append(set(converted))
+        else:
+            # related objects aren't known, so the row can only be updated if it already exists
+            partial.append(instance)
+            partial_fields.append(set(converted) - set(relations))
+    # customers are created only together with users
+    bulk_upsert(model, complete, complete_fields, create=model is not Customer)
+    bulk_upsert(model, partial, partial_fields, create=False)
+    if model is Subscription:
+        # subscription signals aren't sent for bulk updates, partial objects don't know their customer
+        user_ids = set(Subscription.objects.filter(
+            stripe_id__in=[instance.stripe_id for instance in complete + partial]
+        ).values_list('customer__user_id', flat=True))
+        for user_id in user_ids - {None}:
+            cache_subscription_status(user_id)
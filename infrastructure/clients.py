@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from docker import Client
+from docker.utils import kwargs_from_env
+
+logger = logging.getLogger(__name__)
+
+
+class DockerClientRegistry(object):
+    """
+    Process wide docker clients, one per docker host url.
+    Every client is a requests session, so it keeps its own pool of keep-alive connections.
+    Connections of tcp hosts are limited by DOCKER_CLIENT_MAX_CONNECTIONS, docker-py's unix socket
+    adapter doesn't allow sizing its pool.
+    """
+    LOCAL = 'local'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._checked_at = {}
+
+    def get(self, url=None) -> Client:
+        """
+        Returns client for docker host url, local docker (configured from env) when url is not given
+        """
+        key = url or self.LOCAL
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = self._create_client(url)
+                self._checked_at[key] = time.time()
+                return client
+            needs_check = time.time() - self._checked_at[key] > settings.DOCKER_CLIENT_HEALTH_CHECK_INTERVAL
+            if needs_check:
+                self._checked_at[key] = time.time()
+        if needs_check and not self._is_healthy(client):
+            logger.warning("Docker host '%s' didn't answer ping, reconnecting", key)
+            self.evict(url)
+            return self.get(url)
+        return client
+
+    def evict(self, url=None) -> None:
+        """
+        Forgets the client of url. It isn't closed because other threads may still be using it,
+        its connections are closed when it's garbage collected.
+        """
+        key = url or self.LOCAL
+        with self._lock:
+            self._clients.pop(key, None)
+            self._checked_at.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Closes all clients, only safe when no requests are in flight
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._checked_at.clear()
+        for client in clients:
+            client.close()
+
+    @staticmethod
+    def _create_client(url=None) -> Client:
+        kwargs = {'base_url': url} if url else kwargs_from_env()
+        client = Client(**kwargs)
+        adapter = client.get_adapter(client.base_url)
+        if client.base_url.startswith(('http://', 'https://')):
+            # num_pools of docker-py is the number of hosts, connections per host are limited by pool_maxsize
+            adapter._pool_maxsize = settings.DOCKER_CLIENT_MAX_CONNECTIONS
+            adapter.init_poolmanager(adapter._pool_connections, adapter._pool_maxsize, block=adapter._pool_block)
+        return client
+
+    @staticmethod
+    def _is_healthy(client) -> bool:
+        try:
+            client.ping()
+        except Exception:
+            return False
+        return True
+
+
+docker_clients = DockerClientRegistry()
+
+
+def get_docker_client(host=None) -> Client:
+    """
+    Shared client for a DockerHost, or for local docker when host is None
+    """
+    return docker_clients.get(host.url if host is not None else None)
@@ -3,4 +3,4 @@ from django.db import models
 
 class DockerHostQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(owner=namespace.object)
+        return self.filter(owner_id=namespace.id)
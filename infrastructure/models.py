@@ -1,9 +1,9 @@
 import logging
 from django.conf import settings
 from django.db import models
-from docker import Client
 from docker.errors import APIError
 
+from .clients import docker_clients
 from .managers import DockerHostQuerySet
 
 
@@ -32,7 +32,7 @@ class DockerHost(models.Model):
 
     @property
     def client(self):
-        return Client(base_url=self.url)
+        return docker_clients.get(self.url)
 
     @property
     def status(self):
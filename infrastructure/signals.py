@@ -0,0 +1,17 @@
+from django.db.models.signals import pre_save, post_delete
+from django.dispatch import receiver
+
+from .clients import docker_clients
+from .models import DockerHost
+
+
+@receiver(pre_save, sender=DockerHost)
+def evict_moved_host_client(sender, instance, **kwargs):
+    old = DockerHost.objects.filter(pk=instance.pk).only('ip', 'port').first()
+    if old is not None and old.url != instance.url:
+        docker_clients.evict(old.url)
+
+
+@receiver(post_delete, sender=DockerHost)
+def evict_deleted_host_client(sender, instance, **kwargs):
+    docker_clients.evict(instance.url)
@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from infrastructure.clients import docker_clients
+from .factories import DockerHostFactory
+
+
+class TestDockerClientRegistry(TestCase):
+    def tearDown(self):
+        docker_clients.clear()
+
+    def test_client_is_reused(self):
+        host = DockerHostFactory()
+        self.assertIs(host.client, host.client)
+        self.assertIs(host.client, DockerHostFactory.build(ip=host.ip, port=host.port).client)
+
+    def test_client_per_url(self):
+        host = DockerHostFactory()
+        other = DockerHostFactory(port=2376)
+        self.assertIsNot(host.client, other.client)
+
+    @override_settings(DOCKER_CLIENT_MAX_CONNECTIONS=7)
+    def test_connections_per_host(self):
+        host = DockerHostFactory()
+        adapter = host.client.get_adapter(host.client.base_url)
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'], 7)
+
+    def test_evict_on_delete(self):
+        host = DockerHostFactory()
+        client = host.client
+        host.delete()
+        self.assertIsNot(client, docker_clients.get(host.url))
+
+    def test_evict_on_address_change(self):
+        host = DockerHostFactory()
+        client = host.client
+        old_url = host.url
+        host.ip = '127.0.0.2'
+        host.save()
+        self.assertIsNot(client, docker_clients.get(old_url))
+
+    @override_settings(DOCKER_CLIENT_HEALTH_CHECK_INTERVAL=-1)
+    def test_unhealthy_client_is_replaced(self):
+        host = DockerHostFactory()
+        client = docker_clients.get(host.url)
+        with patch.object(client, 'ping', side_effect=ConnectionError):
+            self.assertIsNot(client, docker_clients.get(host.url))
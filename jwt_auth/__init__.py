@@ -0,0 +1 @@
+default_app_config = 'jwt_auth.apps.JwtAuthConfig'
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class JwtAuthConfig(AppConfig):
     name = 'jwt_auth'
+
+    def ready(self):
+        import jwt_auth.signals
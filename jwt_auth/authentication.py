@@ -0,0 +1,183 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+from django_redis import get_redis_connection
+from django.utils.translation import ugettext as _
+from rest_framework import authentication, exceptions
+from rest_framework_jwt import authentication as jwt_authentication
+from rest_framework_jwt.settings import api_settings
+
+jwt_decode_handler = api_settings.JWT_DECODE_HANDLER
+
+
+class TokenCache(object):
+    """
+    LRU of authentication results for verified tokens, keyed by token hash.
+    Entries expire with the token, but live at most AUTH_TOKEN_CACHE_TTL seconds.
+    Users and tokens are stored as field values and every hit gets fresh instances,
+    so that requests can't see each other's changes.
+    Evictions bump a version in redis, other processes drop their entries when they notice
+    the new version, which they check every AUTH_TOKEN_CACHE_CHECK_INTERVAL seconds.
+    """
+    VERSION_KEY = 'auth_token_cache:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = 0
+
+    def get(self, token):
+        self._check_version()
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return _thaw(result)
+
+    def set(self, token, result, expires_at=None):
+        max_expires_at = time.time() + settings.AUTH_TOKEN_CACHE_TTL
+        expires_at = min(expires_at, max_expires_at) if expires_at else max_expires_at
+        key = self._key(token)
+        result = _freeze(result)
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def evict(self, token):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+        self._bump_version()
+
+    def evict_user(self, user_pk):
+        with self._lock:
+            for key, (((model, user_values), auth), expires_at) in list(self._entries.items()):
+                if user_values[model._meta.pk.attname] == user_pk:
+                    del self._entries[key]
+        self._bump_version()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._checked_at = 0
+
+    def _check_version(self):
+        if time.time() - self._checked_at < settings.AUTH_TOKEN_CACHE_CHECK_INTERVAL:
+            return
+        version = get_redis_connection("default").get(self.VERSION_KEY)
+        with self._lock:
+            if version != self._version:
+                # something was evicted in another process
+                self._entries.clear()
+            self._version, self._checked_at = version, time.time()
+
+    def _bump_version(self):
+        version = str(get_redis_connection("default").incr(self.VERSION_KEY)).encode()
+        with self._lock:
+            # own evictions are already applied
+            self._version = version
+
+    @staticmethod
+    def _key(token) -> str:
+        if isinstance(token, str):
+            token = token.encode()
+        return hashlib.sha256(token).hexdigest()
+
+
+def _freeze(result):
+    user, auth = result
+    return _model_values(user), _model_values(auth) if isinstance(auth, models.Model) else auth
+
+
+def _thaw(result):
+    user_values, auth = result
+    user = _from_values(user_values)
+    if isinstance(auth, tuple):
+        auth = _from_values(auth)
+        # token of TokenAuthentication
+        auth.user = user
+    return user, auth
+
+
+def _model_values(instance) -> tuple:
+    return type(instance), {field.attname: getattr(instance, field.attname)
+                            for field in instance._meta.concrete_fields}
+
+
+def _from_values(values):
+    model, field_values = values
+    return model.from_db(DEFAULT_DB_ALIAS, list(field_values), list(field_values.values()))
+
+
+token_cache = TokenCache()
+
+
+class RequestCachedAuthentication(object):
+    """
+    Remembers authentication result on the request, so that ActionMiddleware and DRF
+    authenticate every request only once.
+    """
+
+    def authenticate(self, request):
+        request = getattr(request, '_request', request)
+        results = request.__dict__.setdefault('_authentication_results', {})
+        name = type(self).__name__
+        if name not in results:
+            try:
+                results[name] = self.authenticate_request(request)
+            except exceptions.AuthenticationFailed as e:
+                results[name] = e
+        result = results[name]
+        if isinstance(result, exceptions.AuthenticationFailed):
+            raise result
+        return result
+
+    def authenticate_request(self, request):
+        return super().authenticate(request)
+
+
+class TokenAuthentication(RequestCachedAuthentication, authentication.TokenAuthentication):
+    def authenticate_credentials(self, key):
+        result = token_cache.get(key)
+        if result is None:
+            result = super().authenticate_credentials(key)
+            token_cache.set(key, result)
+        return result
+
+
+class JSONWebTokenAuthentication(RequestCachedAuthentication, jwt_authentication.JSONWebTokenAuthentication):
+    def authenticate_request(self, request):
+        jwt_value = self.get_jwt_value(request)
+        if jwt_value is None:
+            return None
+        return self.authenticate_jwt(jwt_value)
+
+    def authenticate_jwt(self, jwt_value):
+        result = token_cache.get(jwt_value)
+        if result is not None:
+            return result
+        try:
+            payload = jwt_decode_handler(jwt_value)
+        except jwt.ExpiredSignature:
+            raise exceptions.AuthenticationFailed(_('Signature has expired.'))
+        except jwt.DecodeError:
+            raise exceptions.AuthenticationFailed(_('Error decoding signature.'))
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed()
+        result = (self.authenticate_credentials(payload), jwt_value)
+        token_cache.set(jwt_value, result, payload.get('exp'))
+        return result
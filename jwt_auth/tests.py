@@ -1,3 +1,86 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_jwt.settings import api_settings
+
+from users.tests.factories import UserFactory
+from .authentication import TokenAuthentication, JSONWebTokenAuthentication, TokenCache, token_cache
+
+jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
+jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
+
+
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.jwt = jwt_encode_handler(jwt_payload_handler(self.user))
+        self.factory = APIRequestFactory()
+        token_cache.clear()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_jwt_is_decoded_once_per_request(self):
+        request = self.factory.get('/', HTTP_AUTHORIZATION='JWT {}'.format(self.jwt))
+        with patch('jwt_auth.authentication.jwt_decode_handler', wraps=api_settings.JWT_DECODE_HANDLER) as decode:
+            user, _ = JSONWebTokenAuthentication().authenticate(request)
+            JSONWebTokenAuthentication().authenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_jwt_is_cached_between_requests(self):
+        JSONWebTokenAuthentication().authenticate_jwt(self.jwt)
+        request = self.factory.get('/', HTTP_AUTHORIZATION='JWT {}'.format(self.jwt))
+        with self.assertNumQueries(0):
+            user, _ = JSONWebTokenAuthentication().authenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_invalid_jwt(self):
+        request = self.factory.get('/', HTTP_AUTHORIZATION='JWT invalid')
+        with self.assertRaises(AuthenticationFailed):
+            JSONWebTokenAuthentication().authenticate(request)
+        with self.assertRaises(AuthenticationFailed):
+            JSONWebTokenAuthentication().authenticate(request)
+
+    def test_token_is_cached_between_requests(self):
+        key = self.user.auth_token.key
+        TokenAuthentication().authenticate_credentials(key)
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token {}'.format(key))
+        with self.assertNumQueries(0):
+            user, _ = TokenAuthentication().authenticate(request)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_deleted_token_is_evicted(self):
+        key = self.user.auth_token.key
+        TokenAuthentication().authenticate_credentials(key)
+        self.user.auth_token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            TokenAuthentication().authenticate_credentials(key)
+
+    def test_user_change_is_evicted(self):
+        key = self.user.auth_token.key
+        TokenAuthentication().authenticate_credentials(key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(token_cache.get(key))
+
+    def test_cached_users_are_not_shared(self):
+        key = self.user.auth_token.key
+        user, token = TokenAuthentication().authenticate_credentials(key)
+        user.first_name = 'changed'
+        cached_user, cached_token = TokenAuthentication().authenticate_credentials(key)
+        self.assertIsNot(cached_user, user)
+        self.assertNotEqual(cached_user.first_name, 'changed')
+        self.assertIs(cached_token.user, cached_user)
+
+    @override_settings(AUTH_TOKEN_CACHE_CHECK_INTERVAL=0)
+    def test_eviction_reaches_other_processes(self):
+        key = self.user.auth_token.key
+        other_process = TokenCache()
+        self.assertIsNone(other_process.get(key))
+        other_process.set(key, TokenAuthentication().authenticate_credentials(key))
+        self.assertIsNotNone(other_process.get(key))
+        self.user.auth_token.delete()
+        self.assertIsNone(other_process.get(key))
@@ -0,0 +1,120 @@
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import FileBlob, ProjectFile, user_project_directory_path
+
+log = logging.getLogger('projects')
+
+# ioctl cloning a file on copy-on-write filesystems, e.g. btrfs and xfs
+FICLONE = 0x40049409
+
+
+def file_digest(content) -> str:
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def store_blob(content) -> FileBlob:
+    """
+    Returns the blob with the same content, storing content only if there is none yet.
+    The blob's refcount is incremented for the caller.
+    """
+    digest = file_digest(content)
+    if FileBlob.objects.filter(digest=digest).update(refcount=F('refcount') + 1):
+        return FileBlob.objects.get(digest=digest)
+    blob = FileBlob(digest=digest, size=content.size, refcount=1)
+    blob.file.save(digest, content, save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # the same content was stored concurrently
+        blob.file.delete(save=False)
+        return store_blob(content)
+    return blob
+
+
+def release_blob(blob_id) -> None:
+    """
+    Decrements the blob's refcount and deletes the blob when it is not referenced anymore
+    """
+    with transaction.atomic():
+        FileBlob.objects.filter(pk=blob_id).update(refcount=F('refcount') - 1)
+        unused = FileBlob.objects.select_for_update().filter(pk=blob_id, refcount=0).first()
+        if unused is None:
+            return
+        name = unused.file.name
+        unused.delete()
+        transaction.on_commit(lambda: unused.file.storage.delete(name))
+    log.info("Deleted unreferenced blob {digest}".format(digest=unused.digest))
+
+
+def copy_blob(blob: FileBlob, name: str) -> str:
+    """
+    Copies the blob's content to a project file, returns the name it got.
+    Project files are mounted by servers and changed in place, so they never share data with the blob,
+    local copies are reflinks where the filesystem supports them.
+    """
+    storage = ProjectFile._meta.get_field('file').storage
+    name = storage.get_available_name(name, max_length=ProjectFile._meta.get_field('file').max_length)
+    if isinstance(storage, FileSystemStorage) and isinstance(blob.file.storage, FileSystemStorage):
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(blob.file.path, 'rb') as src, open(path, 'xb') as dst:
+                if not _reflink(src, dst):
+                    shutil.copyfileobj(src, dst, settings.FILE_UPLOAD_BUFFER_SIZE)
+        except FileExistsError:
+            # the name was taken meanwhile, storage picks another one
+            pass
+        else:
+            if storage.file_permissions_mode is not None:
+                os.chmod(path, storage.file_permissions_mode)
+            return name
+    with blob.file.storage.open(blob.file.name, 'rb') as f:
+        return storage.save(name, f)
+
+
+def _reflink(src, dst) -> bool:
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def set_file_content(project_file: ProjectFile, content) -> None:
+    """
+    Points a project file at content. With FILE_BLOB_STORE content is deduplicated
+    and project files with equal content share one blob.
+    """
+    if not settings.FILE_BLOB_STORE:
+        project_file.file = content
+        return
+    storage = ProjectFile._meta.get_field('file').storage
+    name = storage.generate_filename(user_project_directory_path(project_file, content.name))
+    project_file.blob = store_blob(content)
+    project_file.file = copy_blob(project_file.blob, name)
+    project_file.size = project_file.blob.size
+
+
+def release_file_content(project_file: ProjectFile) -> None:
+    """
+    Releases content of a project file which is going to be replaced
+    """
+    project_file.file.delete(save=False)
+    if project_file.blob_id is not None:
+        release_blob(project_file.blob_id)
+        project_file.blob = None
@@ -0,0 +1,103 @@
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Returns first and last byte of a single byte range or None when the whole file should be sent
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        # multiple ranges or other units
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range, last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        raise RangeNotSatisfiable()
+    return first, last
+
+
+def read_range(f, first, last, chunk_size):
+    try:
+        f.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def file_download_response(request, project_file):
+    """
+    Streams a project file with support for single byte ranges and conditional requests.
+    Local files are sent by nginx when FILE_DOWNLOAD_INTERNAL_LOCATION is set.
+    """
+    field_file = project_file.file
+    storage = field_file.storage
+    filename = os.path.basename(field_file.name)
+    if settings.FILE_DOWNLOAD_INTERNAL_LOCATION and isinstance(storage, FileSystemStorage):
+        # nginx handles ranges and conditional requests itself
+        response = HttpResponse()
+        del response['Content-Type']
+        response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_INTERNAL_LOCATION + quote(field_file.name)
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+        return response
+
+    size = storage.size(field_file.name)
+    last_modified = int(storage.get_modified_time(field_file.name).timestamp())
+    etag = quote_etag(hashlib.md5('{}:{}:{}'.format(field_file.name, size, last_modified).encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range in (etag, http_date(last_modified))):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+
+    first, last = byte_range or (0, size - 1)
+    content = read_range(storage.open(field_file.name, 'rb'), first, last, settings.FILE_DOWNLOAD_CHUNK_SIZE)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = StreamingHttpResponse(content, content_type=content_type, status=206 if byte_range else 200)
+    if byte_range:
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, size)
+    response['Content-Length'] = str(max(last - first + 1, 0))
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
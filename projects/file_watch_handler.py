@@ -1,38 +1,229 @@
+import json
 import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+import uuid
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from projects.models import Project, ProjectFile
+from django.db import IntegrityError, close_old_connections, transaction
+from projects.models import Project, ProjectFile, stored_file_size, update_file_sizes
 log = logging.getLogger('projects')
 User = get_user_model()
 
 
-def run(files_list):
+def coalesce(files_list) -> dict:
+    """
+    File name -> whether it exists, later events of the same file win
+    """
+    return {file_line['name']: file_line['exists'] for file_line in files_list}
+
+
+class FileWatchHandler(object):
+    """
+    Applies file changes reported by watchman to project files.
+    Users and projects are looked up once and remembered.
+    """
 
-    for file_line in files_list:
-        line = file_line['name']
-        to_delete = not file_line['exists']
-        path_parts = line.split("/")
+    def __init__(self):
+        self._user_ids = {}
+        self._project_ids = set()
 
-        username = path_parts[0]
-        project_pk = path_parts[1]
+    def clear(self):
+        self._user_ids.clear()
+        self._project_ids.clear()
 
-        user = User.objects.get(username=username)
-        project = Project.objects.get(pk=project_pk)
+    def apply(self, changes: dict) -> None:
+        try:
+            self._apply(changes)
+        except IntegrityError:
+            # remembered project may have been deleted meanwhile
+            log.warning("Failed to apply file changes, retrying with fresh lookups")
+            self.clear()
+            self._apply(changes)
 
-        if to_delete:
-            proj_file = ProjectFile.objects.filter(author=user,
-                                                   project=project,
-                                                   file=line).first()
-            if proj_file is None:
-                log.warning("It seems like you're attempting to delete a file that doesn't"
-                            "exist in the database anymore (or never did) {fname}".format(fname=line))
+    def _apply(self, changes):
+        owners = {}
+        for name in changes:
+            parts = name.split('/')
+            # files in dot dirs, like the upload staging dir, the blob store or .git, aren't project files
+            if len(parts) < 3 or any(part.startswith('.') for part in parts[:-1]) or not _is_uuid(parts[1]):
+                log.warning("Ignoring file outside of projects {fname}".format(fname=name))
+                continue
+            owners[name] = (parts[0], parts[1])
+        self._lookup_users({username for username, _ in owners.values()})
+        self._lookup_projects({project_id for _, project_id in owners.values()})
+        created, deleted = [], []
+        for name, (username, project_id) in owners.items():
+            if username not in self._user_ids or project_id not in self._project_ids:
+                log.warning("Unknown user or project of file {fname}".format(fname=name))
+            elif changes[name]:
+                created.append(name)
             else:
-                log.info("Deleting file via Watchman: {pf}".format(pf=proj_file))
-                proj_file.delete()
-        else:
-            proj_file, created = ProjectFile.objects.get_or_create(author=user,
-                                                                   project=project,
-                                                                   file=line)
+                deleted.append(name)
+        with transaction.atomic(savepoint=False):
+            if deleted:
+                self._delete(deleted)
             if created:
-                log.info("Just created a file via Watchman: {pf}".format(pf=proj_file))
-            else:
-                log.info("File {pf} already exists in the database. Doing nothing.".format(pf=proj_file))
+                self._create(created, owners)
+
+    def _lookup_users(self, usernames):
+        missing = usernames - set(self._user_ids)
+        if missing:
+            self._user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+
+    def _lookup_projects(self, project_ids):
+        missing = project_ids - self._project_ids
+        if missing:
+            self._project_ids.update(
+                str(pk) for pk in Project.objects.filter(pk__in=missing).values_list('pk', flat=True))
+
+    @staticmethod
+    def _delete(names):
+        log.info("Deleting {count} files via Watchman".format(count=len(names)))
+        # a select and a single DELETE, post_delete signals still release blobs
+        ProjectFile.objects.filter(file__in=names).delete()
+        storage = ProjectFile._meta.get_field('file').storage
+        for name in names:
+            storage.delete(name)
+
+    def _create(self, names, owners):
+        existing = set(ProjectFile.objects.filter(file__in=names).values_list('file', flat=True))
+        new_files = [
+            ProjectFile(author_id=self._user_ids[owners[name][0]], project_id=owners[name][1], file=name,
+                        size=stored_file_size(name))
+            for name in names if name not in existing
+        ]
+        ProjectFile.objects.bulk_create(new_files, batch_size=settings.FILE_WATCHER_BATCH_SIZE)
+        log.info("Just created {count} files via Watchman".format(count=len(new_files)))
+        # registered files were changed
+        update_file_sizes(existing)
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+handler = FileWatchHandler()
+
+
+def run(files_list):
+    handler.apply(coalesce(files_list))
+
+
+class WatchmanSubscriber(object):
+    """
+    Persistent watchman client. File changes of subscription messages are collected
+    until watchman is quiet for the debounce time and then applied together.
+    """
+    SUBSCRIPTION = 'project-files'
+
+    def __init__(self, root=None, handler=handler, debounce=None, max_wait=None):
+        self.root = root or settings.WATCHMAN_ROOT
+        self.handler = handler
+        self.debounce = debounce or settings.FILE_WATCHER_DEBOUNCE
+        self.max_wait = max_wait or settings.FILE_WATCHER_MAX_WAIT
+        self.pending = {}
+        self._first_pending_at = None
+        self._stopped = threading.Event()
+        self._sock = None
+        self._buffer = b''
+
+    def run(self):
+        self.connect()
+        while not self._stopped.is_set():
+            try:
+                message = self.receive(self._timeout())
+            except socket.timeout:
+                self.flush()
+                continue
+            self.handle_message(message)
+            if self.pending and time.time() - self._first_pending_at >= self.max_wait:
+                self.flush()
+        self.flush()
+
+    def stop(self):
+        self._stopped.set()
+
+    def connect(self):
+        sockname = json.loads(subprocess.check_output(['watchman', '--output-encoding=json', 'get-sockname']).decode())
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(sockname['sockname'])
+        watch = self.command(['watch-project', self.root])
+        query = {'expression': self.expression(), 'fields': ['name', 'exists']}
+        if watch.get('relative_path'):
+            query['relative_root'] = watch['relative_path']
+        self.command(['subscribe', watch['watch'], self.SUBSCRIPTION, query])
+        log.info("Subscribed to file changes in {root}".format(root=self.root))
+
+    def expression(self) -> list:
+        """
+        Files outside of dot dirs at any depth, e.g. .git of synced repositories or .ipynb_checkpoints
+        """
+        return ['allof',
+                ['type', 'f'],
+                ['not', ['match', '**/.*/**', 'wholename', {'includedotfiles': True}]]] + \
+            [['not', ['dirname', name]] for name in self._ignored_dirs()]
+
+    def _ignored_dirs(self):
+        """
+        Dirs under the root which have no project files
+        """
+        for directory in (settings.FILE_UPLOAD_STAGING_DIR, settings.FILE_BLOB_STORE_DIR):
+            name = os.path.relpath(directory, self.root)
+            if not name.startswith('..'):
+                yield name
+
+    def command(self, cmd) -> dict:
+        self._sock.settimeout(None)
+        self._sock.sendall(json.dumps(cmd).encode() + b'\n')
+        while True:
+            response = self.receive(None)
+            if 'error' in response:
+                raise RuntimeError(response['error'])
+            if not response.get('unilateral'):
+                return response
+            self.handle_message(response)
+
+    def receive(self, timeout) -> dict:
+        # watchman json protocol sends one message per line
+        self._sock.settimeout(timeout)
+        while b'\n' not in self._buffer:
+            data = self._sock.recv(65536)
+            if not data:
+                raise ConnectionError("Watchman closed the connection")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line.decode())
+
+    def handle_message(self, message):
+        if message.get('subscription') != self.SUBSCRIPTION:
+            return
+        if message.get('is_fresh_instance'):
+            # initial listing of all files, not changes
+            return
+        if not self.pending:
+            self._first_pending_at = time.time()
+        self.pending.update(coalesce(message.get('files', [])))
+
+    def flush(self):
+        if not self.pending:
+            return
+        changes, self.pending = self.pending, {}
+        close_old_connections()
+        try:
+            self.handler.apply(changes)
+        except Exception:
+            log.exception("Failed to apply {count} file changes".format(count=len(changes)))
+
+    def _timeout(self):
+        if not self.pending:
+            return None
+        return max(min(self.debounce, self._first_pending_at + self.max_wait - time.time()), 0.01)
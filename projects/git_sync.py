@@ -0,0 +1,107 @@
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from git import Repo
+
+from .models import ProjectFile, stored_file_size, update_file_sizes
+
+log = logging.getLogger('projects')
+
+
+class RepositorySync(object):
+    """
+    Keeps a directory in sync with a branch of a git repository and registers its files as project files.
+    The first sync is a shallow single branch clone, later syncs fetch the branch and register
+    only paths which differ between the old and the new commit.
+    """
+
+    def __init__(self, url, path, branch='master', author_id=None, project_id=None, batch_size=None):
+        self.url = url
+        self.path = Path(path)
+        self.branch = branch
+        self.author_id = author_id
+        self.project_id = project_id
+        self.batch_size = batch_size or settings.GIT_SYNC_BATCH_SIZE
+        # file names are relative to the resource dir, like names of uploaded and watched files
+        self.prefix = self.path.relative_to(settings.RESOURCE_DIR)
+
+    def run(self) -> dict:
+        """
+        Returns number of registered and removed files
+        """
+        if self.path.joinpath('.git').exists():
+            repo = Repo(str(self.path))
+            old_commit = repo.head.commit.hexsha
+            repo.git.remote('set-url', 'origin', self.url)
+            repo.git.fetch('origin', self.branch, depth=1)
+            repo.git.reset('FETCH_HEAD', hard=True)
+            changes = self._diff(repo, old_commit, repo.head.commit.hexsha)
+        else:
+            log.info("Cloning {path}".format(path=self.path))
+            repo = Repo.clone_from(self.url, str(self.path), branch=self.branch, depth=1, single_branch=True)
+            changes = ((path, True) for path in _split_paths(repo.git.ls_files(z=True, as_process=True)))
+        return self._register(changes)
+
+    @staticmethod
+    def _diff(repo, old_commit, new_commit):
+        # path -> whether it exists after the change
+        status = None
+        output = repo.git.diff(old_commit, new_commit, name_status=True, no_renames=True, z=True, as_process=True)
+        for item in _split_paths(output):
+            if status is None:
+                status = item
+            else:
+                yield item, status != 'D'
+                status = None
+
+    def _register(self, changes) -> dict:
+        counts = {'registered': 0, 'removed': 0}
+        created, deleted = [], []
+        for path, exists in changes:
+            (created if exists else deleted).append(str(self.prefix.joinpath(path)))
+            if len(created) >= self.batch_size:
+                counts['registered'] += self._create(created)
+                created = []
+            if len(deleted) >= self.batch_size:
+                counts['removed'] += self._delete(deleted)
+                deleted = []
+        counts['registered'] += self._create(created)
+        counts['removed'] += self._delete(deleted)
+        return counts
+
+    def _create(self, names) -> int:
+        if not names:
+            return 0
+        with transaction.atomic():
+            # changed files and files noticed by the file watcher are already registered
+            existing = set(ProjectFile.objects.filter(file__in=names).values_list('file', flat=True))
+            new_files = [ProjectFile(author_id=self.author_id, project_id=self.project_id, file=name,
+                                     size=stored_file_size(name))
+                         for name in names if name not in existing]
+            ProjectFile.objects.bulk_create(new_files)
+            update_file_sizes(existing)
+        return len(new_files)
+
+    @staticmethod
+    def _delete(names) -> int:
+        if not names:
+            return 0
+        # post_delete signals release blobs, project files have no dependent rows
+        deleted, _ = ProjectFile.objects.filter(file__in=names).delete()
+        return deleted
+
+
+def _split_paths(process, chunk_size=64 * 1024):
+    """
+    Streams NUL separated output of a git command
+    """
+    rest = b''
+    for chunk in iter(lambda: process.stdout.read(chunk_size), b''):
+        *items, rest = (rest + chunk).split(b'\0')
+        for item in items:
+            yield item.decode()
+    if rest:
+        yield rest.decode()
+    process.wait()
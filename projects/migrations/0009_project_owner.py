@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_owners(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    Collaborator = apps.get_model('projects', 'Collaborator')
+    for project_id, user_id in Collaborator.objects.filter(owner=True).values_list('project_id', 'user_id'):
+        Project.objects.filter(pk=project_id).update(owner_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0008_auto_20170620_1132'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                    related_name='owned_projects', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(set_owners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+import projects.models
+
+
+def fill_sizes(apps, schema_editor):
+    ProjectFile = apps.get_model('projects', 'ProjectFile')
+    storage = ProjectFile._meta.get_field('file').storage
+    for pk, name in ProjectFile.objects.values_list('pk', 'file').iterator():
+        try:
+            size = storage.size(name)
+        except OSError:
+            # file is missing
+            continue
+        ProjectFile.objects.filter(pk=pk).update(size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_project_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectfile',
+            name='path',
+            field=projects.models.ProjectFilePathField(blank=True, editable=False, max_length=255, default=''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='projectfile',
+            name='size',
+            field=projects.models.FileSizeField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            "UPDATE projects_projectfile SET path = regexp_replace(file, '^[^/]*/[^/]*/', '')",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(fill_sizes, migrations.RunPython.noop),
+        migrations.RunSQL(
+            "CREATE INDEX projects_projectfile_project_path ON projects_projectfile "
+            "(project_id, path varchar_pattern_ops)",
+            "DROP INDEX projects_projectfile_project_path",
+        ),
+    ]
@@ -1,9 +1,13 @@
+import re
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib.postgres.fields import JSONField
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.db.models.functions import Substr
 from django.urls import reverse
+from django.utils.deconstruct import deconstructible
 from guardian.shortcuts import get_perms
 from social_django.models import UserSocialAuth
 
@@ -13,7 +17,7 @@ from utils import alphanumeric
 
 class ProjectQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(collaborator__user=namespace.object)
+        return self.filter(collaborator__user_id=namespace.id)
 
 
 class Project(models.Model):
@@ -21,6 +25,8 @@ class Project(models.Model):
     description = models.CharField(max_length=400, blank=True)
     private = models.BooleanField(default=True)
     last_updated = models.DateTimeField(auto_now=True)
+    # same as user of the owner collaborator, kept in sync by collaborator signals
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, models.SET_NULL, null=True, related_name='owned_projects')
     collaborators = models.ManyToManyField(settings.AUTH_USER_MODEL, through='Collaborator', related_name='projects')
     integrations = models.ManyToManyField(UserSocialAuth, through='SyncedResource', related_name='projects')
 
@@ -44,10 +50,6 @@ class Project(models.Model):
             kwargs={'namespace': namespace.name, 'pk': str(self.id)}
         )
 
-    @property
-    def owner(self):
-        return self.collaborator_set.filter(owner=True).first().user
-
     def get_owner_name(self):
         return self.owner.username
 
@@ -57,7 +59,7 @@ class Project(models.Model):
 
 class ProjectUsersQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(user=namespace.object)
+        return self.filter(user_id=namespace.id)
 
 
 class Collaborator(models.Model):
@@ -77,9 +79,40 @@ class Collaborator(models.Model):
         return [perm for perm in get_perms(self.user, self.project) if perm in project_perms]
 
 
+class SplitPart(models.Func):
+    function = 'SPLIT_PART'
+    output_field = models.CharField()
+
+
 class FileQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(author__username=namespace.name)
+        return self.filter(author_id=namespace.id)
+
+    def under(self, directory):
+        """
+        Files anywhere below directory, directory is empty or ends with a slash
+        """
+        return self.filter(path__startswith=directory) if directory else self
+
+    def in_directory(self, directory):
+        return self.under(directory).filter(path__regex=r'^{}[^/]+$'.format(re.escape(directory)))
+
+    def subdirectories(self, directory):
+        """
+        Name, file count and total size of each subdirectory of directory
+        """
+        return self.under(directory).filter(
+            path__regex=r'^{}[^/]+/'.format(re.escape(directory))
+        ).annotate(
+            name=SplitPart(Substr('path', len(directory) + 1), models.Value('/'), models.Value(1))
+        ).values('name').annotate(count=models.Count('pk'), size=models.Sum('size')).order_by('name')
+
+
+def project_file_path(name):
+    """
+    Path of a project file relative to the project root, file names start with user and project
+    """
+    return '/'.join(name.split('/')[2:])
 
 
 def user_project_directory_path(instance, filename):
@@ -88,11 +121,91 @@ def user_project_directory_path(instance, filename):
                                           fname=filename)
 
 
+def blob_path(instance, filename):
+    return "{}/{}/{}".format(instance.digest[:2], instance.digest[2:4], instance.digest)
+
+
+@deconstructible
+class BlobStorage(FileSystemStorage):
+    """
+    Stores blobs read-only in FILE_BLOB_STORE_DIR, project files are copies of them
+    """
+    def __init__(self):
+        super().__init__(location=settings.FILE_BLOB_STORE_DIR, file_permissions_mode=0o444)
+
+
+class FileBlob(models.Model):
+    """
+    Content of project files stored once per sha256 digest, see projects.blobs.
+    refcount is the number of project files pointing at the blob.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_path, storage=BlobStorage(), max_length=255)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest
+
+
+class ProjectFilePathField(models.CharField):
+    """
+    Derived from the file name whenever the file is saved, including bulk_create,
+    so it has to be declared after the file field.
+    """
+    def pre_save(self, model_instance, add):
+        value = project_file_path(model_instance.file.name or '')
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class FileSizeField(models.BigIntegerField):
+    """
+    Taken from content which was just assigned to the file, so it has to be declared before the file field
+    which saves the content. Callers assigning names of stored files set the size themselves.
+    """
+    def pre_save(self, model_instance, add):
+        file = model_instance.file
+        if file and not file._committed:
+            value = file.size
+            setattr(model_instance, self.attname, value)
+            return value
+        return getattr(model_instance, self.attname)
+
+
+def stored_file_size(name):
+    """
+    Size of a stored project file or None when it is missing
+    """
+    try:
+        return ProjectFile._meta.get_field('file').storage.size(name)
+    except OSError:
+        return None
+
+
+def update_file_sizes(names) -> None:
+    """
+    Stores current sizes of registered files which were changed in place, with one query
+    """
+    if not names:
+        return
+    ProjectFile.objects.filter(file__in=names).update(size=models.Case(
+        *[models.When(file=name, then=models.Value(stored_file_size(name))) for name in names],
+        output_field=models.BigIntegerField()
+    ))
+
+
 class ProjectFile(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING)
     project = models.ForeignKey(Project, related_name="project_files")
+    size = FileSizeField(null=True, editable=False)
     file = models.FileField(upload_to=user_project_directory_path)
     public = models.BooleanField(default=False)
+    # set when the content is deduplicated, file is then a copy of the blob's file
+    blob = models.ForeignKey(FileBlob, models.PROTECT, null=True, editable=False, related_name='project_files')
+    # indexed together with project using varchar_pattern_ops for prefix lookups, see migration 0010
+    path = ProjectFilePathField(max_length=255, blank=True, editable=False)
 
     objects = FileQuerySet.as_manager()
 
@@ -108,13 +221,14 @@ class ProjectFile(models.Model):
         )
 
     def delete(self, using=None, keep_parents=False):
+        # blobs are released by a post_delete signal
         self.file.delete()
         return super().delete(using, keep_parents)
 
 
 class SyncedResourceQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(project__collaborator__user=namespace.object)
+        return self.filter(project__collaborator__user_id=namespace.id)
 
 
 class SyncedResource(models.Model):
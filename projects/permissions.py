@@ -1,14 +1,128 @@
+from collections import defaultdict
+
+import ujson
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django_redis import get_redis_connection
+from guardian.models import UserObjectPermission, GroupObjectPermission
 from rest_framework import permissions
 
+from .models import Project
+
+PERMS_KEY = 'project_perms:{}'
+
+
+class ProjectPermissionCache(object):
+    """
+    Object permissions of users on projects, loaded for many users and projects at once.
+    With PROJECT_PERMISSION_CACHE enabled permissions are also kept in redis.
+    """
+
+    def __init__(self):
+        self._perms = {}
+
+    def get_perms(self, user, project) -> set:
+        if not user.is_active or user.pk is None:
+            return set()
+        if user.is_superuser:
+            return set(dict(Project._meta.permissions))
+        key = (str(user.pk), str(project.pk))
+        if key not in self._perms:
+            self.prefetch([user], [project])
+        return self._perms[key]
+
+    def has_perm(self, user, perm, project) -> bool:
+        return perm in self.get_perms(user, project)
+
+    def clear(self) -> None:
+        self._perms.clear()
+
+    def prefetch(self, users, projects) -> None:
+        keys = {(str(user.pk), str(project.pk)) for user in users for project in projects if user.pk is not None}
+        missing = keys - set(self._perms)
+        if not missing:
+            return
+        if settings.PROJECT_PERMISSION_CACHE:
+            self._perms.update(self._get_cached(missing))
+            missing -= set(self._perms)
+        if not missing:
+            return
+        loaded = self._load(missing)
+        if settings.PROJECT_PERMISSION_CACHE:
+            self._cache(loaded)
+        self._perms.update(loaded)
+
+    @staticmethod
+    def _load(keys) -> dict:
+        user_ids = {user_id for user_id, _ in keys}
+        project_ids = {project_id for _, project_id in keys}
+        filters = dict(
+            content_type=ContentType.objects.get_for_model(Project),
+            object_pk__in=project_ids,
+        )
+        rows = UserObjectPermission.objects.filter(user_id__in=user_ids, **filters).values_list(
+            'user_id', 'object_pk', 'permission__codename'
+        ).union(GroupObjectPermission.objects.filter(group__user__in=user_ids, **filters).values_list(
+            'group__user', 'object_pk', 'permission__codename'
+        ))
+        perms = {key: set() for key in keys}
+        project_perms = dict(Project._meta.permissions)
+        for user_id, project_id, codename in rows:
+            key = (str(user_id), project_id)
+            if key in perms and codename in project_perms:
+                perms[key].add(codename)
+        return perms
+
+    @staticmethod
+    def _get_cached(keys) -> dict:
+        by_user = defaultdict(list)
+        for user_id, project_id in keys:
+            by_user[user_id].append(project_id)
+        cache = get_redis_connection("default")
+        pipe = cache.pipeline()
+        for user_id, project_ids in by_user.items():
+            pipe.hmget(PERMS_KEY.format(user_id), project_ids)
+        perms = {}
+        for (user_id, project_ids), values in zip(by_user.items(), pipe.execute()):
+            for project_id, value in zip(project_ids, values):
+                if value is not None:
+                    perms[(user_id, project_id)] = set(ujson.loads(value))
+        return perms
+
+    @staticmethod
+    def _cache(perms) -> None:
+        by_user = defaultdict(dict)
+        for (user_id, project_id), codenames in perms.items():
+            by_user[user_id][project_id] = ujson.dumps(sorted(codenames))
+        cache = get_redis_connection("default")
+        pipe = cache.pipeline()
+        for user_id, mapping in by_user.items():
+            key = PERMS_KEY.format(user_id)
+            pipe.hmset(key, mapping)
+            pipe.expire(key, settings.PROJECT_PERMISSION_CACHE_TTL)
+        pipe.execute()
+
+
+def invalidate_cached_perms(user_ids) -> None:
+    if settings.PROJECT_PERMISSION_CACHE and user_ids:
+        get_redis_connection("default").delete(*[PERMS_KEY.format(user_id) for user_id in user_ids])
+
+
+def get_permission_cache(request) -> ProjectPermissionCache:
+    """
+    Permission cache shared by permission classes and serializers during the request
+    """
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'project_permissions'):
+        request.project_permissions = ProjectPermissionCache()
+    return request.project_permissions
+
 
 def has_project_permission(request, project):
     if project.private is False and request.method == 'GET':
         return True
-    if request.method == 'GET':
-        return request.user.has_perm('read_project', project)
-    else:
-        return request.user.has_perm('write_project', project)
-    return True
+    perm = 'read_project' if request.method == 'GET' else 'write_project'
+    return get_permission_cache(request).has_perm(request.user, perm, project)
 
 
 class ProjectPermission(permissions.BasePermission):
@@ -1,15 +1,17 @@
 import base64
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Q, Manager
 from guardian.shortcuts import assign_perm
 from pathlib import Path
 from rest_framework import serializers
 from social_django.models import UserSocialAuth
 
 from base.serializers import SearchSerializerMixin
+from projects.blobs import set_file_content, release_file_content
 from projects.models import (Project, Collaborator,
                              SyncedResource, ProjectFile)
+from projects.permissions import get_permission_cache
 
 User = get_user_model()
 
@@ -43,27 +45,57 @@ class FileAuthorSerializer(serializers.ModelSerializer):
         read_only_fields = ('email', 'username')
 
 
+def base64_max_length():
+    return (settings.FILE_BASE64_MAX_SIZE + 2) // 3 * 4
+
+
 class Base64CharField(serializers.CharField):
     def to_representation(self, value):
-        return base64.b64encode(value)
+        return base64.b64encode(value).decode()
 
     def to_internal_value(self, data):
+        if len(data) > base64_max_length():
+            raise serializers.ValidationError("Base64 data is too large, use chunked uploads instead.")
         return base64.b64decode(data)
 
 
 class ProjectFileSerializer(serializers.ModelSerializer):
+    """
+    File contents are inlined as base64_data only when requested with the content query parameter
+    and if the file is not larger than FILE_BASE64_MAX_SIZE, use the download endpoint otherwise.
+    """
     base64_data = Base64CharField(required=False)
     name = serializers.CharField(required=False)
 
     class Meta:
         model = ProjectFile
-        fields = ("id", "project", "file", "public", "base64_data", "name")
-        read_only_fields = ("author",)
+        fields = ("id", "project", "file", "public", "base64_data", "name", "path", "size")
+        read_only_fields = ("author", "path", "size")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        if request is not None and request.query_params.get('content') in ['true', '1']:
+            data['base64_data'] = self._read_content(instance)
+        return data
+
+    def _read_content(self, instance):
+        # files may have changed since their size was stored, so at most one byte over the limit is read
+        try:
+            with instance.file.storage.open(instance.file.name, 'rb') as f:
+                content = f.read(settings.FILE_BASE64_MAX_SIZE + 1)
+        except OSError:
+            return None
+        if len(content) > settings.FILE_BASE64_MAX_SIZE:
+            return None
+        return self.fields['base64_data'].to_representation(content)
 
     def create(self, validated_data):
         project = Project.objects.get(pk=validated_data.pop("project"))
+        content = validated_data.pop("file")
         proj_file = ProjectFile(project=project,
                                 **validated_data)
+        set_file_content(proj_file, content)
         proj_file.save()
         return proj_file
 
@@ -72,24 +104,51 @@ class ProjectFileSerializer(serializers.ModelSerializer):
         for key in validated_data:
             if key == "file":
                 # Sort of sketches me out.
-                instance.file.delete()
-            setattr(instance, key, validated_data[key])
+                release_file_content(instance)
+                set_file_content(instance, validated_data[key])
+            else:
+                setattr(instance, key, validated_data[key])
 
         instance.save()
         return instance
 
 
+class FileUploadSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=0, max_value=settings.FILE_UPLOAD_MAX_SIZE)
+    public = serializers.BooleanField(default=False)
+
+
+class CollaboratorListSerializer(serializers.ListSerializer):
+    """
+    Loads permissions of all listed collaborators at once
+    """
+    def to_representation(self, data):
+        collaborators = list(data.all() if isinstance(data, Manager) else data)
+        get_permission_cache(self.context['request']).prefetch(
+            {collaborator.user for collaborator in collaborators},
+            {collaborator.project for collaborator in collaborators},
+        )
+        return [self.child.to_representation(collaborator) for collaborator in collaborators]
+
+
+class CollaboratorPermissionsField(serializers.MultipleChoiceField):
+    def get_attribute(self, instance):
+        return get_permission_cache(self.context['request']).get_perms(instance.user, instance.project)
+
+
 class CollaboratorSerializer(serializers.ModelSerializer):
     email = serializers.CharField(source='user.email', read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
     member = serializers.CharField(write_only=True)
-    permissions = serializers.MultipleChoiceField(choices=Project._meta.permissions)
+    permissions = CollaboratorPermissionsField(choices=Project._meta.permissions)
 
     class Meta:
         model = Collaborator
         fields = ('id', 'owner', 'joined', 'username', 'email', 'first_name', 'last_name', 'member', 'permissions')
+        list_serializer_class = CollaboratorListSerializer
 
     def validate_member(self, value):
         if not User.objects.filter(Q(username=value) | Q(email=value)).exists():
@@ -102,10 +161,12 @@ class CollaboratorSerializer(serializers.ModelSerializer):
         project = Project.objects.get(pk=project_id)
         owner = validated_data.get("owner", False)
         if owner is True:
+            # signals are skipped, Project.owner is set by set_project_owner when the new owner is created below
             Collaborator.objects.filter(project_id=project_id).update(owner=False)
         user = User.objects.filter(Q(username=member) | Q(email=member)).first()
         for permission in permissions:
             assign_perm(permission, user, project)
+        get_permission_cache(self.context['request']).clear()
         return Collaborator.objects.create(user=user, project_id=project_id, **validated_data)
 
 
@@ -0,0 +1,55 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from guardian.models import UserObjectPermission, GroupObjectPermission
+
+from .blobs import release_blob
+from .models import Collaborator, Project, ProjectFile
+from .permissions import invalidate_cached_perms
+
+
+def _set_owner(collaborator, owner_id):
+    Project.objects.filter(pk=collaborator.project_id).update(owner_id=owner_id)
+    if Collaborator.project.is_cached(collaborator):
+        collaborator.project.owner_id = owner_id
+
+
+def _next_owner_id(collaborator):
+    # another owner collaborator, if any is left
+    return Collaborator.objects.filter(project_id=collaborator.project_id, owner=True).exclude(
+        pk=collaborator.pk).order_by('-joined').values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Collaborator)
+def set_project_owner(sender, instance, **kwargs):
+    if instance.owner:
+        _set_owner(instance, instance.user_id)
+        if Collaborator.project.is_cached(instance):
+            instance.project.owner = instance.user
+    elif Project.objects.filter(pk=instance.project_id, owner_id=instance.user_id).exists():
+        # demoted
+        _set_owner(instance, _next_owner_id(instance))
+
+
+@receiver(post_delete, sender=Collaborator)
+def unset_project_owner(sender, instance, **kwargs):
+    if instance.owner:
+        _set_owner(instance, _next_owner_id(instance))
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def invalidate_user_perms(sender, instance, **kwargs):
+    # assign_perm and remove_perm go through these
+    invalidate_cached_perms([instance.user_id])
+
+
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def invalidate_group_perms(sender, instance, **kwargs):
+    invalidate_cached_perms(list(instance.group.user_set.values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=ProjectFile)
+def release_project_file_blob(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
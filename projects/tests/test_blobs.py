@@ -0,0 +1,82 @@
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from projects.blobs import set_file_content, release_file_content
+from projects.models import FileBlob, ProjectFile
+from projects.tests.factories import CollaboratorFactory, ProjectFactory
+
+
+@override_settings(FILE_BLOB_STORE=True)
+class BlobStoreTest(TestCase):
+    def setUp(self):
+        collaborator = CollaboratorFactory()
+        self.user = collaborator.user
+        self.project = collaborator.project
+
+    def tearDown(self):
+        shutil.rmtree(settings.FILE_BLOB_STORE_DIR, ignore_errors=True)
+        shutil.rmtree(str(Path(settings.MEDIA_ROOT, self.user.username)), ignore_errors=True)
+
+    def create_file(self, content, name='data.csv', project=None):
+        project_file = ProjectFile(author=self.user, project=project or self.project)
+        set_file_content(project_file, ContentFile(content, name=name))
+        project_file.save()
+        return project_file
+
+    def test_equal_content_is_stored_once(self):
+        first = self.create_file(b'a,b\n1,2\n')
+        second = self.create_file(b'a,b\n1,2\n', name='copy.csv', project=ProjectFactory())
+        self.assertEqual(first.blob_id, second.blob_id)
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(second.path, 'copy.csv')
+        self.assertEqual(second.size, 8)
+        self.assertEqual(second.file.read(), b'a,b\n1,2\n')
+        # project directories have copies of the blob
+        self.assertEqual(first.file.name, '{}/{}/data.csv'.format(self.user.username, self.project.pk))
+        self.assertFalse(Path(blob.file.path).samefile(first.file.path))
+        self.assertFalse(Path(first.file.path).samefile(second.file.path))
+        self.assertTrue(blob.file.path.startswith(settings.FILE_BLOB_STORE_DIR))
+
+    def test_write_in_project_changes_only_its_file(self):
+        first = self.create_file(b'shared')
+        second = self.create_file(b'shared', project=ProjectFactory())
+        with open(first.file.path, 'r+b') as f:
+            f.write(b'SH')
+        self.assertEqual(Path(first.file.path).read_bytes(), b'SHared')
+        self.assertEqual(Path(second.file.path).read_bytes(), b'shared')
+        self.assertEqual(Path(first.blob.file.path).read_bytes(), b'shared')
+
+    def test_delete_respects_refcount(self):
+        first = self.create_file(b'content')
+        second = self.create_file(b'content')
+        blob_path = Path(first.blob.file.path)
+        first_path, second_path = Path(first.file.path), Path(second.file.path)
+        first.delete()
+        self.assertEqual(FileBlob.objects.get().refcount, 1)
+        self.assertFalse(first_path.exists())
+        self.assertTrue(blob_path.exists())
+        self.assertEqual(second_path.read_bytes(), b'content')
+        second.delete()
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(second_path.exists())
+
+    def test_replace_content(self):
+        project_file = self.create_file(b'old')
+        release_file_content(project_file)
+        set_file_content(project_file, ContentFile(b'new', name='data.csv'))
+        project_file.save()
+        self.assertEqual(list(FileBlob.objects.values_list('refcount', flat=True)), [1])
+        self.assertEqual(ProjectFile.objects.get().file.read(), b'new')
+        self.assertEqual(project_file.file.name, '{}/{}/data.csv'.format(self.user.username, self.project.pk))
+
+    @override_settings(FILE_BLOB_STORE=False)
+    def test_disabled(self):
+        project_file = self.create_file(b'content')
+        self.assertIsNone(project_file.blob_id)
+        self.assertEqual(project_file.file.name, '{}/{}/data.csv'.format(self.user.username, self.project.pk))
+        project_file.delete()
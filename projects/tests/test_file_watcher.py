@@ -10,7 +10,7 @@ from projects.tests.factories import (ProjectFactory,
                                       ProjectFileFactory)
 from projects.tests.utils import generate_random_file_content
 from projects.models import ProjectFile
-from projects.file_watch_handler import run
+from projects.file_watch_handler import run, handler, FileWatchHandler, WatchmanSubscriber
 log = logging.getLogger('projects')
 
 
@@ -27,6 +27,7 @@ class FileWatcherTest(TestCase):
 
     def tearDown(self):
         shutil.rmtree(str(self.user_dir))
+        handler.clear()
 
     def test_file_creation(self):
         # projects/tests/file_upload_test_1.txt
@@ -91,3 +92,70 @@ class FileWatcherTest(TestCase):
         self.assertEqual(ProjectFile.objects.count(), 1)
         files_in_project = [name for name in os.listdir(str(self.project_root))]
         self.assertEqual(len(files_in_project), 1)
+
+    def test_changed_file_size_is_updated(self):
+        file_name = "{user}/{proj}/data.txt".format(user=self.user.username, proj=self.project.pk)
+        self.project_root.joinpath('data.txt').write_bytes(b'a')
+        run(files_list=[{'name': file_name, 'exists': True}])
+        self.project_root.joinpath('data.txt').write_bytes(b'abc')
+        run(files_list=[{'name': file_name, 'exists': True}])
+        self.assertEqual(ProjectFile.objects.get(file=file_name).size, 3)
+
+    def test_batch_is_applied_with_few_queries(self):
+        names = ["{user}/{proj}/file_{i}.txt".format(user=self.user.username, proj=self.project.pk, i=i)
+                 for i in range(100)]
+        watch_handler = FileWatchHandler()
+        # user and project lookup, existing files and insert
+        with self.assertNumQueries(4):
+            watch_handler.apply({name: True for name in names})
+        self.assertEqual(ProjectFile.objects.count(), 100)
+        # deleted files are selected for post_delete signals
+        with self.assertNumQueries(2):
+            watch_handler.apply({name: False for name in names[:50]})
+        self.assertEqual(ProjectFile.objects.count(), 50)
+
+    def test_reserved_dirs_are_ignored(self):
+        names = ['.uploads/{}/chunk'.format(self.project.pk), '.blobs/ab/cd/abcd']
+        with self.assertNumQueries(0):
+            run(files_list=[{'name': name, 'exists': True} for name in names])
+        self.assertEqual(ProjectFile.objects.count(), 0)
+
+    def test_files_in_dot_dirs_are_ignored(self):
+        names = ["{user}/{proj}/{path}".format(user=self.user.username, proj=self.project.pk, path=path)
+                 for path in ('repo/.git/objects/ab/cdef', '.ipynb_checkpoints/a-checkpoint.ipynb')]
+        run(files_list=[{'name': name, 'exists': True} for name in names])
+        self.assertEqual(ProjectFile.objects.count(), 0)
+
+    def test_unknown_project_is_ignored(self):
+        run(files_list=[{'name': "{user}/not-a-project/file.txt".format(user=self.user.username), 'exists': True}])
+        self.assertEqual(ProjectFile.objects.count(), 0)
+
+
+class WatchmanSubscriberTest(TestCase):
+    def test_events_are_coalesced(self):
+        applied = []
+        watch_handler = FileWatchHandler()
+        watch_handler.apply = applied.append
+        subscriber = WatchmanSubscriber(root='/workspaces', handler=watch_handler)
+        subscriber.handle_message({'subscription': 'project-files', 'is_fresh_instance': True,
+                                   'files': [{'name': 'a', 'exists': True}]})
+        self.assertEqual(subscriber.pending, {})
+        subscriber.handle_message({'subscription': 'project-files', 'files': [{'name': 'a', 'exists': True},
+                                                                              {'name': 'b', 'exists': True}]})
+        subscriber.handle_message({'subscription': 'project-files', 'files': [{'name': 'a', 'exists': False}]})
+        subscriber.flush()
+        self.assertEqual(applied, [{'a': False, 'b': True}])
+        subscriber.flush()
+        self.assertEqual(len(applied), 1)
+
+    def test_reserved_dirs_are_not_watched(self):
+        subscriber = WatchmanSubscriber(root=settings.RESOURCE_DIR)
+        self.assertEqual(list(subscriber._ignored_dirs()), ['.uploads', '.blobs'])
+
+    def test_dot_dirs_are_not_watched(self):
+        subscriber = WatchmanSubscriber(root='/srv/files')
+        self.assertEqual(subscriber.expression(), [
+            'allof',
+            ['type', 'f'],
+            ['not', ['match', '**/.*/**', 'wholename', {'includedotfiles': True}]],
+        ])
@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import TestCase
+from git import Repo
+
+from projects.git_sync import RepositorySync
+from projects.models import ProjectFile
+from projects.tests.factories import CollaboratorFactory
+
+
+class RepositorySyncTest(TestCase):
+    def setUp(self):
+        collaborator = CollaboratorFactory()
+        self.user = collaborator.user
+        self.project = collaborator.project
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        origin = Repo.init(str(self.tmp_dir.joinpath('origin.git')), bare=True)
+        self.url = 'file://{}'.format(origin.working_dir)
+        self.work = Repo.clone_from(self.url, str(self.tmp_dir.joinpath('work')))
+        self.work.git.checkout(b='master')
+        self.work.git.config('user.name', 'Test')
+        self.work.git.config('user.email', 'test@example.com')
+        self.commit({'a.txt': 'a', 'dir/b.txt': 'b'})
+        self.path = self.project.resource_root().joinpath('repo')
+        self.prefix = str(self.path.relative_to(settings.RESOURCE_DIR))
+
+    def tearDown(self):
+        shutil.rmtree(str(self.tmp_dir))
+        shutil.rmtree(str(self.project.resource_root()), ignore_errors=True)
+
+    def commit(self, files, removed=()):
+        root = Path(self.work.working_dir)
+        for name, content in files.items():
+            root.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+            root.joinpath(name).write_text(content)
+        self.work.git.add(A=True)
+        for name in removed:
+            self.work.git.rm(name)
+        self.work.git.commit(m='commit')
+        self.work.git.push('origin', 'master')
+
+    def sync(self):
+        return RepositorySync(self.url, str(self.path), 'master', author_id=self.user.pk,
+                              project_id=self.project.pk, batch_size=2).run()
+
+    def names(self):
+        return set(ProjectFile.objects.filter(project=self.project).values_list('file', flat=True))
+
+    def test_initial_sync_is_shallow(self):
+        self.commit({'c.txt': 'c'})
+        self.assertEqual(self.sync(), {'registered': 3, 'removed': 0})
+        self.assertEqual(self.names(), {self.prefix + '/a.txt', self.prefix + '/dir/b.txt', self.prefix + '/c.txt'})
+        self.assertEqual(len(list(Repo(str(self.path)).iter_commits())), 1)
+
+    def test_incremental_sync(self):
+        self.sync()
+        self.commit({'dir/b.txt': 'changed', 'c.txt': 'c'}, removed=['a.txt'])
+        self.assertEqual(self.sync(), {'registered': 1, 'removed': 1})
+        self.assertEqual(self.names(), {self.prefix + '/dir/b.txt', self.prefix + '/c.txt'})
+        self.assertEqual(Path(self.path, 'dir/b.txt').read_text(), 'changed')
+        self.assertEqual(ProjectFile.objects.get(path='repo/dir/b.txt').size, len('changed'))
+        self.assertEqual(set(ProjectFile.objects.under('repo/').values_list('path', flat=True)),
+                         {'repo/dir/b.txt', 'repo/c.txt'})
+
+    def test_nothing_changed(self):
+        self.sync()
+        self.assertEqual(self.sync(), {'registered': 0, 'removed': 0})
@@ -1,6 +1,6 @@
 from django.test import TestCase
 
-from projects.models import Project
+from projects.models import Collaborator, Project
 from projects.tests.factories import CollaboratorFactory
 
 
@@ -18,3 +18,32 @@ class ProjectTestCase(TestCase):
 
     def test_get_owner_name(self):
         self.assertEqual(self.user.username, self.project.get_owner_name())
+
+    def test_owner_is_stored_on_project(self):
+        project = Project.objects.select_related('owner').get(pk=self.project.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(project.get_owner_name(), self.user.username)
+
+    def test_new_owner_collaborator_changes_owner(self):
+        collaborator = CollaboratorFactory(project=Project.objects.get(pk=self.project.pk))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.owner, collaborator.user)
+
+    def test_deleted_owner_is_unset(self):
+        Collaborator.objects.get(project=self.project, user=self.user).delete()
+        self.project.refresh_from_db()
+        self.assertIsNone(self.project.owner)
+
+    def test_deleted_owner_is_replaced_by_other_owner(self):
+        other = CollaboratorFactory(project=Project.objects.get(pk=self.project.pk), owner=False)
+        Collaborator.objects.filter(pk=other.pk).update(owner=True)
+        Collaborator.objects.get(project=self.project, user=self.user).delete()
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.owner, other.user)
+
+    def test_demoted_owner_is_unset(self):
+        collaborator = Collaborator.objects.get(project=self.project, user=self.user)
+        collaborator.owner = False
+        collaborator.save()
+        self.project.refresh_from_db()
+        self.assertIsNone(self.project.owner)
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django_redis import get_redis_connection
+from guardian.shortcuts import assign_perm, remove_perm
+
+from projects.models import Project
+from projects.permissions import ProjectPermissionCache
+from projects.tests.factories import CollaboratorFactory
+from projects.tests.test_views import ProjectTestMixin
+from users.tests.factories import UserFactory
+
+
+class ProjectPermissionCacheTest(ProjectTestMixin, TestCase):
+    def setUp(self):
+        self.users = UserFactory.create_batch(3)
+        self.projects = [collaborator.project for collaborator in CollaboratorFactory.create_batch(3)]
+        for user in self.users:
+            for project in self.projects:
+                assign_perm('read_project', user, project)
+        assign_perm('write_project', self.users[0], self.projects[0])
+        self.cache = ProjectPermissionCache()
+        # content type of projects is cached for the whole process, as it is when serving requests,
+        # so prefetch takes one query regardless of which tests ran before
+        ContentType.objects.clear_cache()
+        ContentType.objects.get_for_model(Project)
+
+    def tearDown(self):
+        get_redis_connection("default").flushall()
+
+    def test_prefetch(self):
+        # permissions of users and their groups with one union query
+        with self.assertNumQueries(1):
+            self.cache.prefetch(self.users, self.projects)
+            for user in self.users:
+                for project in self.projects:
+                    self.assertTrue(self.cache.has_perm(user, 'read_project', project))
+        self.assertEqual(self.cache.get_perms(self.users[0], self.projects[0]), {'read_project', 'write_project'})
+        self.assertFalse(self.cache.has_perm(self.users[1], 'write_project', self.projects[0]))
+
+    def test_superuser_and_anonymous(self):
+        superuser = UserFactory(is_superuser=True)
+        self.assertTrue(self.cache.has_perm(superuser, 'write_project', self.projects[0]))
+        self.assertFalse(self.cache.has_perm(AnonymousUser(), 'read_project', self.projects[0]))
+
+    @override_settings(PROJECT_PERMISSION_CACHE=True)
+    def test_redis_cache(self):
+        self.cache.prefetch(self.users, self.projects)
+        with self.assertNumQueries(0):
+            perms = ProjectPermissionCache().get_perms(self.users[0], self.projects[0])
+        self.assertEqual(perms, {'read_project', 'write_project'})
+
+    @override_settings(PROJECT_PERMISSION_CACHE=True)
+    def test_redis_cache_invalidation(self):
+        self.cache.prefetch(self.users, self.projects)
+        remove_perm('write_project', self.users[0], self.projects[0])
+        self.assertEqual(ProjectPermissionCache().get_perms(self.users[0], self.projects[0]), {'read_project'})
+        assign_perm('write_project', self.users[1], self.projects[0])
+        self.assertTrue(ProjectPermissionCache().has_perm(self.users[1], 'write_project', self.projects[0]))
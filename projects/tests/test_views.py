@@ -6,6 +6,8 @@ from pathlib import Path
 
 from django.urls import reverse
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import override_settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from guardian.shortcuts import assign_perm
@@ -16,6 +18,7 @@ from projects.tests.factories import (CollaboratorFactory,
                                       ProjectFileFactory)
 from projects.tests.utils import generate_random_file_content
 from users.tests.factories import UserFactory
+from actions.models import Action
 from projects.models import Project, ProjectFile
 import logging
 log = logging.getLogger("projects")
@@ -212,6 +215,7 @@ class ProjectFileTest(ProjectTestMixin, APITestCase):
         proj_files = ProjectFile.objects.filter(project=self.project,
                                                 author=self.user)
         self.assertEqual(proj_files.count(), file_count)
+        self.assertEqual({item['id'] for item in response.data}, {str(pf.pk) for pf in proj_files})
 
         for pf in proj_files:
             full_path = os.path.join(settings.MEDIA_ROOT, pf.file.name)
@@ -304,3 +308,207 @@ class ProjectFileTest(ProjectTestMixin, APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertIsNone(ProjectFile.objects.filter(pk=project_file.pk).first())
         self.assertFalse(os.path.isfile(sys_path))
+
+
+class ProjectFileTreeTest(ProjectTestMixin, APITestCase):
+    def setUp(self):
+        collaborator = CollaboratorFactory()
+        self.user = collaborator.user
+        self.project = collaborator.project
+        assign_perm('read_project', self.user, self.project)
+        self.url = reverse('projectfile-tree', kwargs={'namespace': self.user.username, 'project_pk': self.project.pk})
+        self.project_root = Path(settings.MEDIA_ROOT, self.user.username, str(self.project.pk))
+        for path, content in [('a.txt', b'a'), ('dir/b.txt', b'bb'), ('dir/sub/c.txt', b'ccc'), ('other/d.txt', b'd')]:
+            self.project_root.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+            self.project_root.joinpath(path).write_bytes(content)
+            ProjectFile.objects.create(author=self.user, project=self.project, size=len(content),
+                                       file='{}/{}/{}'.format(self.user.username, self.project.pk, path))
+        self.client = self.client_class(HTTP_AUTHORIZATION='Token {}'.format(self.user.auth_token.key))
+
+    def tearDown(self):
+        shutil.rmtree(str(Path(settings.MEDIA_ROOT, self.user.username)))
+
+    def test_path_and_size(self):
+        project_file = ProjectFile(author=self.user, project=self.project)
+        project_file.file = ContentFile(b'eeee', name='dir/e.txt')
+        project_file.save()
+        self.assertEqual(project_file.path, 'dir/e.txt')
+        self.assertEqual(project_file.size, 4)
+
+    def test_size_is_kept_on_save(self):
+        project_file = ProjectFile.objects.get(path='dir/sub/c.txt')
+        # storage isn't asked for the size of saved content
+        self.project_root.joinpath('dir/sub/c.txt').unlink()
+        project_file.public = True
+        project_file.save()
+        self.assertEqual(ProjectFile.objects.get(pk=project_file.pk).size, 3)
+
+    def test_root(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['size'], 7)
+        self.assertEqual([item['path'] for item in response.data['files']], ['a.txt'])
+        self.assertEqual(response.data['directories'], [
+            {'name': 'dir', 'path': 'dir/', 'count': 2, 'size': 5},
+            {'name': 'other', 'path': 'other/', 'count': 1, 'size': 1},
+        ])
+
+    def test_directory(self):
+        response = self.client.get(self.url, {'path': '/dir'})
+        self.assertEqual(response.data['path'], 'dir/')
+        self.assertEqual([item['path'] for item in response.data['files']], ['dir/b.txt'])
+        self.assertEqual(response.data['directories'], [{'name': 'sub', 'path': 'dir/sub/', 'count': 1, 'size': 3}])
+
+    def test_recursive(self):
+        response = self.client.get(self.url, {'path': 'dir', 'recursive': 'true'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([item['path'] for item in response.data['files']], ['dir/b.txt', 'dir/sub/c.txt'])
+        self.assertEqual(response.data['directories'], [])
+
+
+class ProjectFileDownloadTest(ProjectTestMixin, APITestCase):
+    def setUp(self):
+        collaborator = CollaboratorFactory()
+        self.user = collaborator.user
+        self.project = collaborator.project
+        assign_perm('read_project', self.user, self.project)
+        self.content = b'0123456789'
+        self.project_file = ProjectFileFactory(author=self.user, project=self.project,
+                                               file=ContentFile(self.content, name='data.txt'))
+        url_kwargs = {'namespace': self.user.username, 'project_pk': self.project.pk, 'pk': self.project_file.pk}
+        self.url = reverse('projectfile-download', kwargs=url_kwargs)
+        self.detail_url = reverse('projectfile-detail', kwargs=url_kwargs)
+        self.client = self.client_class(HTTP_AUTHORIZATION='Token {}'.format(self.user.auth_token.key))
+
+    def tearDown(self):
+        shutil.rmtree(str(Path(settings.MEDIA_ROOT, self.user.username)))
+
+    def test_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_range_of_changed_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_conditional(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, status.HTTP_200_OK)
+
+    @override_settings(FILE_DOWNLOAD_INTERNAL_LOCATION='/protected/')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.project_file.file.name)
+
+    def test_base64_is_opt_in(self):
+        response = self.client.get(self.detail_url)
+        self.assertNotIn('base64_data', response.data)
+        response = self.client.get(self.detail_url, {'content': 'true'})
+        self.assertEqual(base64.b64decode(response.data['base64_data']), self.content)
+        with override_settings(FILE_BASE64_MAX_SIZE=5):
+            response = self.client.get(self.detail_url, {'content': 'true'})
+        self.assertIsNone(response.data['base64_data'])
+
+    def test_base64_limit_uses_current_content(self):
+        # stored size is unknown or outdated for files changed on disk
+        ProjectFile.objects.filter(pk=self.project_file.pk).update(size=None)
+        response = self.client.get(self.detail_url, {'content': 'true'})
+        self.assertEqual(base64.b64decode(response.data['base64_data']), self.content)
+        Path(self.project_file.file.path).write_bytes(self.content * 2)
+        with override_settings(FILE_BASE64_MAX_SIZE=15):
+            response = self.client.get(self.detail_url, {'content': 'true'})
+        self.assertIsNone(response.data['base64_data'])
+
+
+class ProjectFileUploadTest(ProjectTestMixin, APITestCase):
+    def setUp(self):
+        collaborator = CollaboratorFactory()
+        self.user = collaborator.user
+        self.project = collaborator.project
+        assign_perm('read_project', self.user, self.project)
+        assign_perm('write_project', self.user, self.project)
+        self.url_kwargs = {'namespace': self.user.username, 'project_pk': self.project.pk}
+        self.user_dir = Path('/tmp', self.user.username)
+        self.client = self.client_class(HTTP_AUTHORIZATION='Token {}'.format(self.user.auth_token.key))
+        self.content = os.urandom(3000)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.user_dir), ignore_errors=True)
+
+    def start(self):
+        url = reverse('fileupload-list', kwargs=self.url_kwargs)
+        response = self.client.post(url, {'name': 'data.bin', 'size': len(self.content)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return reverse('fileupload-detail', kwargs=dict(self.url_kwargs, pk=response.data['id']))
+
+    def put_chunk(self, url, offset, chunk):
+        return self.client.put(url, chunk, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunk_larger_than_request_body_limit(self):
+        self.content = os.urandom(settings.DATA_UPLOAD_MAX_MEMORY_SIZE + 1)
+        url = self.start()
+        response = self.put_chunk(url, 0, self.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], len(self.content))
+        # the chunk isn't recorded as payload of the action
+        self.assertEqual(Action.objects.get(path=url, method='put').payload, {})
+
+    def test_chunked_upload(self):
+        url = self.start()
+        for offset in range(0, len(self.content), 1000):
+            response = self.put_chunk(url, offset, self.content[offset:offset + 1000])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['offset'], offset + 1000)
+        response = self.client.post(url + 'complete/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        project_file = ProjectFile.objects.get(pk=response.data['id'])
+        self.assertEqual(project_file.author, self.user)
+        self.assertEqual(project_file.file.read(), self.content)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_resume(self):
+        url = self.start()
+        self.put_chunk(url, 0, self.content[:1000])
+        response = self.put_chunk(url, 2000, self.content[2000:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.get(url).data['offset'], 1000)
+        self.put_chunk(url, 1000, self.content[1000:])
+        response = self.client.post(url + 'complete/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_incomplete_and_oversized(self):
+        url = self.start()
+        self.put_chunk(url, 0, self.content[:1000])
+        self.assertEqual(self.client.post(url + 'complete/').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.put_chunk(url, 1000, self.content + b'extra')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url).data['offset'], 1000)
+
+    def test_other_user(self):
+        url = self.start()
+        other = UserFactory()
+        self.client = self.client_class(HTTP_AUTHORIZATION='Token {}'.format(other.auth_token.key))
+        assign_perm('read_project', other, self.project)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,94 @@
+import fcntl
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.utils.text import get_valid_filename
+
+from .blobs import set_file_content
+from .models import ProjectFile
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    pass
+
+
+class ChunkedUpload(object):
+    """
+    Resumable upload of a single project file. Chunks are appended to a staging file,
+    which is handed to the storage backend when the upload is complete.
+    """
+    KEY = 'file_upload:{}'
+
+    def __init__(self, id, project_id, author_id, name, size, public=False):
+        self.id = id
+        self.project_id = project_id
+        self.author_id = author_id
+        self.name = name
+        self.size = size
+        self.public = public
+
+    @classmethod
+    def start(cls, project, author, name, size, public=False):
+        upload = cls(uuid.uuid4().hex, str(project.pk), str(author.pk), get_valid_filename(name), size, public)
+        upload.path.parent.mkdir(parents=True, exist_ok=True)
+        upload.path.touch()
+        cache.set(cls.KEY.format(upload.id), upload.to_dict(), settings.FILE_UPLOAD_EXPIRY)
+        return upload
+
+    @classmethod
+    def get(cls, upload_id):
+        data = cache.get(cls.KEY.format(upload_id))
+        return None if data is None else cls(**data)
+
+    def to_dict(self) -> dict:
+        return dict(id=self.id, project_id=self.project_id, author_id=self.author_id,
+                    name=self.name, size=self.size, public=self.public)
+
+    @property
+    def path(self) -> Path:
+        return Path(settings.FILE_UPLOAD_STAGING_DIR, self.id)
+
+    @property
+    def offset(self) -> int:
+        return self.path.stat().st_size
+
+    def write(self, offset, stream) -> int:
+        """
+        Appends a chunk read from stream, offset must be the number of bytes received so far.
+        Returns the new offset.
+        """
+        with self.path.open('ab') as f:
+            # concurrent requests for the same upload wait for each other
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0, os.SEEK_END)
+            if offset != f.tell():
+                raise OffsetMismatch("Upload is at offset {}".format(f.tell()))
+            for chunk in iter(lambda: stream.read(settings.FILE_UPLOAD_BUFFER_SIZE), b''):
+                if f.tell() + len(chunk) > self.size:
+                    f.truncate(offset)
+                    raise UploadError("Upload is larger than {} bytes".format(self.size))
+                f.write(chunk)
+            return f.tell()
+
+    def complete(self, project, author) -> ProjectFile:
+        if self.offset != self.size:
+            raise UploadError("Only {} of {} bytes were uploaded".format(self.offset, self.size))
+        with self.path.open('rb') as f:
+            project_file = ProjectFile(author=author, project=project, public=self.public)
+            set_file_content(project_file, File(f, self.name))
+            project_file.save()
+        self.abort()
+        return project_file
+
+    def abort(self) -> None:
+        cache.delete(self.KEY.format(self.id))
+        if self.path.exists():
+            self.path.unlink()
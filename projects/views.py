@@ -1,17 +1,27 @@
 import base64
 import logging
+from io import BytesIO
 from django.core.files.base import ContentFile
 from rest_framework import viewsets, status, permissions
+from django.db.models import Count, Sum
+from rest_framework.decorators import detail_route, list_route
+from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 
 from base.views import NamespaceMixin
+from projects.blobs import set_file_content
+from projects.downloads import file_download_response
 from projects.serializers import (ProjectSerializer,
                                   CollaboratorSerializer,
                                   SyncedResourceSerializer,
-                                  ProjectFileSerializer)
+                                  ProjectFileSerializer,
+                                  FileUploadSerializer,
+                                  base64_max_length)
 from projects.models import Project, Collaborator, SyncedResource
-from projects.permissions import ProjectPermission, ProjectChildPermission
+from projects.permissions import ProjectPermission, ProjectChildPermission, has_project_permission
+from projects.uploads import ChunkedUpload, UploadError, OffsetMismatch
 from projects.tasks import sync_github
 from projects.models import ProjectFile
 
@@ -19,7 +29,7 @@ log = logging.getLogger('projects')
 
 
 class ProjectViewSet(NamespaceMixin, viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+    queryset = Project.objects.select_related('owner').prefetch_related('collaborators')
     serializer_class = ProjectSerializer
     permission_classes = (permissions.IsAuthenticated, ProjectPermission)
     filter_fields = ('private', 'name')
@@ -34,7 +44,7 @@ class ProjectMixin(object):
 
 
 class CollaboratorViewSet(ProjectMixin, viewsets.ModelViewSet):
-    queryset = Collaborator.objects.all()
+    queryset = Collaborator.objects.select_related('user', 'project')
     serializer_class = CollaboratorSerializer
 
 
@@ -58,9 +68,40 @@ class SyncedResourceViewSet(ProjectMixin, viewsets.ModelViewSet):
 
 class ProjectFileViewSet(ProjectMixin,
                          viewsets.ModelViewSet):
-    queryset = ProjectFile.objects.all()
+    queryset = ProjectFile.objects.order_by('path')
     serializer_class = ProjectFileSerializer
     parser_classes = (MultiPartParser, FormParser, JSONParser)
+    filter_fields = ('path',)
+
+    @list_route(methods=['get'])
+    def tree(self, request, *args, **kwargs):
+        """
+        Lists a directory of the project, given by the path parameter.
+        Subdirectories are summarized unless recursive is true, then all files below the directory are listed.
+        """
+        directory = request.query_params.get('path', '').strip('/')
+        if directory:
+            directory += '/'
+        recursive = request.query_params.get('recursive') in ['true', '1']
+        files = self.get_queryset()
+        totals = files.under(directory).aggregate(count=Count('pk'), size=Sum('size'))
+        listed = files.under(directory) if recursive else files.in_directory(directory)
+        page = self.paginate_queryset(listed)
+        serializer = self.get_serializer(listed if page is None else page, many=True)
+        return Response({
+            'path': directory,
+            'count': totals['count'],
+            'size': totals['size'] or 0,
+            'directories': [] if recursive else [
+                dict(subdirectory, path=directory + subdirectory['name'] + '/', size=subdirectory['size'] or 0)
+                for subdirectory in files.subdirectories(directory)
+            ],
+            'files': serializer.data,
+        })
+
+    @detail_route(methods=['get'])
+    def download(self, request, *args, **kwargs):
+        return file_download_response(request, self.get_object())
 
     def _get_files(self, request):
         files = request.FILES.get("file") or request.FILES.getlist("files")
@@ -75,6 +116,8 @@ class ProjectFileViewSet(ProjectMixin,
                 log.warning("Base64 data was uploaded, but no name was provided")
                 raise ValueError("When uploading base64 data, the 'name' field must be populated.")
 
+            if len(b64_data) > base64_max_length():
+                raise ValidationError({'base64_data': "Base64 data is too large, use chunked uploads instead."})
             file_data = base64.b64decode(b64_data)
             files = ContentFile(file_data, name=name)
 
@@ -85,25 +128,16 @@ class ProjectFileViewSet(ProjectMixin,
 
     def create(self, request, *args, **kwargs):
         files = self._get_files(request)
-
-        proj_files_to_serialize = []
-        project_pk = request.data.get("project")
-
+        project = get_object_or_404(Project, pk=request.data.get("project"))
         public = request.data.get("public") in ["true", "on", True]
 
+        # files are written to storage by bulk_create
+        proj_files = []
         for f in files:
-            project = Project.objects.get(pk=project_pk)
-            create_data = {'author': self.request.user,
-                           'project': project,
-                           'file': f,
-                           'public': public}
-            project_file = ProjectFile(**create_data)
-
-            project_file.save()
-
-            proj_files_to_serialize.append(project_file.pk)
-
-        proj_files = ProjectFile.objects.filter(pk__in=proj_files_to_serialize)
+            proj_file = ProjectFile(author=request.user, project=project, public=public)
+            set_file_content(proj_file, f)
+            proj_files.append(proj_file)
+        ProjectFile.objects.bulk_create(proj_files)
 
         serializer = self.serializer_class(proj_files,
                                            context={'request': request},
@@ -134,3 +168,65 @@ class ProjectFileViewSet(ProjectMixin,
         return Response(data=serializer.data,
                         status=status.HTTP_200_OK)
 
+
+class ProjectFileUploadViewSet(viewsets.ViewSet):
+    """
+    Resumable chunked uploads of project files.
+    POST starts an upload, PUT appends the request body at the Upload-Offset header,
+    GET tells how much was received and POST to complete/ creates the project file.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_project(self):
+        project = get_object_or_404(Project, pk=self.kwargs.get('project_pk'))
+        if not has_project_permission(self.request, project):
+            raise PermissionDenied()
+        return project
+
+    def get_upload(self, project):
+        upload = ChunkedUpload.get(self.kwargs.get('pk'))
+        if upload is None or upload.project_id != str(project.pk) or upload.author_id != str(self.request.user.pk):
+            raise NotFound()
+        return upload
+
+    @staticmethod
+    def _upload_response(upload, **kwargs):
+        return Response(dict(upload.to_dict(), offset=upload.offset), **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        project = self.get_project()
+        serializer = FileUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = ChunkedUpload.start(project, request.user, **serializer.validated_data)
+        return self._upload_response(upload, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._upload_response(self.get_upload(self.get_project()))
+
+    def update(self, request, *args, **kwargs):
+        upload = self.get_upload(self.get_project())
+        try:
+            offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+            upload.write(offset, request.stream or BytesIO())
+        except ValueError:
+            return Response({'message': "Upload-Offset header is required"}, status=status.HTTP_400_BAD_REQUEST)
+        except OffsetMismatch as e:
+            return Response({'message': str(e), 'offset': upload.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._upload_response(upload)
+
+    def destroy(self, request, *args, **kwargs):
+        self.get_upload(self.get_project()).abort()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @detail_route(methods=['post'])
+    def complete(self, request, *args, **kwargs):
+        project = self.get_project()
+        upload = self.get_upload(project)
+        try:
+            project_file = upload.complete(project, request.user)
+        except UploadError as e:
+            return Response({'message': str(e), 'offset': upload.offset}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ProjectFileSerializer(project_file, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
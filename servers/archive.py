@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+import tarfile
+import zlib
+
+NONE = 'none'
+GZIP = 'gzip'
+
+CHUNK_SIZE = 64 * 1024
+
+
+def available_codecs():
+    # docker put_archive accepts plain, gzip, bzip2 and xz tar archives, gzip is the only fast one of them
+    return [NONE, GZIP]
+
+
+class TarStream(object):
+    """
+    Tar archive produced lazily while walking the file tree, so that it can be fed
+    to docker put_archive chunk by chunk without holding the archive in memory.
+
+    `sources` is a list of (path, arcname) pairs. When `manifest` from the previous upload is given,
+    files that didn't change since then are left out of the archive.
+    After the stream is consumed `manifest` holds the state of all files for the next upload
+    and `removed` lists files of the previous upload which don't exist anymore.
+    """
+
+    def __init__(self, sources, codec=GZIP, manifest=None, chunk_size=CHUNK_SIZE):
+        if codec not in available_codecs():
+            raise ValueError("Unsupported archive codec: {}".format(codec))
+        self.sources = sources
+        self.codec = codec
+        self.previous_manifest = manifest or {}
+        self.manifest = {}
+        self.chunk_size = chunk_size
+        self._tar = tarfile.TarFile(fileobj=io.BytesIO(), mode='w')
+
+    def __iter__(self):
+        buffer = bytearray()
+        for chunk in self._compress(self._iter_tar()):
+            buffer.extend(chunk)
+            if len(buffer) >= self.chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+    @property
+    def removed(self) -> list:
+        return sorted(set(self.previous_manifest) - set(self.manifest))
+
+    def _iter_tar(self):
+        written = 0
+        for path, arcname in self.sources:
+            for chunk in self._iter_tree(path, arcname.strip('/')):
+                written += len(chunk)
+                yield chunk
+        # end of archive is marked with two empty blocks, archive is padded to full record
+        end = tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+        written += len(end)
+        remainder = written % tarfile.RECORDSIZE
+        if remainder:
+            end += tarfile.NUL * (tarfile.RECORDSIZE - remainder)
+        yield end
+
+    def _iter_tree(self, root, arcroot):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            rel = os.path.relpath(dirpath, root)
+            arcdir = arcroot if rel == '.' else os.path.join(arcroot, rel)
+            yield from self._iter_entry(dirpath, arcdir)
+            for filename in sorted(filenames):
+                yield from self._iter_entry(os.path.join(dirpath, filename), os.path.join(arcdir, filename))
+
+    def _iter_entry(self, path, arcname):
+        try:
+            tarinfo = self._tar.gettarinfo(path, arcname)
+        except OSError:
+            # file was removed while we were walking the tree
+            return
+        if tarinfo is None:
+            # sockets and other unsupported file types
+            return
+        if tarinfo.isreg() and self._is_unchanged(path, arcname, tarinfo):
+            return
+        yield tarinfo.tobuf(self._tar.format, self._tar.encoding, self._tar.errors)
+        if not tarinfo.isreg():
+            return
+        with open(path, 'rb') as f:
+            remaining = tarinfo.size
+            while remaining:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    # file got truncated, fill up to the size recorded in header
+                    chunk = tarfile.NUL * remaining
+                remaining -= len(chunk)
+                yield chunk
+        remainder = tarinfo.size % tarfile.BLOCKSIZE
+        if remainder:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - remainder)
+
+    def _is_unchanged(self, path, arcname, tarinfo) -> bool:
+        previous = self.previous_manifest.get(arcname)
+        # microseconds, so that the manifest survives a round trip through json
+        entry = {'size': tarinfo.size, 'mtime': int(tarinfo.mtime * 1000000), 'sha1': None}
+        self.manifest[arcname] = entry
+        if previous is None or previous['size'] != tarinfo.size:
+            return False
+        if previous['mtime'] == entry['mtime']:
+            entry['sha1'] = previous.get('sha1')
+            return True
+        # touched, but content might still be the same
+        entry['sha1'] = self._hash_file(path)
+        return entry['sha1'] is not None and entry['sha1'] == previous.get('sha1')
+
+    def _hash_file(self, path):
+        sha1 = hashlib.sha1()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    sha1.update(chunk)
+        except OSError:
+            return None
+        return sha1.hexdigest()
+
+    def _compress(self, chunks):
+        if self.codec == NONE:
+            yield from chunks
+            return
+        compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
@@ -0,0 +1,124 @@
+import logging
+import re
+import threading
+import time
+
+from django.db import close_old_connections
+
+from infrastructure.clients import get_docker_client
+from infrastructure.models import DockerHost
+from .models import Server
+from .status import cache_statuses, resolve_statuses
+
+logger = logging.getLogger(__name__)
+
+# docker container event -> server status
+EVENT_STATES = {
+    'create': Server.STOPPED,
+    'start': Server.RUNNING,
+    'restart': Server.RUNNING,
+    'unpause': Server.RUNNING,
+    'pause': Server.STOPPED,
+    'kill': Server.STOPPING,
+    'die': Server.STOPPED,
+    'stop': Server.STOPPED,
+    'destroy': Server.STOPPED,
+}
+
+CONTAINER_NAME_RE = re.compile(r'^/?server_(?P<pk>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_')
+
+LOCAL_HOST = 'local'
+
+
+class DockerEventListener(object):
+    """
+    Follows docker events on every docker host and writes server state transitions
+    into server state hashes, so that Server.status never needs to ask docker
+    """
+
+    def __init__(self, reconnect_delay=5):
+        self.reconnect_delay = reconnect_delay
+        self._stopped = threading.Event()
+        self._threads = {}
+
+    def run(self, refresh_interval=60):
+        while not self._stopped.is_set():
+            self.sync_hosts()
+            self._stopped.wait(refresh_interval)
+
+    def stop(self):
+        self._stopped.set()
+
+    def sync_hosts(self):
+        """
+        Starts a listener thread for every docker host that doesn't have one yet
+        """
+        hosts = {LOCAL_HOST: None}
+        hosts.update({host.pk: host for host in DockerHost.objects.all()})
+        for key, host in hosts.items():
+            thread = self._threads.get(key)
+            if thread is not None and thread.is_alive():
+                continue
+            thread = threading.Thread(target=self.follow, args=(host,), name='docker-events-{}'.format(key))
+            thread.daemon = True
+            thread.start()
+            self._threads[key] = thread
+        close_old_connections()
+
+    def follow(self, host):
+        since = None
+        while not self._stopped.is_set():
+            try:
+                if host is not None and not DockerHost.objects.filter(pk=host.pk).exists():
+                    logger.info("Docker host '%s' was removed, not listening for its events anymore", host)
+                    return
+                since = self.listen(host, since=since)
+            except Exception:
+                logger.exception("Lost docker event stream for host '%s'", host or LOCAL_HOST)
+            finally:
+                close_old_connections()
+            self._stopped.wait(self.reconnect_delay)
+
+    def listen(self, host, since=None):
+        """
+        Seeds statuses of all host servers and then applies events until the stream ends.
+        Returns time of the last seen event, to resume from it.
+        """
+        client = get_docker_client(host)
+        if since is None:
+            since = int(time.time())
+            self.seed(host)
+        for event in client.events(since=since, filters={'type': 'container'}, decode=True):
+            if self._stopped.is_set():
+                break
+            self.handle_event(event)
+            since = event.get('time', since)
+        return since
+
+    @staticmethod
+    def seed(host):
+        servers = Server.objects.filter(host=host).select_related('host')
+        resolve_statuses(servers)
+
+    def handle_event(self, event):
+        if event.get('Type', 'container') != 'container':
+            return
+        status = EVENT_STATES.get(event.get('Action') or event.get('status'))
+        if status is None:
+            return
+        server_pk = self._get_server_pk(event)
+        if server_pk is None:
+            return
+        logger.debug("Server %s is now %s", server_pk, status)
+        cache_statuses({Server(pk=server_pk): status})
+
+    @staticmethod
+    def _get_server_pk(event):
+        name = event.get('Actor', {}).get('Attributes', {}).get('name', '')
+        match = CONTAINER_NAME_RE.match(name)
+        if match is not None:
+            return match.group('pk')
+        # older docker versions only send container id
+        if not event.get('id'):
+            return None
+        return Server.objects.filter(container_id=event.get('id')).values_list('pk', flat=True).first()
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from servers.events import DockerEventListener
+
+
+class Command(BaseCommand):
+    help = "Keep server statuses up to date by following docker events on all docker hosts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', type=int, default=60, help='How often to look for new docker hosts (seconds)')
+
+    def handle(self, *args, **options):
+        listener = DockerEventListener()
+        try:
+            listener.run(refresh_interval=options['refresh'])
+        except KeyboardInterrupt:
+            listener.stop()
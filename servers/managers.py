@@ -3,4 +3,4 @@ from django.db import models
 
 class ServerQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(server__project__collaborator__user=namespace.object)
+        return self.filter(server__project__collaborator__user_id=namespace.id)
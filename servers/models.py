@@ -10,6 +10,7 @@ from django_redis import get_redis_connection
 from base.namespace import Namespace
 from .managers import ServerQuerySet
 from .spawners import DockerSpawner
+from .status import get_cached_statuses, cache_statuses
 
 
 class Server(models.Model):
@@ -23,6 +24,17 @@ class Server(models.Model):
     TERMINATED = "Terminated"
     TERMINATING = "Terminating"
 
+    # docker container state -> server status
+    DOCKER_STATES = {
+        'created': STOPPED,
+        'restarting': LAUNCHING,
+        'running': RUNNING,
+        'paused': STOPPED,
+        'exited': STOPPED,
+        'removing': TERMINATING,
+        'dead': ERROR,
+    }
+
     SERVER_STATE_CACHE_PREFIX = 'server_state_'
 
     STOP = 'stop'
@@ -75,9 +87,17 @@ class Server(models.Model):
 
     @property
     def status(self):
-        spawner = DockerSpawner(self)
-        status = spawner.status()
-        return status.decode() if isinstance(status, bytes) else status
+        status = get_cached_statuses([self]).get(self.pk)
+        if status is None:
+            spawner = DockerSpawner(self)
+            status = spawner.status()
+            status = status.decode() if isinstance(status, bytes) else status
+            cache_statuses({self: status})
+        return status
+
+    @status.setter
+    def status(self, value):
+        cache_statuses({self: value})
 
     def needs_update(self):
         cache = get_redis_connection("default")
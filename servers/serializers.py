@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
+from django.db.models import Manager
 from rest_framework import serializers
 
 from base.serializers import SearchSerializerMixin
+from .status import get_statuses
 from . import models
 
 
@@ -12,7 +14,21 @@ class EnvironmentResourceSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'cpu', 'memory', 'active')
 
 
+class ServerListSerializer(serializers.ListSerializer):
+    """
+    Resolves statuses of the whole page at once instead of asking docker for every server
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, Manager) else data
+        items = list(iterable)
+        # search results wrap the model instance in `object`
+        servers = [getattr(item, 'object', item) for item in items]
+        self.statuses = get_statuses(server for server in servers if isinstance(server, models.Server))
+        return [self.child.to_representation(item) for item in items]
+
+
 class ServerSerializer(SearchSerializerMixin, serializers.ModelSerializer):
+    status = serializers.SerializerMethodField()
     endpoint = serializers.SerializerMethodField()
     logs_url = serializers.SerializerMethodField()
     status_url = serializers.SerializerMethodField()
@@ -26,6 +42,7 @@ class ServerSerializer(SearchSerializerMixin, serializers.ModelSerializer):
             'connected': {'allow_empty': True, 'required': False},
             'environment_resources': {'allow_empty': True, 'required': False},
         }
+        list_serializer_class = ServerListSerializer
 
     def create(self, validated_data):
         config = validated_data.pop("config", {})
@@ -45,6 +62,12 @@ class ServerSerializer(SearchSerializerMixin, serializers.ModelSerializer):
             instance.config = {**instance.config, **config}
         return super().update(instance, validated_data)
 
+    def get_status(self, obj):
+        statuses = getattr(self.parent, 'statuses', {})
+        if obj.pk in statuses:
+            return statuses[obj.pk]
+        return obj.status
+
     def get_endpoint(self, obj):
         request = self.context['request']
         return '{scheme}://{host}/server/{id}{url}'.format(
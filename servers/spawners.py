@@ -2,17 +2,18 @@ import abc
 import os
 
 import logging
-import tarfile
-from io import BytesIO
+import ujson
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.utils.functional import cached_property
-from docker import from_env
+from django_redis import get_redis_connection
 from docker.errors import APIError
 
+from infrastructure.clients import get_docker_client
 from utils import create_jwt_token
+from .archive import TarStream
 
 
 logger = logging.getLogger(__name__)
@@ -50,7 +51,7 @@ class ServerSpawner(object):
 class DockerSpawner(ServerSpawner):
     def __init__(self, server, client=None):
         super().__init__(server)
-        self.client = client or (server.host.client if server.host else from_env())
+        self.client = client or get_docker_client(server.host)
         self.container_port = self.server.config.get('port') or settings.SERVER_PORT
         self.container_id = ''
         self.cmd = None
@@ -127,16 +128,34 @@ class DockerSpawner(ServerSpawner):
             config['links'] = self._connected_links()
         return config
 
-    def _prepare_tar_file(self):
-        tar_stream = BytesIO()
-        tar = tarfile.TarFile.xzopen(name="server.tar.xz", fileobj=tar_stream, mode="w")
-        tar.add(self.server.volume_path, arcname=settings.SERVER_RESOURCE_DIR)
+    def _prepare_tar_file(self, manifest=None):
+        sources = [(self.server.volume_path, settings.SERVER_RESOURCE_DIR)]
         ssh_path = self._get_ssh_path()
         if ssh_path:
-            tar.add(ssh_path, arcname=settings.SERVER_RESOURCE_DIR)
-        tar.close()
-        tar_stream.seek(0)
-        return tar_stream
+            sources.append((ssh_path, '{}/.ssh'.format(settings.SERVER_RESOURCE_DIR)))
+        return TarStream(sources, codec=settings.SERVER_ARCHIVE_CODEC, manifest=manifest)
+
+    def _put_files(self):
+        """
+        Streams project files into the container, skipping files unchanged since the last upload
+        """
+        cache = get_redis_connection("default")
+        manifest = cache.hget(self.server.state_cache_key, 'archive_manifest')
+        archive = self._prepare_tar_file(ujson.loads(manifest) if manifest else None)
+        try:
+            self.client.put_archive(self.server.container_name, '/', archive)
+            if archive.removed:
+                exec_id = self.client.exec_create(self.server.container_name,
+                                                  ['rm', '-f', '--'] + ['/' + name for name in archive.removed])
+                self.client.exec_start(exec_id)
+        except APIError as e:
+            logger.info(e.response.content)
+            raise
+        cache.hset(self.server.state_cache_key, 'archive_manifest', ujson.dumps(archive.manifest))
+
+    def _reset_archive_manifest(self):
+        # a new container has none of the previously uploaded files
+        get_redis_connection("default").hdel(self.server.state_cache_key, 'archive_manifest')
 
     def _create_container(self):
         try:
@@ -149,6 +168,7 @@ class DockerSpawner(ServerSpawner):
         self.container_id = docker_resp['Id']
         self.server.container_id = self.container_id
         self.server.save()
+        self._reset_archive_manifest()
         logger.info("Container created '{}', id:{}".format(self.server.container_name, self.container_id))
 
     def _create_container_config(self):
@@ -194,6 +214,7 @@ class DockerSpawner(ServerSpawner):
                 raise
         if container is not None:
             if not self._compare_container_env(container):
+                self._reset_archive_manifest()
                 try:
                     self.client.remove_container(self.server.container_name)
                 except APIError as e:
@@ -223,7 +244,7 @@ class DockerSpawner(ServerSpawner):
         self.server.save()
 
     def terminate(self) -> None:
-
+        self._reset_archive_manifest()
         try:
             # if the container has a state, then it exists
             self.client.remove_container(self.server.container_name)
@@ -254,13 +275,7 @@ class DockerSpawner(ServerSpawner):
                 return self.server.STOPPED
             return self.server.ERROR
         else:
-            return {
-                'created': self.server.STOPPED,
-                'restarting': self.server.LAUNCHING,
-                'running': self.server.RUNNING,
-                'paused': self.server.STOPPED,
-                'exited': self.server.STOPPED
-            }[result['State']['Status']]
+            return self.server.DOCKER_STATES[result['State']['Status']]
 
     def _get_ssh_path(self):
         ssh_path = os.path.abspath(os.path.join(self.server.volume_path, '..', '.ssh'))
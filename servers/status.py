@@ -0,0 +1,110 @@
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from docker.errors import APIError
+
+from infrastructure.clients import get_docker_client
+
+logger = logging.getLogger(__name__)
+
+STATUS_FIELD = 'status'
+STATUS_TIMESTAMP_FIELD = 'status_at'
+
+
+def get_cached_statuses(servers) -> dict:
+    """
+    Returns {server pk: status} for servers whose cached status is still fresh
+    """
+    servers = list(servers)
+    if not servers:
+        return {}
+    cache = get_redis_connection("default")
+    pipe = cache.pipeline(transaction=False)
+    for server in servers:
+        pipe.hmget(server.state_cache_key, STATUS_FIELD, STATUS_TIMESTAMP_FIELD)
+    now = time.time()
+    statuses = {}
+    for server, (status, updated_at) in zip(servers, pipe.execute()):
+        if status is None or updated_at is None:
+            continue
+        if not settings.SERVER_STATUS_FROM_EVENTS and now - float(updated_at) > settings.SERVER_STATUS_CACHE_TTL:
+            continue
+        statuses[server.pk] = status.decode() if isinstance(status, bytes) else status
+    return statuses
+
+
+def cache_statuses(statuses: dict) -> None:
+    """
+    Stores {server: status} in each server state hash
+    """
+    if not statuses:
+        return
+    cache = get_redis_connection("default")
+    pipe = cache.pipeline(transaction=False)
+    now = time.time()
+    for server, status in statuses.items():
+        pipe.hmset(server.state_cache_key, {STATUS_FIELD: status, STATUS_TIMESTAMP_FIELD: now})
+    pipe.execute()
+
+
+def resolve_statuses(servers) -> dict:
+    """
+    Asks docker for the state of all given servers with one request per docker host
+    and caches the result. Returns {server pk: status}
+    """
+    by_host = defaultdict(list)
+    for server in servers:
+        by_host[server.host_id].append(server)
+    statuses = {}
+    for host_servers in by_host.values():
+        statuses.update(_get_host_statuses(host_servers[0].host, host_servers))
+    cache_statuses(statuses)
+    return {server.pk: status for server, status in statuses.items()}
+
+
+def get_statuses(servers) -> dict:
+    """
+    Cached statuses where we have them, one batched docker lookup for the rest
+    """
+    servers = list(servers)
+    statuses = get_cached_statuses(servers)
+    missing = [server for server in servers if server.pk not in statuses]
+    if missing:
+        statuses.update(resolve_statuses(missing))
+    return statuses
+
+
+def _get_host_statuses(host, servers) -> dict:
+    client = get_docker_client(host)
+    by_name = {server.container_name: server for server in servers}
+    try:
+        containers = client.containers(all=True, filters={'name': list(by_name)})
+    except APIError:
+        logger.exception("Unable to list containers on host '%s'", host)
+        return {server: server.ERROR for server in servers}
+    # containers which docker doesn't know about are considered stopped, same as a 404 on inspect
+    statuses = {server: server.STOPPED for server in servers}
+    for container in containers:
+        for name in container.get('Names') or []:
+            server = by_name.get(name.lstrip('/'))
+            if server is not None:
+                statuses[server] = server.DOCKER_STATES.get(_get_container_state(container), server.ERROR)
+    return statuses
+
+
+def _get_container_state(container) -> str:
+    state = container.get('State')
+    if isinstance(state, str):
+        return state
+    # docker API < 1.23 only returns human readable status, e.g. "Up 2 hours" or "Exited (0) 3 days ago"
+    status = container.get('Status', '')
+    if status.startswith('Up'):
+        return 'paused' if '(Paused)' in status else 'running'
+    if status.startswith('Restarting'):
+        return 'restarting'
+    if status == 'Created':
+        return 'created'
+    return 'exited'
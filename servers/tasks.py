@@ -4,7 +4,7 @@ from .models import Server
 
 
 def server_action(action: str, server_pk: str):
-    server = Server.objects.get(pk=server_pk)
+    server = Server.objects.select_related('project__owner__profile').get(pk=server_pk)
     spawner = DockerSpawner(server)
     getattr(spawner, action)()
 
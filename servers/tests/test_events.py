@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django_redis import get_redis_connection
+
+from servers.events import DockerEventListener
+from servers.models import Server
+from .factories import ServerFactory
+from .fake_docker_api_client.fake_api import FAKE_CONTAINER_ID
+from .fake_docker_api_client.fake_api_client import make_fake_client
+
+
+@override_settings(SERVER_STATUS_FROM_EVENTS=True)
+class TestDockerEventListener(TestCase):
+    def setUp(self):
+        self.cache = get_redis_connection("default")
+        self.client = make_fake_client()
+        self.server = ServerFactory(container_id=FAKE_CONTAINER_ID)
+        self.listener = DockerEventListener()
+        patcher = patch('servers.events.get_docker_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.flushall()
+
+    def test_listen(self):
+        self.server.status = Server.RUNNING
+        self.listener.listen(None, since=1423247800)
+        self.assertEqual(self.server.status, Server.STOPPED)
+
+    def test_listen_returns_last_event_time(self):
+        since = self.listener.listen(None, since=1423247800)
+        self.assertEqual(since, 1423247867)
+
+    @patch('servers.status.get_docker_client')
+    def test_listen_seeds_statuses(self, status_get_client):
+        status_get_client.return_value = self.client
+        self.client.events.return_value = []
+        self.client.containers.return_value = [{'Names': ['/' + self.server.container_name], 'State': 'running'}]
+        self.listener.listen(None)
+        self.assertEqual(self.server.status, Server.RUNNING)
+
+    def test_handle_event_by_name(self):
+        event = {
+            'Type': 'container',
+            'Action': 'start',
+            'Actor': {'ID': 'other', 'Attributes': {'name': self.server.container_name}},
+        }
+        self.listener.handle_event(event)
+        self.assertEqual(self.server.status, Server.RUNNING)
+
+    def test_handle_event_ignores_unknown(self):
+        self.server.status = Server.RUNNING
+        self.listener.handle_event({'Type': 'network', 'Action': 'destroy', 'id': FAKE_CONTAINER_ID})
+        self.listener.handle_event({'status': 'exec_start', 'id': FAKE_CONTAINER_ID})
+        self.listener.handle_event({'status': 'stop', 'id': 'unknown'})
+        self.assertEqual(self.server.status, Server.RUNNING)
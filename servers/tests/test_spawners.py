@@ -1,4 +1,7 @@
 import os
+import tarfile
+from io import BytesIO
+from pathlib import Path
 from unittest.mock import patch
 
 from django.test import TransactionTestCase
@@ -156,3 +159,35 @@ class TestDockerSpawnerForModel(TransactionTestCase):
         links = self.spawner._connected_links()
         self.assertIn(conn.container_name, links)
         self.assertEqual(links[conn.container_name], conn.name.lower())
+
+    def test_put_files(self):
+        os.makedirs(self.server.volume_path, exist_ok=True)
+        Path(self.server.volume_path, 'test.txt').write_text('test')
+        archives = []
+        self.spawner.client.put_archive.side_effect = lambda container, path, data: archives.append(b''.join(data))
+        self.spawner._put_files()
+        self.spawner._put_files()
+        first, second = [tarfile.open(fileobj=BytesIO(archive), mode='r:*') for archive in archives]
+        self.assertIn('resources/test.txt', first.getnames())
+        self.assertNotIn('resources/test.txt', second.getnames())
+
+    def test_put_files_after_container_is_recreated(self):
+        os.makedirs(self.server.volume_path, exist_ok=True)
+        Path(self.server.volume_path, 'test.txt').write_text('test')
+        archives = []
+        self.spawner.client.put_archive.side_effect = lambda container, path, data: archives.append(b''.join(data))
+        self.spawner._put_files()
+        self.spawner.cmd = ''
+        self.spawner._create_container()
+        self.spawner._put_files()
+        self.assertIn('resources/test.txt', tarfile.open(fileobj=BytesIO(archives[1]), mode='r:*').getnames())
+
+    def test_put_files_removes_deleted_files(self):
+        os.makedirs(self.server.volume_path, exist_ok=True)
+        Path(self.server.volume_path, 'test.txt').write_text('test')
+        self.spawner.client.put_archive.side_effect = lambda container, path, data: b''.join(data)
+        self.spawner._put_files()
+        Path(self.server.volume_path, 'test.txt').unlink()
+        self.spawner._put_files()
+        self.spawner.client.exec_create.assert_called_once_with(
+            self.server.container_name, ['rm', '-f', '--', '/resources/test.txt'])
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from servers.models import Server
+from servers.status import get_cached_statuses, cache_statuses, resolve_statuses, get_statuses
+from .factories import ServerFactory
+from .fake_docker_api_client.fake_api_client import make_fake_client
+
+
+class TestServerStatus(TestCase):
+    def setUp(self):
+        self.cache = get_redis_connection("default")
+        self.client = make_fake_client()
+        self.running = ServerFactory()
+        self.stopped = ServerFactory()
+        self.missing = ServerFactory()
+        self.client.containers.return_value = [
+            {'Names': ['/' + self.running.container_name], 'State': 'running'},
+            {'Names': ['/' + self.stopped.container_name], 'Status': 'Exited (0) 3 days ago'},
+        ]
+        patcher = patch('servers.status.get_docker_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.flushall()
+
+    def test_resolve_statuses(self):
+        statuses = resolve_statuses([self.running, self.stopped, self.missing])
+        self.assertEqual(self.client.containers.call_count, 1)
+        self.assertEqual(statuses[self.running.pk], Server.RUNNING)
+        self.assertEqual(statuses[self.stopped.pk], Server.STOPPED)
+        self.assertEqual(statuses[self.missing.pk], Server.STOPPED)
+        self.assertEqual(self.cache.hget(self.running.state_cache_key, 'status').decode(), Server.RUNNING)
+
+    def test_get_statuses_uses_cache(self):
+        cache_statuses({self.running: Server.RUNNING, self.stopped: Server.STOPPED, self.missing: Server.STOPPED})
+        statuses = get_statuses([self.running, self.stopped, self.missing])
+        self.client.containers.assert_not_called()
+        self.assertEqual(statuses[self.running.pk], Server.RUNNING)
+
+    def test_cache_does_not_drop_update_message(self):
+        self.running.update_message = 'test'
+        cache_statuses({self.running: Server.RUNNING})
+        self.assertEqual(self.running.update_message, 'test')
+
+    @patch('servers.status.time.time')
+    def test_stale_cache_is_ignored(self, time_mock):
+        time_mock.return_value = 0
+        cache_statuses({self.running: Server.RUNNING})
+        time_mock.return_value = 3600
+        self.assertDictEqual(get_cached_statuses([self.running]), {})
+
+    def test_server_status_reads_cache(self):
+        cache_statuses({self.running: Server.LAUNCHING})
+        self.assertEqual(self.running.status, Server.LAUNCHING)
@@ -6,6 +6,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from actions.middleware import record_action_synchronously
 from base.views import ProjectMixin, UUIDRegexMixin, ServerMixin
 from projects.models import Project
 from projects.permissions import ProjectChildPermission
@@ -15,7 +16,7 @@ from . import serializers, models
 
 
 class ServerViewSet(viewsets.ModelViewSet):
-    queryset = models.Server.objects.all()
+    queryset = models.Server.objects.select_related('host', 'project__owner')
     serializer_class = serializers.ServerSerializer
     permission_classes = (IsAuthenticated, ProjectChildPermission)
     filter_fields = ("name",)
@@ -24,6 +25,7 @@ class ServerViewSet(viewsets.ModelViewSet):
         return super().get_queryset().filter(project_id=self.kwargs.get('project_pk'))
 
 
+@record_action_synchronously
 @api_view(['post'])
 @permission_classes([IsAuthenticated, ServerActionPermission])
 def start(request, project_pk, pk):
@@ -34,6 +36,7 @@ def start(request, project_pk, pk):
     return Response(status=status.HTTP_201_CREATED)
 
 
+@record_action_synchronously
 @api_view(['post'])
 @permission_classes([IsAuthenticated, ServerActionPermission])
 def stop(request, *args, **kwargs):
@@ -44,6 +47,7 @@ def stop(request, *args, **kwargs):
     return Response(status=status.HTTP_201_CREATED)
 
 
+@record_action_synchronously
 @api_view(['post'])
 @permission_classes([IsAuthenticated, ServerActionPermission])
 def terminate(request, *args, **kwargs):
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TriggersConfig(AppConfig):
     name = 'triggers'
+
+    def ready(self):
+        import triggers.signals
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .models import Trigger
+
+
+class CauseIndex(object):
+    """
+    Ids of actions which are causes of triggers, so that saving an action
+    doesn't need a query to find out it triggers nothing.
+    Ids are kept in a redis set and a process copy is refreshed when the set version changes.
+    """
+    KEY = 'trigger_causes'
+    VERSION_KEY = 'trigger_causes:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self._version = None
+        self._checked_at = 0
+
+    def __contains__(self, action_id) -> bool:
+        return str(action_id) in self._get_ids()
+
+    def add(self, *action_ids) -> None:
+        if not action_ids:
+            return
+        # makes sure the set exists, otherwise a partial set would look complete
+        self._get_ids()
+        self._update('sadd', {str(action_id) for action_id in action_ids})
+
+    def discard(self, *action_ids) -> None:
+        # without the set there's nothing to discard, it will be built from the database
+        if action_ids and get_redis_connection("default").exists(self.VERSION_KEY):
+            self._update('srem', {str(action_id) for action_id in action_ids})
+
+    def discard_unreferenced(self, action_ids) -> None:
+        # the same action may be a cause of other triggers
+        action_ids = {str(action_id) for action_id in action_ids if action_id is not None}
+        if action_ids:
+            referenced = Trigger.objects.filter(cause_id__in=action_ids).values_list('cause_id', flat=True)
+            self.discard(*(action_ids - {str(action_id) for action_id in referenced}))
+
+    def rebuild(self) -> tuple:
+        ids = {str(pk) for pk in Trigger.objects.exclude(cause=None).values_list('cause_id', flat=True)}
+        pipe = get_redis_connection("default").pipeline()
+        pipe.delete(self.KEY)
+        if ids:
+            pipe.sadd(self.KEY, *ids)
+        pipe.incr(self.VERSION_KEY)
+        version = pipe.execute()[-1]
+        return frozenset(ids), version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids = self._version = None
+            self._checked_at = 0
+
+    def _get_ids(self) -> frozenset:
+        with self._lock:
+            if self._ids is not None and time.time() - self._checked_at < settings.TRIGGER_CAUSE_INDEX_LOCAL_TTL:
+                return self._ids
+        cache = get_redis_connection("default")
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            ids, version = self.rebuild()
+        elif int(version) != self._version:
+            ids = frozenset(action_id.decode() for action_id in cache.smembers(self.KEY))
+        else:
+            ids = self._ids
+        with self._lock:
+            self._ids, self._version, self._checked_at = ids, int(version), time.time()
+        return ids
+
+    def _update(self, command, action_ids) -> None:
+        pipe = get_redis_connection("default").pipeline()
+        getattr(pipe, command)(self.KEY, *action_ids)
+        pipe.incr(self.VERSION_KEY)
+        pipe.execute()
+        with self._lock:
+            if self._ids is not None:
+                ids = self._ids | action_ids if command == 'sadd' else self._ids - action_ids
+                # version is left alone, the next check reloads the set
+                self._ids = frozenset(ids)
+
+
+cause_index = CauseIndex()
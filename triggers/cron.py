@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = {name: i for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+DAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# (min, max, names) for minute, hour, day of month, month, day of week
+FIELDS = [
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, MONTH_NAMES),
+    (0, 7, DAY_NAMES),
+]
+
+# schedules which never match, e.g. "0 0 30 2 *", give up after this many years
+MAX_YEARS = 5
+
+
+class InvalidSchedule(ValueError):
+    pass
+
+
+def _parse_value(value, names):
+    value = value.lower()
+    if value in names:
+        return names[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidSchedule("Invalid value '{}'".format(value))
+
+
+def _parse_field(field, low, high, names) -> frozenset:
+    values = set()
+    for part in field.split(','):
+        rng, slash, step = part.partition('/')
+        if slash and not (step.isdigit() and int(step) > 0):
+            raise InvalidSchedule("Invalid step in '{}'".format(part))
+        step = int(step) if slash else 1
+        if rng == '*':
+            start, end = low, high
+        elif '-' in rng:
+            start, end = (_parse_value(value, names) for value in rng.split('-', 1))
+        else:
+            start = _parse_value(rng, names)
+            # "5/15" means every 15 starting at 5
+            end = high if slash else start
+        if not low <= start <= end <= high:
+            raise InvalidSchedule("Value out of range in '{}'".format(part))
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule(object):
+    """
+    Standard five field cron expression, evaluated in UTC
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise InvalidSchedule("Cron schedule must have five fields")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *spec) for field, spec in zip(fields, FIELDS)
+        )
+        # both 0 and 7 are sunday
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        # like in cron, restricted day of month and day of week match either of them
+        self._any_day = fields[2] == '*' or fields[4] == '*'
+
+    def _day_matches(self, dt) -> bool:
+        in_days = dt.day in self.days
+        in_weekdays = (dt.isoweekday() % 7) in self.weekdays
+        if self._any_day:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, dt: datetime):
+        """
+        First time after dt which matches the schedule or None if there isn't one.
+        Skips whole months, days and hours that don't match, so this is cheap for sparse schedules.
+        """
+        tzinfo = dt.tzinfo
+        dt = dt.replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt.year + MAX_YEARS
+        while dt.year <= limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            minute = min((m for m in self.minutes if m >= dt.minute), default=None)
+            if minute is None:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            return dt.replace(minute=minute, tzinfo=tzinfo)
+        return None
@@ -0,0 +1,147 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, When, Value
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from rest_framework.authtoken.models import Token
+
+from actions.models import Action
+from utils import copy_model
+from .causes import cause_index
+from .models import Trigger
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchError(Exception):
+    pass
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Session of the current thread, keeps connections to api and webhook hosts open
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        # responses aren't read on retries, so requests are retried only if they didn't get through
+        retry = Retry(total=settings.TRIGGER_DISPATCH_RETRIES, read=False, backoff_factor=0.5,
+                      status_forcelist=(502, 503, 504), method_whitelist=False)
+        adapter = HTTPAdapter(max_retries=retry)
+        session = _local.session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+
+class TriggerDispatcher(object):
+    """
+    Dispatches triggers with a fixed number of threads.
+    Replacement actions of a batch are created with one query before its effects and
+    webhooks run concurrently, so requests made by effects are recorded on the replacements.
+    """
+
+    def __init__(self, url='http://localhost', workers=None, batch_size=None):
+        self.url = url
+        self.workers = workers or settings.TRIGGER_DISPATCH_WORKERS
+        self.batch_size = batch_size or settings.TRIGGER_DISPATCH_BATCH_SIZE
+
+    def dispatch(self, triggers) -> list:
+        """
+        Returns triggers which were dispatched successfully
+        """
+        triggers = list(triggers)
+        dispatched = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(triggers), self.batch_size):
+                batch = triggers[start:start + self.batch_size]
+                tokens = self._get_tokens(batch)
+                replacements = self._create_replacements(batch)
+                results = executor.map(lambda trigger: self._call(trigger, tokens), batch)
+                replaced, failed = [], []
+                for trigger, (effect_ran, ok) in zip(batch, results):
+                    # the effect's request may have finished its replacement already, so a trigger
+                    # whose webhook failed after the effect ran is replaced too, it isn't run again
+                    (replaced if effect_ran or ok else failed).append(trigger)
+                    if ok:
+                        dispatched.append(trigger)
+                self._replace_actions(replaced, replacements)
+                self._discard_replacements(failed, replacements)
+        return dispatched
+
+    @staticmethod
+    def _get_tokens(triggers) -> dict:
+        user_ids = {trigger.effect.user_id for trigger in triggers
+                    if trigger.effect is not None and trigger.effect.user_id is not None}
+        tokens = dict(Token.objects.filter(user_id__in=user_ids).values_list('user_id', 'key'))
+        for user_id in user_ids - set(tokens):
+            tokens[user_id] = Token.objects.create(user_id=user_id).key
+        return tokens
+
+    @staticmethod
+    def _create_replacements(triggers) -> dict:
+        """
+        Creates CREATED copies of causes and effects, returns them by trigger pk
+        """
+        replacements = {}
+        for trigger in triggers:
+            replacements[trigger.pk] = (copy_model(trigger.cause, state=Action.CREATED),
+                                        copy_model(trigger.effect, state=Action.CREATED))
+        Action.objects.bulk_create([action for pair in replacements.values() for action in pair if action is not None])
+        return replacements
+
+    def _call(self, trigger, tokens) -> tuple:
+        """
+        Returns whether the effect ran and whether the whole trigger succeeded
+        """
+        # runs in worker threads, tokens are fetched beforehand so it doesn't touch the database
+        session = get_session()
+        effect_ran = False
+        try:
+            if trigger.effect is not None:
+                trigger.effect.dispatch(self.url, session=session, token=tokens.get(trigger.effect.user_id))
+                effect_ran = True
+            if trigger.webhook and trigger.webhook.get('url'):
+                resp = session.post(trigger.webhook['url'], json=trigger.webhook.get('config', {}),
+                                    timeout=settings.TRIGGER_DISPATCH_TIMEOUT)
+                resp.raise_for_status()
+        except requests.RequestException:
+            logger.exception("Failed to dispatch trigger %s", trigger.pk)
+            return effect_ran, False
+        return effect_ran, True
+
+    @staticmethod
+    def _replace_actions(triggers, replacements) -> None:
+        if not triggers:
+            return
+        previous_causes = [trigger.cause_id for trigger in triggers]
+        for trigger in triggers:
+            trigger.cause, trigger.effect = replacements[trigger.pk]
+        with transaction.atomic():
+            Trigger.objects.filter(pk__in=[trigger.pk for trigger in triggers]).update(
+                cause=_case(triggers, 'cause_id'),
+                effect=_case(triggers, 'effect_id'),
+            )
+        # trigger signals aren't sent for bulk updates
+        cause_index.add(*[trigger.cause_id for trigger in triggers if trigger.cause_id is not None])
+        transaction.on_commit(lambda: cause_index.discard_unreferenced(previous_causes))
+
+    @staticmethod
+    def _discard_replacements(triggers, replacements) -> None:
+        # failed triggers keep their actions and are retried with them
+        pks = [action.pk for trigger in triggers for action in replacements[trigger.pk] if action is not None]
+        if pks:
+            Action.objects.filter(pk__in=pks, state=Action.CREATED).delete()
+
+
+def _case(triggers, attname):
+    return Case(
+        *[When(pk=trigger.pk, then=Value(getattr(trigger, attname))) for trigger in triggers],
+        output_field=models.UUIDField()
+    )
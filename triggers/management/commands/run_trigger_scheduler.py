@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from triggers.scheduler import TriggerScheduler
+
+
+class Command(BaseCommand):
+    help = "Dispatch triggers on their cron schedules, only one running instance fires at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=int, default=None, help='How often to look for changed triggers (seconds)')
+
+    def handle(self, *args, **options):
+        scheduler = TriggerScheduler(poll_interval=options['poll'])
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
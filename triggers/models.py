@@ -1,16 +1,12 @@
-import requests
 from collections import defaultdict
 from django.db import models
 from django.conf import settings
 from django.contrib.postgres.fields import JSONField
 
-from actions.models import Action
-from utils import copy_model
-
 
 class TriggerQuerySet(models.QuerySet):
     def namespace(self, namespace):
-        return self.filter(user=namespace.object)
+        return self.filter(user_id=namespace.id)
 
 
 class Trigger(models.Model):
@@ -30,19 +26,10 @@ class Trigger(models.Model):
             return '{} -> {}'.format(self.cause, self.effect)
         return '{}: {}'.format(self.effect, self.schedule)
 
-    def dispatch(self, url='http://localhost'):
-        new_effect = copy_model(self.effect)
-        self._set_action_state(new_effect, Action.CREATED)
-        new_cause = copy_model(self.cause)
-        self._set_action_state(new_cause, Action.CREATED)
-        if self.effect:
-            self.effect.dispatch(url)
-        if self.webhook and self.webhook.get('url'):
-            resp = requests.post(self.webhook['url'], json=self.webhook.get('config', {}))
-            resp.raise_for_status()
-        self.effect = new_effect
-        self.cause = new_cause
-        self.save()
+    def dispatch(self, url='http://localhost') -> None:
+        from .dispatch import DispatchError, TriggerDispatcher
+        if not TriggerDispatcher(url, workers=1).dispatch([self]):
+            raise DispatchError("Trigger {} was not dispatched".format(self.pk))
 
     @staticmethod
     def _set_action_state(action, state):
@@ -0,0 +1,162 @@
+import heapq
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+from .cron import CronSchedule, InvalidSchedule
+from .models import Trigger
+from .tasks import dispatch_triggers
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = 'trigger_scheduler:leader'
+# ids of triggers changed since the scheduler last looked, filled by signals
+CHANGES_KEY = 'trigger_scheduler:changes'
+
+
+def mark_trigger_changed(trigger_id) -> None:
+    get_redis_connection("default").sadd(CHANGES_KEY, str(trigger_id))
+
+
+class TriggerScheduler(object):
+    """
+    Fires scheduled triggers. Next fire times of all triggers are kept in a min-heap,
+    changed triggers are reloaded one by one and only the leader instance enqueues dispatches.
+    """
+
+    def __init__(self, poll_interval=None, batch_size=None, leader_ttl=None):
+        self.poll_interval = poll_interval or settings.TRIGGER_SCHEDULER_POLL_INTERVAL
+        self.batch_size = batch_size or settings.TRIGGER_SCHEDULER_BATCH_SIZE
+        self.leader_ttl = leader_ttl or settings.TRIGGER_SCHEDULER_LEADER_TTL
+        self.instance_id = uuid.uuid4().hex
+        self.is_leader = False
+        self._heap = []
+        # trigger id -> (schedule, next fire time), heap entries which don't match are stale
+        self._entries = {}
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._stopped.wait(self.tick())
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_leader:
+            self.release_leadership()
+
+    def tick(self) -> float:
+        """
+        Single iteration of the scheduler loop. Returns seconds to sleep before the next one.
+        """
+        close_old_connections()
+        if not self.is_leader:
+            if not self.acquire_leadership():
+                return self.leader_ttl / 3
+            # whatever changed while somebody else was leading is picked up by a full load
+            get_redis_connection("default").delete(CHANGES_KEY)
+            self.load()
+        elif not self.renew_leadership():
+            logger.warning("Lost trigger scheduler leadership")
+            self.is_leader = False
+            self._heap, self._entries = [], {}
+            return 0
+        self.apply_changes()
+        self.fire_due(time.time())
+        wait = self.poll_interval
+        if self._heap:
+            wait = min(wait, self._heap[0][0] - time.time())
+        return max(wait, 0)
+
+    def acquire_leadership(self) -> bool:
+        cache = get_redis_connection("default")
+        self.is_leader = bool(cache.set(LEADER_KEY, self.instance_id, nx=True, px=int(self.leader_ttl * 1000)))
+        if self.is_leader:
+            logger.info("Trigger scheduler %s is the leader", self.instance_id)
+        return self.is_leader
+
+    def renew_leadership(self) -> bool:
+        cache = get_redis_connection("default")
+        with cache.pipeline() as pipe:
+            try:
+                pipe.watch(LEADER_KEY)
+                leader = pipe.get(LEADER_KEY)
+                if leader is None or leader.decode() != self.instance_id:
+                    return False
+                pipe.multi()
+                pipe.pexpire(LEADER_KEY, int(self.leader_ttl * 1000))
+                pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    def release_leadership(self) -> None:
+        if self.renew_leadership():
+            get_redis_connection("default").delete(LEADER_KEY)
+        self.is_leader = False
+
+    def load(self) -> None:
+        self._heap, self._entries = [], {}
+        triggers = Trigger.objects.exclude(schedule='').values_list('pk', 'schedule').iterator()
+        now = datetime.utcnow()
+        for pk, schedule in triggers:
+            self._schedule(str(pk), schedule, now, heapify=False)
+        heapq.heapify(self._heap)
+        logger.info("Loaded %d scheduled triggers", len(self._entries))
+
+    def apply_changes(self) -> None:
+        cache = get_redis_connection("default")
+        pipe = cache.pipeline()
+        pipe.smembers(CHANGES_KEY)
+        pipe.delete(CHANGES_KEY)
+        changed = {pk.decode() for pk in pipe.execute()[0]}
+        if not changed:
+            return
+        schedules = dict(Trigger.objects.filter(pk__in=changed).exclude(schedule='').values_list('pk', 'schedule'))
+        schedules = {str(pk): schedule for pk, schedule in schedules.items()}
+        now = datetime.utcnow()
+        for pk in changed:
+            schedule = schedules.get(pk)
+            current = self._entries.get(pk)
+            if current is not None and current[0] == schedule:
+                continue
+            self._entries.pop(pk, None)
+            if schedule:
+                self._schedule(pk, schedule, now)
+
+    def fire_due(self, now: float) -> int:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, pk = heapq.heappop(self._heap)
+            entry = self._entries.get(pk)
+            if entry is None or entry[1] != fire_at:
+                continue
+            due.append(pk)
+            # runs missed while the scheduler was down or late are coalesced into this one
+            self._schedule(pk, entry[0], datetime.utcfromtimestamp(max(fire_at, now)))
+        for start in range(0, len(due), self.batch_size):
+            dispatch_triggers.delay(due[start:start + self.batch_size])
+        if due:
+            logger.info("Enqueued %d scheduled triggers", len(due))
+        return len(due)
+
+    def _schedule(self, pk, schedule, after, heapify=True) -> None:
+        try:
+            next_time = CronSchedule(schedule).next_after(after)
+        except InvalidSchedule as e:
+            logger.warning("Invalid schedule of trigger %s: %s", pk, e)
+            return
+        if next_time is None:
+            return
+        fire_at = (next_time - datetime(1970, 1, 1)).total_seconds()
+        self._entries[pk] = (schedule, fire_at)
+        if heapify:
+            heapq.heappush(self._heap, (fire_at, pk))
+        else:
+            self._heap.append((fire_at, pk))
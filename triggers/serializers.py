@@ -5,8 +5,9 @@ from social_django.models import UserSocialAuth
 
 from actions.models import Action
 from servers.models import Server
+from .cron import CronSchedule, InvalidSchedule
 from .models import Trigger
-from .slack import send_message
+from .slack import enqueue_message, QUEUED
 
 
 class TriggerActionSerializer(serializers.ModelSerializer):
@@ -47,6 +48,14 @@ class TriggerSerializer(serializers.ModelSerializer):
         model = Trigger
         fields = ('id', 'cause', 'effect', 'schedule', 'webhook')
 
+    def validate_schedule(self, value):
+        if value:
+            try:
+                CronSchedule(value)
+            except InvalidSchedule as e:
+                raise serializers.ValidationError(str(e))
+        return value
+
     def create(self, validated_data):
         cause = self.create_action(validated_data.pop('cause', None))
         effect = self.create_action(validated_data.pop('effect', None))
@@ -87,6 +96,8 @@ class TriggerSerializer(serializers.ModelSerializer):
 
 
 class SlackMessageSerializer(serializers.Serializer):
+    id = serializers.CharField(read_only=True)
+    status = serializers.CharField(read_only=True)
     channel = serializers.CharField(allow_blank=True)
     text = serializers.CharField()
 
@@ -95,15 +106,17 @@ class SlackMessageSerializer(serializers.Serializer):
         social_auth = UserSocialAuth.objects.filter(user=user, provider='slack').first()
         if not social_auth:
             raise serializers.ValidationError("You need to connect your account with slack.")
-        self._access_token = social_auth.access_token
+        self._social_auth_id = social_auth.pk
         return data
 
     def send(self):
-        send_message(
-            self._access_token,
+        self.validated_data['id'] = enqueue_message(
+            self._social_auth_id,
+            self.context['request'].user.pk,
             text=self.validated_data['text'],
             channel=self.validated_data['channel'] or '#general'
         )
+        self.validated_data['status'] = QUEUED
 
 
 class ServerActionSerializer(serializers.ModelSerializer):
@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .causes import cause_index
+from .models import Trigger
+from .scheduler import mark_trigger_changed
+
+
+@receiver(pre_save, sender=Trigger)
+def remember_cause(sender, instance, **kwargs):
+    instance._previous_cause_id = Trigger.objects.filter(pk=instance.pk).values_list('cause_id', flat=True).first()
+
+
+@receiver(post_save, sender=Trigger)
+def index_cause(sender, instance, **kwargs):
+    previous_cause_id = getattr(instance, '_previous_cause_id', None)
+    if instance.cause_id is not None:
+        cause_index.add(instance.cause_id)
+    if previous_cause_id is not None and previous_cause_id != instance.cause_id:
+        transaction.on_commit(lambda: cause_index.discard_unreferenced([previous_cause_id]))
+
+
+@receiver(post_delete, sender=Trigger)
+def unindex_cause(sender, instance, **kwargs):
+    cause_id = instance.cause_id
+    if cause_id is not None:
+        transaction.on_commit(lambda: cause_index.discard_unreferenced([cause_id]))
+
+
+@receiver(post_save, sender=Trigger)
+def schedule_changed(sender, instance, created, **kwargs):
+    if instance.schedule or not created:
+        pk = instance.pk
+        transaction.on_commit(lambda: mark_trigger_changed(pk))
+
+
+@receiver(post_delete, sender=Trigger)
+def schedule_deleted(sender, instance, **kwargs):
+    if instance.schedule:
+        pk = instance.pk
+        transaction.on_commit(lambda: mark_trigger_changed(pk))
@@ -1,10 +1,170 @@
-from slackclient import SlackClient
+import logging
+import threading
+import uuid
+from collections import OrderedDict
 
+import requests
+import ujson
+from django.conf import settings
+from django_redis import get_redis_connection
 
-def send_message(token, text='', channel='#general'):
-    sc = SlackClient(token)
-    sc.api_call(
-        'chat.postMessage',
-        channel=channel,
-        text=text,
-    )
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'slack:queue:{}:{}'
+# set while a delivery of the queue is scheduled, so that bursts are delivered together
+SCHEDULED_KEY = 'slack:scheduled:{}:{}'
+STATUS_KEY = 'slack:message:{}'
+
+QUEUED = 'queued'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class SlackError(Exception):
+    pass
+
+
+class RateLimited(SlackError):
+    def __init__(self, retry_after):
+        super().__init__("Rate limited for {} seconds".format(retry_after))
+        self.retry_after = retry_after
+
+
+class SlackAPI(object):
+    """
+    Slack Web API client keeping its connection open.
+    Unlike slackclient it tells how long to wait when rate limited.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.session = requests.Session()
+
+    def call(self, method, **params) -> dict:
+        params['token'] = self.token
+        resp = self.session.post(settings.SLACK_API_URL + method, data=params, timeout=settings.SLACK_TIMEOUT)
+        if resp.status_code == 429:
+            raise RateLimited(int(resp.headers.get('Retry-After', 1)))
+        resp.raise_for_status()
+        try:
+            data = resp.json()
+        except ValueError:
+            raise SlackError('invalid_response')
+        if not data.get('ok'):
+            raise SlackError(data.get('error', 'unknown_error'))
+        return data
+
+    def post_message(self, channel, text) -> dict:
+        return self.call('chat.postMessage', channel=channel, text=text)
+
+
+class SlackClients(object):
+    """
+    Clients of recently used tokens
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    def get(self, token) -> SlackAPI:
+        with self._lock:
+            client = self._clients.pop(token, None) or SlackAPI(token)
+            self._clients[token] = client
+            while len(self._clients) > self.size:
+                self._clients.popitem(last=False)
+        return client
+
+
+slack_clients = SlackClients()
+
+
+def enqueue_message(auth_id, user_id, channel, text) -> str:
+    """
+    Queues message for delivery with slack account auth_id. Returns message id.
+    """
+    from .tasks import deliver_slack_messages
+    message_id = uuid.uuid4().hex
+    cache = get_redis_connection("default")
+    pipe = cache.pipeline()
+    pipe.rpush(QUEUE_KEY.format(auth_id, channel), ujson.dumps({'id': message_id, 'text': text}))
+    _set_statuses(pipe, [message_id], QUEUED, user_id=str(user_id))
+    pipe.set(SCHEDULED_KEY.format(auth_id, channel), 1, nx=True, ex=settings.SLACK_SCHEDULED_TTL)
+    scheduled = pipe.execute()[-1]
+    if scheduled:
+        deliver_slack_messages.apply_async((auth_id, channel), countdown=settings.SLACK_COALESCE_DELAY)
+    return message_id
+
+
+def get_message_status(message_id) -> dict:
+    status = get_redis_connection("default").hgetall(STATUS_KEY.format(message_id))
+    return {key.decode(): value.decode() for key, value in status.items()}
+
+
+def deliver_messages(auth_id, token, channel) -> int:
+    """
+    Sends all queued messages of the account to the channel, joining them into as few messages as possible.
+    Returns number of delivered messages. Messages which weren't sent because of rate limits are queued again.
+    """
+    cache = get_redis_connection("default")
+    queue_key = QUEUE_KEY.format(auth_id, channel)
+    # messages queued from now on schedule a new delivery
+    cache.delete(SCHEDULED_KEY.format(auth_id, channel))
+    pipe = cache.pipeline()
+    pipe.lrange(queue_key, 0, -1)
+    pipe.delete(queue_key)
+    messages = [ujson.loads(message) for message in pipe.execute()[0]]
+    client = slack_clients.get(token)
+    delivered = 0
+    chunks = _coalesce(messages)
+    for i, chunk in enumerate(chunks):
+        ids = [message['id'] for message in chunk]
+        try:
+            client.post_message(channel, '\n'.join(message['text'] for message in chunk))
+        except RateLimited:
+            pipe = cache.pipeline()
+            _requeue(pipe, queue_key, chunks[i:])
+            # the task is retried
+            pipe.set(SCHEDULED_KEY.format(auth_id, channel), 1, ex=settings.SLACK_SCHEDULED_TTL)
+            pipe.execute()
+            raise
+        except (SlackError, requests.RequestException) as e:
+            logger.warning("Failed to deliver slack messages to %s: %s", channel, e)
+            status, fields = FAILED, {'error': str(e)}
+        except Exception:
+            # remaining messages are delivered with the next queued message
+            pipe = cache.pipeline()
+            _requeue(pipe, queue_key, chunks[i:])
+            pipe.execute()
+            raise
+        else:
+            status, fields = SENT, {}
+            delivered += len(ids)
+        pipe = cache.pipeline()
+        _set_statuses(pipe, ids, status, **fields)
+        pipe.execute()
+    return delivered
+
+
+def _requeue(pipe, queue_key, chunks) -> None:
+    messages = [message for chunk in chunks for message in chunk]
+    pipe.lpush(queue_key, *[ujson.dumps(message) for message in reversed(messages)])
+
+
+def _coalesce(messages) -> list:
+    chunks, length = [], 0
+    for message in messages:
+        if not chunks or length + len(message['text']) + 1 > settings.SLACK_MAX_MESSAGE_LENGTH:
+            chunks.append([])
+            length = 0
+        chunks[-1].append(message)
+        length += len(message['text']) + 1
+    return chunks
+
+
+def _set_statuses(pipe, message_ids, status, **fields) -> None:
+    for message_id in message_ids:
+        key = STATUS_KEY.format(message_id)
+        pipe.hmset(key, dict(fields, status=status))
+        pipe.expire(key, settings.SLACK_MESSAGE_STATUS_TTL)
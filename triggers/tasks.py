@@ -1,9 +1,46 @@
+import logging
+
 from celery import shared_task
+from social_django.models import UserSocialAuth
 
+from .dispatch import TriggerDispatcher
 from .models import Trigger
+from .slack import RateLimited, deliver_messages
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task()
 def dispatch_trigger(trigger_id, url='http://localhost'):
     trigger = Trigger.objects.get(pk=trigger_id)
     trigger.dispatch(url=url)
+
+
+@shared_task()
+def dispatch_triggers(trigger_ids, url='http://localhost'):
+    """
+    Dispatches a batch of scheduled triggers
+    """
+    _dispatch_all(Trigger.objects.filter(pk__in=trigger_ids), url)
+
+
+@shared_task()
+def dispatch_caused_triggers(action_id, url='http://localhost'):
+    """
+    Dispatches triggers caused by the action
+    """
+    _dispatch_all(Trigger.objects.filter(cause_id=action_id), url)
+
+
+def _dispatch_all(triggers, url):
+    dispatched = TriggerDispatcher(url).dispatch(triggers.select_related('cause', 'effect'))
+    logger.info("Dispatched %d triggers", len(dispatched))
+
+
+@shared_task(bind=True, max_retries=None)
+def deliver_slack_messages(self, auth_id, channel):
+    auth = UserSocialAuth.objects.get(pk=auth_id)
+    try:
+        return deliver_messages(auth_id, auth.access_token, channel)
+    except RateLimited as e:
+        raise self.retry(countdown=e.retry_after)
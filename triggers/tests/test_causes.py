@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from actions.models import Action
+from actions.tests.factories import ActionFactory
+from triggers.causes import CauseIndex, cause_index
+from triggers.tests.factories import TriggerFactory
+
+
+class CauseIndexTest(TestCase):
+    def setUp(self):
+        cause_index.clear()
+        self.trigger = TriggerFactory()
+
+    def tearDown(self):
+        cause_index.clear()
+        get_redis_connection("default").flushall()
+
+    def test_cause_is_indexed(self):
+        self.assertIn(self.trigger.cause_id, cause_index)
+        self.assertNotIn(self.trigger.effect_id, cause_index)
+        with self.assertNumQueries(0):
+            self.assertIn(self.trigger.cause_id, CauseIndex())
+
+    def test_rebuild(self):
+        get_redis_connection("default").flushall()
+        index = CauseIndex()
+        self.assertIn(self.trigger.cause_id, index)
+        with self.assertNumQueries(0):
+            self.assertNotIn(self.trigger.effect_id, index)
+
+    def test_discard(self):
+        cause_index.discard(self.trigger.cause_id)
+        self.assertNotIn(self.trigger.cause_id, cause_index)
+        self.assertNotIn(self.trigger.cause_id, CauseIndex())
+
+    @patch('actions.signals.transaction.on_commit', lambda func: func())
+    @patch('actions.signals.dispatch_caused_triggers')
+    def test_action_save(self, dispatch):
+        action = ActionFactory(state=Action.CREATED)
+        action.state = Action.SUCCESS
+        with self.assertNumQueries(1):
+            action.save()
+        dispatch.delay.assert_not_called()
+        self.trigger.cause.state = Action.SUCCESS
+        self.trigger.cause.save()
+        dispatch.delay.assert_called_once_with(str(self.trigger.cause_id))
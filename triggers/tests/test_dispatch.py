@@ -0,0 +1,117 @@
+from unittest.mock import patch, MagicMock
+
+import requests
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from actions.models import Action
+from triggers.causes import cause_index
+from triggers.dispatch import DispatchError, TriggerDispatcher
+from triggers.models import Trigger
+from triggers.tests.factories import TriggerFactory
+from users.tests.factories import UserFactory
+
+
+class InlineExecutor(object):
+    """
+    Runs calls in the test thread, so they see objects created in the test transaction
+    """
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, iterable):
+        return [fn(item) for item in iterable]
+
+
+class TriggerDispatcherTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.triggers = TriggerFactory.create_batch(20, webhook={'url': 'http://example.com/hook'},
+                                                    effect__user=self.user)
+        self.session = MagicMock()
+        patcher = patch('triggers.dispatch.get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cause_index.clear()
+        get_redis_connection("default").flushall()
+
+    def test_dispatch(self):
+        actions_count = Action.objects.count()
+        dispatched = TriggerDispatcher(workers=4, batch_size=8).dispatch(self.triggers)
+        self.assertEqual(len(dispatched), 20)
+        self.assertEqual(self.session.send.call_count, 20)
+        self.assertEqual(self.session.post.call_count, 20)
+        self.assertEqual(Action.objects.count(), actions_count + 40)
+        for trigger in Trigger.objects.filter(pk__in=[trigger.pk for trigger in self.triggers]).select_related(
+                'cause', 'effect'):
+            self.assertEqual(trigger.cause.state, Action.CREATED)
+            self.assertEqual(trigger.effect.state, Action.CREATED)
+            self.assertIn(trigger.cause_id, cause_index)
+
+    def test_failed_trigger_is_not_replaced(self):
+        failed = self.triggers[0]
+        failed.effect.path = '/failing/'
+
+        def send(request, **kwargs):
+            if request.url.endswith('/failing/'):
+                raise requests.ConnectionError()
+            return MagicMock()
+
+        self.session.send.side_effect = send
+        causes = {trigger.pk: trigger.cause_id for trigger in self.triggers}
+        dispatched = TriggerDispatcher(workers=4).dispatch(self.triggers)
+        self.assertEqual(len(dispatched), 19)
+        self.assertEqual(Trigger.objects.get(pk=failed.pk).cause_id, causes[failed.pk])
+        other = self.triggers[1]
+        self.assertNotEqual(Trigger.objects.get(pk=other.pk).cause_id, causes[other.pk])
+
+    def test_failed_trigger_replacements_are_discarded(self):
+        self.session.send.side_effect = requests.ConnectionError()
+        actions_count = Action.objects.count()
+        dispatched = TriggerDispatcher(workers=4).dispatch(self.triggers)
+        self.assertEqual(dispatched, [])
+        self.assertEqual(Action.objects.count(), actions_count)
+
+    def test_trigger_is_replaced_when_webhook_fails_after_effect(self):
+        self.session.post.side_effect = requests.ConnectionError()
+        trigger = self.triggers[0]
+        effect_id = trigger.effect_id
+        dispatched = TriggerDispatcher(workers=1).dispatch([trigger])
+        self.assertEqual(dispatched, [])
+        # the effect isn't run again by the next dispatch
+        self.assertNotEqual(Trigger.objects.get(pk=trigger.pk).effect_id, effect_id)
+
+    def test_manual_dispatch_raises_when_not_dispatched(self):
+        self.session.post.side_effect = requests.ConnectionError()
+        with self.assertRaises(DispatchError):
+            self.triggers[0].dispatch()
+
+    @patch('triggers.dispatch.ThreadPoolExecutor', InlineExecutor)
+    def test_effect_request_is_recorded_on_replacement(self):
+        trigger = self.triggers[0]
+        recorded = []
+
+        def send(request, **kwargs):
+            # what ActionMiddleware does for the loopback request
+            recorded.append(Action.objects.get_or_create_action(
+                dict(path=trigger.effect.path, user=self.user, state=Action.CREATED),
+                dict(state=Action.PENDING),
+            ))
+            return MagicMock()
+
+        self.session.send.side_effect = send
+        TriggerDispatcher(workers=1).dispatch([trigger])
+        self.assertEqual(len(recorded), 1)
+        trigger.refresh_from_db()
+        self.assertEqual(recorded[0].pk, trigger.effect_id)
+        self.assertEqual(Action.objects.filter(path=trigger.effect.path, user=self.user,
+                                               state=Action.CREATED).count(), 1)
@@ -0,0 +1,86 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+from triggers.cron import CronSchedule, InvalidSchedule
+from triggers.scheduler import TriggerScheduler, mark_trigger_changed
+from triggers.tests.factories import TriggerFactory
+
+
+class CronScheduleTest(TestCase):
+    def test_next_after(self):
+        now = datetime(2017, 6, 30, 23, 59, 30)
+        self.assertEqual(CronSchedule('0 1 * * *').next_after(now), datetime(2017, 7, 1, 1, 0))
+        self.assertEqual(CronSchedule('*/15 * * * *').next_after(now), datetime(2017, 7, 1, 0, 0))
+        self.assertEqual(CronSchedule('0 9 * * mon-fri').next_after(now), datetime(2017, 7, 3, 9, 0))
+        self.assertEqual(CronSchedule('@yearly').next_after(now), datetime(2018, 1, 1))
+
+    def test_day_of_month_or_day_of_week(self):
+        self.assertEqual(CronSchedule('0 0 13 * 5').next_after(datetime(2017, 7, 1)), datetime(2017, 7, 7))
+
+    def test_never_matching(self):
+        self.assertIsNone(CronSchedule('0 0 30 2 *').next_after(datetime(2017, 1, 1)))
+
+    def test_invalid(self):
+        for expression in ['* * *', '61 * * * *', '*/0 * * * *', 'x * * * *']:
+            with self.assertRaises(InvalidSchedule):
+                CronSchedule(expression)
+
+
+@patch('triggers.scheduler.dispatch_triggers')
+class TriggerSchedulerTest(TestCase):
+    def setUp(self):
+        self.triggers = TriggerFactory.create_batch(3, schedule='*/5 * * * *')
+        TriggerFactory(schedule='')
+        self.scheduler = TriggerScheduler(batch_size=2)
+
+    def tearDown(self):
+        get_redis_connection("default").flushall()
+
+    def test_fire_due(self, dispatch):
+        self.scheduler.tick()
+        fire_at = self.scheduler._heap[0][0]
+        self.assertEqual(self.scheduler.fire_due(fire_at), 3)
+        self.assertEqual(dispatch.delay.call_count, 2)
+        fired = sum((call[0][0] for call in dispatch.delay.call_args_list), [])
+        self.assertEqual(set(fired), {str(trigger.pk) for trigger in self.triggers})
+        # rescheduled five minutes later
+        self.assertEqual(self.scheduler._heap[0][0], fire_at + 300)
+        self.assertEqual(self.scheduler.fire_due(fire_at), 0)
+
+    def test_missed_runs_fire_once(self, dispatch):
+        self.scheduler.tick()
+        fire_at = self.scheduler._heap[0][0]
+        late = fire_at + 3600 + 60
+        self.assertEqual(self.scheduler.fire_due(late), 3)
+        self.assertEqual(self.scheduler._heap[0][0], fire_at + 3600 + 300)
+        self.assertEqual(self.scheduler.fire_due(late), 0)
+
+    def test_apply_changes(self, dispatch):
+        self.scheduler.tick()
+        changed, deleted = self.triggers[0], self.triggers[1]
+        changed.schedule = '0 0 1 1 *'
+        changed.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+        new = TriggerFactory(schedule='*/5 * * * *')
+        for trigger_id in [changed.pk, deleted_id, new.pk]:
+            mark_trigger_changed(trigger_id)
+        with self.assertNumQueries(1):
+            self.scheduler.apply_changes()
+        self.assertEqual(self.scheduler.fire_due(self.scheduler._heap[0][0]), 2)
+        fired = dispatch.delay.call_args[0][0]
+        self.assertEqual(set(fired), {str(self.triggers[2].pk), str(new.pk)})
+
+    def test_single_leader(self, dispatch):
+        self.scheduler.tick()
+        other = TriggerScheduler()
+        other.tick()
+        self.assertTrue(self.scheduler.is_leader)
+        self.assertFalse(other.is_leader)
+        self.scheduler.stop()
+        other.tick()
+        self.assertTrue(other.is_leader)
+        self.assertFalse(self.scheduler.renew_leadership())
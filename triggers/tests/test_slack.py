@@ -0,0 +1,147 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+import ujson
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+from social_django.models import UserSocialAuth
+
+from triggers.slack import enqueue_message, deliver_messages, get_message_status, RateLimited, QUEUED, SENT, FAILED
+from users.tests.factories import UserFactory
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        params = {key: value[0] for key, value in parse_qs(self.rfile.read(length).decode()).items()}
+        server = self.server
+        if server.rate_limited:
+            server.rate_limited -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '3')
+            self.end_headers()
+            return
+        if params.get('channel') == '#missing':
+            data = ujson.dumps({'ok': False, 'error': 'channel_not_found'}).encode()
+        elif params.get('channel') == '#broken':
+            data = b'<html>Bad gateway</html>'
+        else:
+            server.messages.append(params)
+            data = ujson.dumps({'ok': True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeSlackServer(HTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSlackHandler)
+        self.messages = []
+        self.rate_limited = 0
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/api/'.format(self.server_port)
+
+
+@patch('triggers.tasks.deliver_slack_messages.apply_async')
+class SlackDeliveryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeSlackServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(SLACK_API_URL=cls.server.url)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.messages = []
+        self.server.rate_limited = 0
+
+    def tearDown(self):
+        get_redis_connection("default").flushall()
+
+    def test_burst_is_coalesced(self, apply_async):
+        ids = [enqueue_message(1, 'user', '#general', 'message {}'.format(i)) for i in range(3)]
+        apply_async.assert_called_once_with((1, '#general'), countdown=1)
+        self.assertEqual(get_message_status(ids[0])['status'], QUEUED)
+        self.assertEqual(deliver_messages(1, 'token', '#general'), 3)
+        self.assertEqual(len(self.server.messages), 1)
+        self.assertEqual(self.server.messages[0]['text'], 'message 0\nmessage 1\nmessage 2')
+        self.assertEqual(self.server.messages[0]['token'], 'token')
+        self.assertEqual({get_message_status(message_id)['status'] for message_id in ids}, {SENT})
+
+    def test_rate_limited(self, apply_async):
+        message_id = enqueue_message(1, 'user', '#general', 'hello')
+        self.server.rate_limited = 1
+        with self.assertRaises(RateLimited) as cm:
+            deliver_messages(1, 'token', '#general')
+        self.assertEqual(cm.exception.retry_after, 3)
+        self.assertEqual(deliver_messages(1, 'token', '#general'), 1)
+        self.assertEqual(get_message_status(message_id)['status'], SENT)
+
+    def test_failed(self, apply_async):
+        message_id = enqueue_message(1, 'user', '#missing', 'hello')
+        self.assertEqual(deliver_messages(1, 'token', '#missing'), 0)
+        message_status = get_message_status(message_id)
+        self.assertEqual(message_status['status'], FAILED)
+        self.assertEqual(message_status['error'], 'channel_not_found')
+
+    def test_invalid_response(self, apply_async):
+        message_id = enqueue_message(1, 'user', '#broken', 'hello')
+        self.assertEqual(deliver_messages(1, 'token', '#broken'), 0)
+        message_status = get_message_status(message_id)
+        self.assertEqual(message_status['status'], FAILED)
+        self.assertEqual(message_status['error'], 'invalid_response')
+
+    def test_unexpected_error_requeues_messages(self, apply_async):
+        message_id = enqueue_message(1, 'user', '#general', 'hello')
+        with patch('triggers.slack.SlackAPI.post_message', side_effect=RuntimeError()):
+            with self.assertRaises(RuntimeError):
+                deliver_messages(1, 'token', '#general')
+        self.assertEqual(get_message_status(message_id)['status'], QUEUED)
+        self.assertEqual(deliver_messages(1, 'token', '#general'), 1)
+        self.assertEqual(get_message_status(message_id)['status'], SENT)
+
+
+@patch('triggers.tasks.deliver_slack_messages.apply_async')
+class SlackMessageViewTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        UserSocialAuth.objects.create(user=self.user, provider='slack', uid='U1',
+                                      extra_data={'access_token': 'token'})
+        self.client = self.client_class(HTTP_AUTHORIZATION='Token {}'.format(self.user.auth_token.key))
+
+    def tearDown(self):
+        get_redis_connection("default").flushall()
+
+    def test_message_is_queued(self, apply_async):
+        url = reverse('send-slack-message', kwargs={'namespace': self.user.username})
+        response = self.client.post(url, {'channel': '', 'text': 'hello'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], QUEUED)
+        apply_async.assert_called_once()
+        status_url = reverse('slack-message-status', kwargs={'namespace': self.user.username,
+                                                             'message_id': response.data['id']})
+        response = self.client.get(status_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], QUEUED)
+        other = self.client_class(HTTP_AUTHORIZATION='Token {}'.format(UserFactory().auth_token.key))
+        self.assertEqual(other.get(status_url).status_code, status.HTTP_404_NOT_FOUND)
@@ -1,3 +1,4 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.contrib.sites.models import Site
 from rest_framework import viewsets, status
@@ -9,6 +10,7 @@ from rest_framework.views import APIView
 from base.views import NamespaceMixin
 from .models import Trigger
 from .serializers import TriggerSerializer, SlackMessageSerializer, ServerActionSerializer
+from .slack import get_message_status
 from .tasks import dispatch_trigger
 
 
@@ -24,7 +26,18 @@ class SlackMessageView(APIView):
         serializer = SlackMessageSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.send()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class SlackMessageStatusView(APIView):
+    exclude_from_schema = True
+
+    def get(self, request, **kwargs):
+        message_status = get_message_status(kwargs['message_id'])
+        if message_status.get('user_id') != str(request.user.pk):
+            raise Http404
+        return Response({'id': kwargs['message_id'], 'status': message_status['status'],
+                         'error': message_status.get('error', '')})
 
 
 class ServerActionViewSet(NamespaceMixin, viewsets.ModelViewSet):
@@ -25,6 +25,12 @@ class UserSerializer(SearchSerializerMixin, serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'password', 'profile')
         extra_kwargs = {'password': {'write_only': True}}
 
+    def validate_username(self, value):
+        # user directories are in RESOURCE_DIR next to dirs like .uploads and .blobs
+        if value.startswith('.'):
+            raise serializers.ValidationError("Username can't start with a dot.")
+        return value
+
     def create(self, validated_data):
         profile_data = validated_data.pop('profile')
         password = validated_data.pop('password')
@@ -2,6 +2,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from users.serializers import UserSerializer
 from .factories import UserFactory
 
 
@@ -23,3 +24,9 @@ class UserTest(APITestCase):
         url = reverse('user-detail', kwargs={'namespace': self.user.username, 'pk': str(user.pk)})
         response = self.user_client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_username_of_reserved_dir(self):
+        serializer = UserSerializer(data={'username': '.blobs', 'email': 'blobs@example.com', 'password': 'secret',
+                                          'profile': {}})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('username', serializer.errors)
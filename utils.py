@@ -71,12 +71,16 @@ class UJSONSerializer(BaseSerializer):
         return ujson.loads(force_text(value))
 
 
-def copy_model(model):
+def copy_model(model, **kwargs):
+    """
+    Unsaved copy of the model instance with a new primary key, kwargs override field values
+    """
     if model is None:
         return
-    new_object = model.__class__.objects.get(pk=model.pk)
-    new_object.pk = None
-    return new_object
+    fields = {field.attname: getattr(model, field.attname)
+              for field in model._meta.concrete_fields if not field.primary_key}
+    fields.update(kwargs)
+    return model.__class__(**fields)
 
 
 alphanumeric = RegexValidator(r'^[0-9a-zA-Z-]*$', "You can use only alphanumeric characters.")
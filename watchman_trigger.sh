@@ -1,18 +1,7 @@
 #!/usr/bin/env bash
 
-START_TIME=`date +"%s"`
+# project files used to be indexed by a watchman trigger starting a process per change,
+# they are followed by a single subscriber now
+watchman trigger-del /workspaces test_trigger > /dev/null 2>&1
 
-
-
-watchman -j <<-EOT
-["trigger", "/workspaces", {
-  "name": "test_trigger",
-  "expression": ["allof",
-    ["match", "*.*"],
-    ["since", $START_TIME, "ctime"]
-  ],
-  "command": ["venv/bin/python", "run_watchman.py", "$DJANGO_SETTINGS_MODULE"],
-  "chdir": "`pwd`",
-  "stdin": ["name", "exists"]
-}]
-EOT
+exec venv/bin/python run_watchman.py "$DJANGO_SETTINGS_MODULE"